@@ -1,13 +1,26 @@
-import json
 from typing import Callable
 from dataclasses import dataclass
 import enum
 import logging
-import uuid
 import datetime
-
-from websocket import create_connection
-import dpath.util
+import time
+import threading
+import functools
+import itertools
+import concurrent.futures
+
+from websocket import create_connection, WebSocketTimeoutException
+
+from . import codec, transport
+from .cache import ResourceCache
+from .capabilities import CapabilityMap
+from .connection import Connection, ConnectionStats
+from .metrics import Instrumentation, RequestTiming
+from .resources import Resource, Setting, acknowledged, extract, groups, read_frame, registry
+from .schedule import Schedule
+from .subscriptions import (
+    DELETE, SyncSubscription, container, notification_response, parse_notification, subscription_payload,
+)
 
 Day = Hour = str
 Temperature = float
@@ -15,6 +28,21 @@ HeatingSchedule = dict[Day, dict[Hour, Temperature]]
 TankSchedule = dict[Day, dict[Hour, 'TankStateEnum']]
 
 
+class _TimedOut:
+    """Value of the reads abandoned at their deadline, unlike None, the
+    value of the resources the unit does not have"""
+
+    def __repr__(self):
+        return "TIMED_OUT"
+
+    def __bool__(self):
+        return False
+
+
+TIMED_OUT = _TimedOut()
+_ABANDONED = object()  # reservation of the rqi of an abandoned request
+
+
 # XXX use StrEnum in some years when distros will have py 3.11
 class TankStateEnum(str, enum.Enum):
     OFF = "off"
@@ -56,6 +84,79 @@ class TankScheduleState(_ScheduleState):
     TankState: TankStateEnum
 
 
+@dataclass(frozen=True)
+class DaikinSnapshot:
+    """Immutable record of the values read by `DaikinAltherma.snapshot`.
+    All values are None if not read or not supported by the unit, or
+    if their read timed out: their names are then in `timed_out`"""
+    adapter_ip: str
+    groups: tuple[str, ...]
+    # unit_info
+    adapter_model: str = None
+    unit_model: str = None
+    unit_type: str = None
+    unit_datetime: datetime.datetime = None
+    is_unit_datetime_adjustable: bool = None
+    indoor_unit_version: str = None
+    indoor_unit_software_version: str = None
+    outdoor_unit_software_version: str = None
+    remote_setting_version: str = None
+    remote_software_version: str = None
+    pin_code: str = None
+    control_mode: str = None
+    # sensors
+    indoor_temperature: float = None
+    outdoor_temperature: float = None
+    leaving_water_temperature: float = None
+    tank_temperature: float = None
+    indoor_setpoint_temperature: float = None
+    tank_setpoint_temperature: float = None
+    leaving_water_temperature_offset: float = None
+    # status
+    is_holiday_mode: bool = None
+    heating_mode: str = None
+    is_heating_enabled: bool = None
+    is_heating_active: bool = None
+    in_installerstate: bool = None
+    is_tank_heating_enabled: bool = None
+    is_tank_powerful: bool = None
+    is_tank_active: bool = None
+    tank_in_installerstate: bool = None
+    # heating_errors / tank_errors
+    is_heating_error: bool = None
+    is_heating_warning: bool = None
+    is_heating_emergency: bool = None
+    is_tank_error: bool = None
+    is_tank_warning: bool = None
+    is_tank_emergency: bool = None
+    # schedules
+    heating_schedule: list[HeatingSchedule] = None
+    tank_schedule: list[TankSchedule] = None
+    heating_schedule_state: HeatingScheduleState = None
+    tank_schedule_state: TankScheduleState = None
+    # consumption
+    heating_power_consumption: dict = None
+    tank_power_consumption: dict = None
+    timed_out: tuple[str, ...] = ()  # fields not read before the deadline
+
+    @property
+    def complete(self) -> bool:
+        """Returns whether all the fields of the groups were read"""
+        return not self.timed_out
+
+    @property
+    def heating_error_status(self) -> str:
+        """Returns the heating status: OK or Warning or Error or Emergency"""
+        return DaikinAltherma._error_status(
+            self.is_heating_emergency, self.is_heating_error, self.is_heating_warning)
+
+    @property
+    def tank_error_status(self) -> str:
+        """Returns the tank status: OK or Warning or Error or Emergency"""
+        return DaikinAltherma._error_status(
+            self.is_tank_emergency, self.is_tank_error, self.is_tank_warning)
+
+
 class DaikinAltherma:
     UserAgent = "python-daikin-altherma"
     DAYS = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]
@@ -72,12 +173,152 @@ class DaikinAltherma:
     def _heating_value_parser(x):
         return float(x) / 10
 
-    def __init__(self, adapter_ip: str):
+    def __init__(self, adapter_ip: str, max_in_flight: int = 16, cache: ResourceCache = None,
+                 capabilities: CapabilityMap = None, thread_safe: bool = False,
+                 keepalive: float = 30, instrumentation: Instrumentation = None, connect: Callable | str = None):
+        """
+        :param adapter_ip: IP address (or hostname) of the LAN adapter
+        :type adapter_ip: str
+        :param max_in_flight: maximum number of pipelined requests sent to the
+            adapter before waiting for replies, defaults to 16
+        :type max_in_flight: int, optional
+        :param cache: cache for the values read from the adapter, defaults to no caching
+        :type cache: ResourceCache, optional
+        :param capabilities: map of the unsupported resources, which are then not
+            queried anymore, defaults to querying everything
+        :type capabilities: CapabilityMap, optional
+        :param thread_safe: allow the instance to be used from several threads.
+            A background thread then reads all the replies and hands them to
+            the waiting threads, defaults to False
+        :type thread_safe: bool, optional
+        :param keepalive: seconds of inactivity after which the connection is
+            pinged, 0 to disable, defaults to 30
+        :type keepalive: float, optional
+        :param instrumentation: gets the timings of every request, defaults to none
+        :type instrumentation: Instrumentation, optional
+        :param connect: opens the websocket, called with the URL of the adapter and the
+            timeout, or the name of a transport of transport.TRANSPORTS ("raw",
+            "asyncio"), defaults to websocket-client's create_connection. Ex: capture.Recording
+        :type connect: Callable or str, optional
+
+        The connection is opened on first use, and reopened (with exponential
+        backoff) when it drops. Reads in flight are then sent again.
+        """
         self.adapter_ip = adapter_ip
-        self.ws = create_connection(f"ws://{self.adapter_ip}/mca", timeout=2)
+        self.max_in_flight = max_in_flight
+        self.cache = cache
+        self.capabilities = capabilities
+        self.timeout = 2
+        self.instrumentation = instrumentation
+        self._timings = {}  # rqi -> RequestTiming, when instrumented
+        # rqi -> reply that arrived while waiting for another rqi, or
+        # rqi -> Future resolved by the reader thread in thread safe mode
+        self._responses = {}
+        self._requestIds = itertools.count()
+        self._lock = threading.Lock()
+        # The capability map is bound to the adapter model on the first request:
+        # the other requests wait for it, except the request of the model itself
+        self._capabilitiesBound = threading.Event()
+        if capabilities is None or capabilities.filename is None:
+            self._capabilitiesBound.set()
+        self._binding = threading.RLock()
+        self._bindingInProgress = False
+        self._reader = None
+        self._closing = False
+        self._subscriptions = {}  # name -> SyncSubscription
+        # Called with the item of every acknowledged write
+        self.write_listeners: list[Callable[[str], None]] = []
+        self.ws = Connection(
+            functools.partial(
+                transport.get(connect) if connect is not None else create_connection,
+                f"ws://{self.adapter_ip}/mca", timeout=self.timeout),
+            keepalive=keepalive,
+        )
+        if thread_safe:
+            self._reader = threading.Thread(target=self._readLoop, name=f"daikin-{adapter_ip}", daemon=True)
+            self._reader.start()
+
+    def close(self):
+        """Closes the connection to the adapter"""
+        self._closing = True
+        for subscription in list(self._subscriptions.values()):
+            subscription._stop.set()
+        self._subscriptions.clear()
+        self.ws.close()
+        if self._reader is not None:
+            self._reader.join()
+
+    def __enter__(self) -> 'DaikinAltherma':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-    def _requestValue(self, item: str, output_path: str, payload=None):
-        reqid = uuid.uuid4().hex[0:5]
+    @property
+    def connection_stats(self) -> ConnectionStats:
+        """Returns health metrics of the connection to the adapter"""
+        return self.ws.stats
+
+    def _readLoop(self):
+        """Thread safe mode: reads all the replies and resolves their futures"""
+        while not self._closing:
+            if not self.ws.connected:
+                self.ws.wait_connected(self.timeout)
+                continue
+            try:
+                result = self._decode(self.ws.recv())
+            except WebSocketTimeoutException:
+                continue
+            except ConnectionError as e:
+                # The requests in flight are failed, and replayed by their threads
+                with self._lock:
+                    futures = list(self._responses.values())
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            if "m2m:rqp" in result:
+                self._handleNotification(result)
+                continue
+            with self._lock:
+                future = self._responses.get(result["m2m:rsp"]["rqi"])
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    def _capabilityKey(self) -> str:
+        """Identifies the adapter model and firmware, for CapabilityMap"""
+        dvi = self._requestValue("MNCSE-node/deviceInfo", "/m2m:rsp/pc/m2m:dvi") or {}
+        return f"{dvi.get('mod')}/{dvi.get('fwv')}"
+
+    def _bindCapabilities(self):
+        """Binds the capability map to the adapter, once"""
+        with self._binding:
+            if self._capabilitiesBound.is_set() or self._bindingInProgress:
+                return  # bound, or the request of the key by the binding thread
+            self._bindingInProgress = True
+            try:
+                self.capabilities.bind(self._capabilityKey())
+                self._capabilitiesBound.set()
+            finally:
+                self._bindingInProgress = False
+
+    def reprobe(self, paths: list[str] = None):
+        """Queries again the resources that were found unsupported
+
+        :param paths: full paths (ex: "MNAE/2/Sensor/TankTemperature/la"), defaults to all
+        :type paths: list[str], optional
+        """
+        if self.capabilities is not None:
+            self.capabilities.reprobe(paths)
+
+    def _newRequestId(self) -> str:
+        while True:
+            reqid = "%05x" % (next(self._requestIds) & 0xfffff)
+            if reqid not in self._responses:
+                return reqid
+
+    @staticmethod
+    def _buildRequest(reqid: str, item: str, payload=None) -> dict:
         js_request = {
             "m2m:rqp": {
                 "fr": DaikinAltherma.UserAgent,
@@ -86,7 +327,11 @@ class DaikinAltherma:
                 "to": f"/[0]/{item}",
             }
         }
-        if payload:
+        if payload is DELETE:
+            js_request["m2m:rqp"]["op"] = 4
+        elif payload and "m2m:sub" in payload:
+            js_request["m2m:rqp"].update({"ty": 23, "op": 1, "pc": payload})
+        elif payload:
             set_value_params = {
                 "ty": 4,
                 "op": 1,
@@ -95,22 +340,322 @@ class DaikinAltherma:
                 },
             }
             js_request["m2m:rqp"].update(set_value_params)
+        return js_request
 
-        self.ws.send(json.dumps(js_request))
-        result = json.loads(self.ws.recv())
+    @staticmethod
+    def _isWrite(payload) -> bool:
+        """Returns whether a request payload writes a value (an m2m:cin), rather
+        than creating or deleting a subscription"""
+        return bool(payload) and payload is not DELETE and "m2m:sub" not in payload
+
+    @staticmethod
+    def _frame(reqid: str, item: str, payload=None) -> str:
+        """Returns the serialised request. Reads use a template of their item"""
+        if payload is None:
+            return read_frame(DaikinAltherma.UserAgent, reqid, item)
+        return codec.dumps(DaikinAltherma._buildRequest(reqid, item, payload))
+
+    def _sendRequest(self, item: str, payload=None) -> str:
+        """Sends a request without waiting for its reply
 
-        assert result["m2m:rsp"]["rqi"] == reqid
+        :return: the request id to give to `_receiveResponse`
+        """
+        if self.instrumentation is not None:
+            return self._sendRequestInstrumented(item, payload)
+        with self._lock:
+            reqid = self._newRequestId()
+            # Reserve the id so that no other in-flight request reuses it
+            self._responses[reqid] = None if self._reader is None else concurrent.futures.Future()
+        self.ws.send(self._frame(reqid, item, payload))
+        return reqid
+
+    def _sendRequestInstrumented(self, item: str, payload=None) -> str:
+        self.instrumentation.before(item, payload)
+        timing = RequestTiming(item=item, write=self._isWrite(payload))
+        t0 = time.perf_counter()
+        with self._lock:
+            reqid = self._newRequestId()
+            self._responses[reqid] = None if self._reader is None else concurrent.futures.Future()
+            self._timings[reqid] = timing
+        timing.rqi = reqid
+        frame = self._frame(reqid, item, payload)
+        t1 = time.perf_counter()
+        self.ws.send(frame)
+        timing.sent_at = time.perf_counter()
+        timing.serialize = t1 - t0
+        timing.send = timing.sent_at - t1
+        return reqid
+
+    def _decode(self, frame: str) -> dict:
+        if self.instrumentation is None:
+            return codec.loads(frame)
+        t0 = time.perf_counter()
+        result = codec.loads(frame)
+        timing = self._timings.get(result.get("m2m:rsp", {}).get("rqi"))
+        if timing is not None:
+            timing.decode = time.perf_counter() - t0
+        return result
+
+    def _requestDone(self, reqid: str, value=None, result: dict = None, error: str = None):
+        """Reports the timings of an instrumented request"""
+        with self._lock:
+            timing = self._timings.pop(reqid, None)
+        if timing is None:
+            return
+        if error is None:
+            timing.missing = value is None
+            timing.wait = time.perf_counter() - timing.sent_at - timing.decode - timing.extract
+        timing.error = error
+        self.instrumentation.after(timing)
+
+    def _receiveResponse(self, reqid: str, deadline: float = None) -> dict:
+        """Waits for the reply of request `reqid`, until `deadline` (a
+        time.monotonic()) at most. Replies to other in-flight requests are
+        kept until they are asked for"""
+        if self._reader is not None:
+            timeout = self.timeout if deadline is None else min(self.timeout, deadline - time.monotonic())
+            try:
+                result = self._responses[reqid].result(timeout=max(0, timeout))
+            except concurrent.futures.TimeoutError:
+                raise WebSocketTimeoutException(f"No reply for request {reqid}")
+            finally:
+                with self._lock:
+                    del self._responses[reqid]
+            assert result["m2m:rsp"]["to"] == DaikinAltherma.UserAgent
+            return result
+
+        while self._responses.get(reqid) is None:
+            if deadline is None:
+                frame = self.ws.recv()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WebSocketTimeoutException(f"No reply for request {reqid} before the deadline")
+                frame = self.ws.recv(remaining)
+            result = self._decode(frame)
+            if "m2m:rqp" in result:
+                self._handleNotification(result)
+                continue
+            rqi = result["m2m:rsp"]["rqi"]
+            assert rqi in self._responses, f"Unexpected reply for request {rqi}"
+            if self._responses[rqi] is _ABANDONED:
+                del self._responses[rqi]
+                continue
+            self._responses[rqi] = result
+
+        result = self._responses.pop(reqid)
         assert result["m2m:rsp"]["to"] == DaikinAltherma.UserAgent
+        return result
+
+    def _abandon(self, reqid: str):
+        """Forgets a request in flight: its reply will be dropped"""
+        with self._lock:
+            if self._reader is not None:
+                self._responses.pop(reqid, None)
+            elif reqid in self._responses and self._responses[reqid] is None:
+                # Keep the id reserved until the reply arrives, if ever
+                self._responses[reqid] = _ABANDONED
+            elif self._responses.get(reqid) is not _ABANDONED:
+                self._responses.pop(reqid, None)  # its reply already arrived
+
+    def _handleNotification(self, message: dict):
+        """Passes a notification request of the adapter to its subscription"""
+        self.ws.send(codec.dumps(notification_response(message, self.UserAgent)))
+        notification = parse_notification(message)
+        if notification is None:
+            return
+        path, name, value = notification
+        if self.cache is not None:
+            self.cache.put(f"MNAE/{path}", value)
+        subscription = self._subscriptions.get(name)
+        if subscription is not None:
+            subscription.deliver(path, value)
+
+    def subscribe(self, paths: list[str], callback: Callable, min_interval: float = 1,
+                  max_interval: float = 60) -> SyncSubscription:
+        """Calls `callback` with a Notification whenever the value of one of
+        `paths` changes. The adapter notifies the changes of the resources
+        that support subscriptions, the other ones are polled every
+        `min_interval` to `max_interval` seconds, depending on how often
+        they change. Needs thread_safe=True: the notifications are received
+        by the reader thread, which also calls `callback`.
+
+        :param paths: resource paths below MNAE/, ex: "1/Sensor/IndoorTemperature/la"
+        :type paths: list[str]
+        :param callback: called with each Notification
+        :type callback: Callable
+        :param min_interval: minimum seconds between two polls of a resource, defaults to 1
+        :type min_interval: float, optional
+        :param max_interval: maximum seconds between two polls of a resource, defaults to 60
+        :type max_interval: float, optional
+        :return: the subscription, to cancel() when done
+        :rtype: SyncSubscription
+        """
+        if self._reader is None:
+            raise RuntimeError("subscribe() needs a client created with thread_safe=True")
+        subscription = SyncSubscription(self, paths, callback, min_interval, max_interval)
+        self._subscriptions[subscription.name] = subscription
+        payload = subscription_payload(subscription.name, self.UserAgent)
+        try:
+            results = self._requestValues([(f"MNAE/{container(path)}", "/m2m:rsp/rsc", payload) for path in paths])
+        except WebSocketTimeoutException:
+            results = [None] * len(paths)
+        for path, rsc in zip(paths, results):
+            (subscription.pushed if rsc in (2000, 2001) else subscription.polled).append(path)
+        subscription.start_polling()
+        return subscription
+
+    def _unsubscribe(self, subscription: SyncSubscription):
+        if self._subscriptions.pop(subscription.name, None) is None or not subscription.pushed:
+            return
+        try:
+            self._requestValues([
+                (f"MNAE/{container(path)}/{subscription.name}", "/m2m:rsp/rsc", DELETE)
+                for path in subscription.pushed
+            ])
+        except (WebSocketTimeoutException, ConnectionError) as e:
+            logging.warning(f"Could not delete subscription {subscription.name}: {e!r}")
 
+    @staticmethod
+    def _extractValue(item: str, result: dict, output_path: str):
         try:
-            return dpath.util.get(result, output_path)
+            return extract(result, output_path)
         except KeyError:
             logging.error(f"Could not get data for item {item}. Maybe the unit is starting up or relevant module is not installed?")
             return None
 
+    def _requestValue(self, item: str, output_path: str, payload=None):
+        return self._requestValues([(item, output_path, payload)])[0]
+
+    def _readResource(self, resource: Resource):
+        """Reads the value of a generated property. The RequestProfiler
+        attributes the requests made here to `resource.name`"""
+        return resource.parse(self._requestValue(resource.item, resource.output_path))
+
+    def _requestValues(self, requests: list[tuple], replays: int = 1, deadline: float = None) -> list:
+        """Pipelines several requests over the websocket: requests are sent
+        back to back (at most `max_in_flight` unanswered at once) and the
+        replies are matched by rqi, in whichever order they arrive.
+        Reads are answered from the cache when there is one, and reads of
+        unsupported resources return None without querying the adapter.
+
+        If the connection drops, it is reopened and the requests not answered
+        yet are sent again, unless a write was waiting for its reply.
+
+        :param requests: list of (item, output_path) or (item, output_path, payload)
+        :type requests: list[tuple]
+        :param replays: number of times the requests may be sent again, defaults to 1
+        :type replays: int, optional
+        :param deadline: time.monotonic() by which the values must be read. The
+            requests not answered by then, or within `timeout` seconds, are
+            abandoned and their values are TIMED_OUT. Defaults to none: a
+            timeout then raises WebSocketTimeoutException
+        :type deadline: float, optional
+        :return: the values, in the same order as `requests`
+        :rtype: list
+        """
+        if not self._capabilitiesBound.is_set():
+            self._bindCapabilities()
+        requests = [(*request, None)[:3] for request in requests]
+        values = [None] * len(requests)
+        pending = set(range(len(requests)))  # indexes of the requests not answered yet
+        sent = []  # (index, reqid) of the requests sent to the adapter
+        nb_received = 0
+        position = 0  # index of the next request to send
+
+        def receive():
+            nonlocal nb_received
+            i, reqid = sent[nb_received]
+            item, output_path, payload = requests[i]
+            result = self._receiveResponse(reqid, deadline)
+            if self.instrumentation is None:
+                values[i] = self._extractValue(item, result, output_path)
+            else:
+                t0 = time.perf_counter()
+                values[i] = self._extractValue(item, result, output_path)
+                self._timings[reqid].extract = time.perf_counter() - t0
+                self._requestDone(reqid, values[i], result)
+            pending.discard(i)
+            if payload:
+                if self._isWrite(payload) and acknowledged(result):
+                    for listener in self.write_listeners:
+                        listener(item)
+            else:
+                if values[i] is None and self.capabilities is not None:
+                    self.capabilities.missing(item, result)
+                elif values[i] is not None and self.cache is not None:
+                    self.cache.put(item, values[i])
+            nb_received += 1
+
+        while True:
+            try:
+                while position < len(requests):
+                    i = position
+                    item, output_path, payload = requests[i]
+                    if not payload and self.capabilities is not None and not self.capabilities.is_supported(item):
+                        pending.discard(i)
+                        position += 1
+                        continue
+                    if self.cache is not None:
+                        if payload:
+                            if self._isWrite(payload):
+                                self.cache.invalidate(item)
+                        else:
+                            values[i] = self.cache.get(item)
+                            if values[i] is not None:
+                                pending.discard(i)
+                                position += 1
+                                continue
+                    if deadline is not None and time.monotonic() >= deadline:
+                        values[i] = TIMED_OUT
+                        pending.discard(i)
+                        position += 1
+                        continue
+                    if len(sent) - nb_received >= self.max_in_flight:
+                        receive()
+                    sent.append((i, self._sendRequest(item, payload)))
+                    position += 1
+                while nb_received < len(sent):
+                    receive()
+                return values
+            except WebSocketTimeoutException:
+                if deadline is None:
+                    for _, reqid in sent[nb_received:]:
+                        if self.instrumentation is not None:
+                            self._requestDone(reqid, error="timeout")
+                        self._abandon(reqid)
+                    raise
+                # Give up on this request, and go on with the next ones
+                i, reqid = sent[nb_received]
+                if self.instrumentation is not None:
+                    self._requestDone(reqid, error="timeout")
+                self._abandon(reqid)
+                values[i] = TIMED_OUT
+                pending.discard(i)
+                nb_received += 1
+            except ConnectionError:
+                in_flight = [i for i, _ in sent[nb_received:]]
+                if self.instrumentation is not None:
+                    for _, reqid in sent[nb_received:]:
+                        self._requestDone(reqid, error="connection")
+                with self._lock:
+                    for _, reqid in sent[nb_received:]:
+                        self._responses.pop(reqid, None)
+                if replays <= 0 or any(requests[i][2] for i in in_flight):
+                    raise
+                logging.warning(f"Connection to {self.adapter_ip} lost, sending {len(pending)} requests again")
+                self.ws.count_replayed(len(in_flight))
+                retried = sorted(pending)
+                for i, value in zip(retried, self._requestValues([requests[i] for i in retried], replays - 1, deadline)):
+                    values[i] = value
+                return values
+
     def _requestValueHP(self, item: str, output_path: str = "/m2m:rsp/pc/m2m:cin/con", payload=None):
         return self._requestValue(f"MNAE/{item}", output_path, payload)
 
+    def _requestValuesHP(self, items: list[str], output_path: str = "/m2m:rsp/pc/m2m:cin/con") -> list:
+        return self._requestValues([(f"MNAE/{item}", output_path) for item in items])
+
     def available_services(self, unit_nr: int = 1):
         """Does a discovery of the available services on the unit
 
@@ -120,7 +665,7 @@ class DaikinAltherma:
         d = self._requestValueHP(f"{unit_nr}/UnitProfile/la")
         if d is None:
             return None 
-        return json.loads(d)
+        return codec.loads(d)
 
     @property
     def _unit_api(self):
@@ -129,33 +674,6 @@ class DaikinAltherma:
         """
         return self.available_services(1)
 
-    @property
-    def adapter_model(self) -> str:
-        """Returns the model of the LAN adapter.
-        Ex: BRP069A61"""
-        # either BRP069A61 or BRP069A62
-        return self._requestValue("MNCSE-node/deviceInfo", "/m2m:rsp/pc/m2m:dvi/mod")  # "NOT /m2m:rsp/pc/m2m:cin/con"
-
-    @property
-    def unit_datetime(self) -> datetime.datetime:
-        """Returns the current date of the unit. Is refreshed every minute or so"""
-        d = self._requestValueHP("0/DateTime/la")
-        if d is None:
-            return None
-        return datetime.datetime.strptime(d, self.DATETIME_FMT)
-
-    @property
-    def is_unit_datetime_adjustable(self) -> bool:
-        """Returns True if the datetime of your unit is adjustable"""
-        d = self._requestValueHP("0/UnitProfile/la")
-        if d is None:
-            return False
-        j = json.loads(d)
-        try:
-            return j["DateTime"]["DateTimeAdjustable"]
-        except KeyError:
-            return None
-
     def set_unit_datetime(self, d: datetime.datetime) -> bool:
         """Sets the datetime of your unit. 
         Does not work on all units, see `is_unit_datetime_adjustable`
@@ -165,72 +683,7 @@ class DaikinAltherma:
         :return: success
         :rtype: bool
         """
-        sd = datetime.datetime.strftime(d, self.DATETIME_FMT)
-        payload = {
-            "con": sd,
-            "cnf": "text/plain:0",
-        }
-        return (self._requestValueHP("0/DateTime", "/", payload) is not None)
-
-    @property
-    def unit_model(self) -> str:
-        """Returns the model of the heating unit.
-        Ex: EAVH16S23DA6V"""
-        # There should in theory also be:
-        # 0/UnitInfo/ModelNumber/la, but it's not implemented (in my unit)
-        # 2/UnitInfo/ModelNumber/la, but replies with the reply from 1/UnitInfo/ModelNumber/la (in my unit)
-        return self._requestValueHP("1/UnitInfo/ModelNumber/la")
-
-    @property
-    def unit_type(self) -> str:
-        """Returns the type of unit"""
-        # same remarks as with UnitInfo/ModelNumber
-        return self._requestValueHP("1/UnitInfo/UnitType/la")
-
-    @property
-    def indoor_unit_version(self) -> str:
-        """Returns the unit version"""
-        return self._requestValueHP("1/UnitInfo/Version/IndoorSettings/la")
-
-    @property
-    def indoor_unit_software_version(self) -> str:
-        """Returns the unit software version"""
-        return self._requestValueHP("1/UnitInfo/Version/IndoorSoftware/la")
-
-    @property
-    def outdoor_unit_software_version(self) -> str:
-        """Returns the unit software version"""
-        return self._requestValueHP("1/UnitInfo/Version/OutdoorSoftware/la")
-
-    @property
-    def remote_setting_version(self) -> str:
-        """Returns the remote console setting version"""
-        return self._requestValueHP("1/UnitInfo/Version/RemoconSettings/la")
-
-    @property
-    def remote_software_version(self) -> str:
-        """Returns the remote console setting software version"""
-        return self._requestValueHP(
-            "1/UnitInfo/Version/RemoconSoftware/la")
-
-    @property
-    def pin_code(self) -> str:
-        """Returns the pin code of the LAN adapter"""
-        return self._requestValueHP("1/ChildLock/PinCode/la")
-
-    @property
-    def is_holiday_mode(self) -> bool:
-        """ Returns if the holiday mode active or not """
-        r = self._requestValueHP("1/Holiday/HolidayState/la")
-        if r is None:
-            return None
-        return r == 1
-    
-    @property
-    def control_mode(self) -> str:
-        """ Returns the type of control used for heating. This is an installation setting."""
-        # example: "ext RT control" for a contact type external room thermostat, that disables the indoor_temperature and indoor_setpoint_temperature
-        return self._requestValueHP("1/UnitStatus/ControlModeState/la")
+        return (self._requestValue(*SETTINGS["set_unit_datetime"].request(d)) is not None)
 
     def set_holiday_mode(self, on_holiday: bool) -> bool:
         """Whether to turn the holiday mode on(True) or off(False).
@@ -241,47 +694,9 @@ class DaikinAltherma:
         :return: success
         :rtype: bool
         """
-        mode_dict = {
-            True: 1,
-            False: 0,
-        }
-
-        payload = {
-            'con': mode_dict[on_holiday],
-            'cnf': 'text/plain:0',
-        }
-
-        return (self._requestValueHP("1/Holiday/HolidayState", "/", payload) is not None)
+        return (self._requestValue(*SETTINGS["set_holiday_mode"].request(on_holiday)) is not None)
 
     # HOT WATER TANK STUFF
-    @property
-    def tank_temperature(self) -> float:
-        """Returns the hot water tank temperature, in °C"""
-        return self._requestValueHP("2/Sensor/TankTemperature/la")
-
-    @property
-    def tank_setpoint_temperature(self) -> float:
-        """Returns the hot water tank setpoint (target) temperature, in °C"""
-        return self._requestValueHP("2/Operation/TargetTemperature/la")
-
-    @property
-    def is_tank_heating_enabled(self) -> bool:
-        """Returns if the tank heating is currently enabled"""
-        r = self._requestValueHP("2/Operation/Power/la")
-        if r is None:
-            return None
-        else:
-            return (r == "on")
-
-    @property
-    def is_tank_powerful(self) -> bool:
-        """Returns if the tank is in powerful state"""
-        r = self._requestValueHP("2/Operation/Powerful/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
-
     def set_tank_heating_enabled(self, powerful_active: bool) -> bool:
         """Whether to turn the water tank high/"powerful" heating on(True) or off(False).
         You can confirm that it works by calling self.is_tank_heating_enabled
@@ -291,42 +706,9 @@ class DaikinAltherma:
         :return: success
         :rtype: bool
         """
-        mode_dict = {
-            True: 1,
-            False: 0,
-        }
-        payload = {
-            "con": mode_dict[powerful_active],
-            "cnf": "text/plain:0",
-        }
-        return (self._requestValueHP("2/Operation/Powerful", "/", payload) is not None)
+        return (self._requestValue(*SETTINGS["set_tank_heating_enabled"].request(powerful_active)) is not None)
 
     # HEATING STUFF
-    @property
-    def indoor_temperature(self) -> float:
-        """Returns the indoor temperature, in °C"""
-        return self._requestValueHP("1/Sensor/IndoorTemperature/la")
-
-    @property
-    def outdoor_temperature(self) -> float:
-        """Returns the outdoor temperature, in °C"""
-        return self._requestValueHP("1/Sensor/OutdoorTemperature/la")
-
-    @property
-    def indoor_setpoint_temperature(self) -> float:
-        """Returns the indoor setpoint (target) temperature, in °C"""
-        return self._requestValueHP("1/Operation/TargetTemperature/la")
-
-    @property
-    def leaving_water_temperature(self) -> float:
-        """Returns the heating leaving water temperature, in °C"""
-        return self._requestValueHP("1/Sensor/LeavingWaterTemperatureCurrent/la")
-
-    @property
-    def leaving_water_temperature_offset(self) -> float:
-        """Returns the heating leaving water temperature, in °C"""
-        return self._requestValueHP("1/Operation/LeavingWaterTemperatureOffsetHeating/la")
-        
     def set_leaving_water_temperature_offset(self, offset_temperature_c: int) -> bool:
         """Sets the heating leaving water offset temperature, in °C
 
@@ -335,36 +717,8 @@ class DaikinAltherma:
         :return: success
         :rtype: bool        
         """
-        payload = {
-            "con": offset_temperature_c,
-            "cnf": "text/plain:0",
-        }
-        return (self._requestValueHP("1/Operation/LeavingWaterTemperatureOffsetHeating", "/", payload) is not None)
-
-    @property
-    def is_heating_enabled(self) -> bool:
-        """Returns if the unit heating is enabled"""
-        r = self._requestValueHP("1/Operation/Power/la")
-        if r is None:
-            return None
-        else:
-            return (r == "on")
-
-    @property
-    def heating_mode(self) -> str:
-        """Returns whether the heat pump is heating or cooling.
-        """
-        return self._requestValueHP("1/Operation/OperationMode/la")
-
-    @property
-    def heating_power_consumption(self) -> dict:
-        """Returns the energy (electrical) consumption for heating in kWh per [D]ay, [W]eek, [M]onth"""
-        return self._requestValueHP("1/Consumption/la", "m2m:rsp/pc/m2m:cin/con")
-
-    @property
-    def tank_power_consumption(self) -> dict:
-        """Returns the energy (electrical) consumption for hot water in kWh per [D]ay, [W]eek, [M]onth"""
-        return self._requestValueHP("2/Consumption/la", "m2m:rsp/pc/m2m:cin/con")
+        request = SETTINGS["set_leaving_water_temperature_offset"].request(offset_temperature_c)
+        return (self._requestValue(*request) is not None)
 
     def set_setpoint_temperature(self, setpoint_temperature_c: float) -> bool:
         """Sets the heating setpoint (target) temperature, in °C
@@ -374,11 +728,7 @@ class DaikinAltherma:
         :return: success
         :rtype: bool
         """
-        payload = {
-            "con": setpoint_temperature_c,
-            "cnf": "text/plain:0",
-        }
-        return (self._requestValueHP("1/Operation/TargetTemperature", "/", payload) is not None)
+        return (self._requestValue(*SETTINGS["set_setpoint_temperature"].request(setpoint_temperature_c)) is not None)
 
     def set_heating_enabled(self, heating_active: bool) -> bool:
         """Whether to turn the heating on(True) or off(False).
@@ -389,117 +739,196 @@ class DaikinAltherma:
         :return: success
         :rtype: bool
         """
-        mode_dict = {
-            True: "on",
-            False: "standby",
-        }
-        payload = {
-            "con": mode_dict[heating_active],
-            "cnf": "text/plain:0",
-        }
-        return (self._requestValueHP("1/Operation/Power", "/", payload) is not None)
+        return (self._requestValue(*SETTINGS["set_heating_enabled"].request(heating_active)) is not None)
 
-    @property
-    def heating_schedule(self) -> list[HeatingSchedule]:
-        """Returns the HeatingSchedule list heating"""
-        d = self._requestValueHP(
-            "1/Schedule/List/Heating/la")
+    def set_heating_schedule(self, schedule: HeatingSchedule | Schedule, force: bool = False) -> bool:
+        """Sets the heating schedule for the heating. The schedule is only
+        written if it differs from the one of the unit.
+
+        :param schedule: the schedule to set
+        :type schedule: HeatingSchedule or Schedule
+        :param force: write it even if the unit already has it, defaults to False
+        :type force: bool, optional
+        :return: success
+        :rtype: bool
+        """
+        if not isinstance(schedule, Schedule):
+            schedule = Schedule.from_dict(schedule)
+        if not force and self._schedulesEqual(self._requestValueHP("1/Schedule/List/Heating/la"), schedule):
+            return True
+        return (self._requestValue(*SETTINGS["set_heating_schedule"].request(schedule)) is not None)
+
+    @staticmethod
+    def _schedulesEqual(d: str, schedule: Schedule) -> bool:
+        """Returns whether the schedule list `d` of the unit only has `schedule`"""
         if d is None:
-            return []
-        j = json.loads(d)
+            return False
+        try:
+            return [Schedule.parse(s) for s in codec.decode_con(d)["data"]] == [schedule]
+        except (ValueError, KeyError, TypeError):
+            return False
 
-        out_schedules = []
-        for schedule in j["data"]:
-            out_schedules.append(self._unmarshall_schedule(schedule, DaikinAltherma._heating_value_parser))
-        return out_schedules
+    @staticmethod
+    def _error_status(emergency: bool, error: bool, warning: bool) -> str:
+        for flag, status in ((emergency, "Emergency"), (error, "Error"), (warning, "Warning")):
+            if flag is None:
+                return None
+            if flag:
+                return status
+        return "OK"
 
     @property
-    def is_heating_error(self) -> bool:
-        """Returns if the heating has an error"""
-        r = self._requestValueHP("1/UnitStatus/ErrorState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
-        
-    @property
-    def is_heating_warning(self) -> bool:
-        """Returns if the heating has a warning"""
-        r = self._requestValueHP("1/UnitStatus/WarningState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)        
+    def heating_error_status(self) -> str:
+        """Returns the heating status: OK or Warning or Error or Emergency"""
+        return self.snapshot(["heating_errors"]).heating_error_status
 
     @property
-    def is_heating_active(self) -> bool:
-        """Returns if the heating is currently active"""
-        r = self._requestValueHP("1/UnitStatus/ActiveState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
+    def tank_error_status(self) -> str:
+        """Returns the tank status: OK or Warning or Error or Emergency"""
+        return self.snapshot(["tank_errors"]).tank_error_status
+
+    def read_many(self, paths: list[str], deadline: float = None) -> dict:
+        """Reads several resources of the unit in a single pipelined batch
+
+        :param paths: resource paths below MNAE/, ex: "1/Sensor/IndoorTemperature/la"
+        :type paths: list[str]
+        :param deadline: seconds the whole read may take, after which the values
+            not read are TIMED_OUT, defaults to no limit
+        :type deadline: float, optional
+        :return: path -> raw value (None if not available)
+        :rtype: dict
+        """
+        values = self._requestValues(
+            [(f"MNAE/{path}", "/m2m:rsp/pc/m2m:cin/con") for path in paths], deadline=self._deadline(deadline))
+        return dict(zip(paths, values))
+
+    def snapshot(self, groups: list[str] = None, deadline: float = None) -> 'DaikinSnapshot':
+        """Reads a group of resources in a single pipelined batch.
+        Fields that are not part of the requested groups, or not
+        supported by the unit, are None.
+
+        :param groups: names from SNAPSHOT_GROUPS (unit_info, sensors, status,
+            heating_errors, tank_errors, schedules, consumption), defaults to all of them
+        :type groups: list[str], optional
+        :param deadline: seconds the whole read may take. The fields not read by
+            then are None, and listed in `timed_out`. Defaults to no limit
+        :type deadline: float, optional
+        :return: the parsed values
+        :rtype: DaikinSnapshot
+        """
+        groups, fields = self._snapshotFields(groups)
+        values = self._requestValues(
+            [(item, output_path) for item, output_path, _ in fields.values()], deadline=self._deadline(deadline))
+        return self._buildSnapshot(self.adapter_ip, groups, fields, values)
 
-    @property
-    def is_heating_emergency(self) -> bool:
-        """Returns if the heating is in emergency state"""
-        r = self._requestValueHP("1/UnitStatus/EmergencyState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
-        
-    @property
-    def in_installerstate(self) -> bool:
-        """Returns if the heating is in the installer mode, will have limited functionality in that case"""
-        r = self._requestValueHP("1/UnitStatus/InstallerState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
+    @staticmethod
+    def _deadline(seconds: float = None) -> float:
+        """Returns the time.monotonic() in `seconds`"""
+        return None if seconds is None else time.monotonic() + seconds
 
-    @property
-    def tank_schedule(self) -> list[TankSchedule]:
-        """Returns the TankSchedule list heating"""
-        d = self._requestValueHP("2/Schedule/List/Heating/la")
-        j = json.loads(d)
-        if j is None:
-            return []
+    @staticmethod
+    def _snapshotFields(groups: list[str] = None) -> tuple[tuple, dict]:
+        if groups is None:
+            groups = list(SNAPSHOT_GROUPS)
+        fields = {}
+        for group in groups:
+            fields.update(SNAPSHOT_GROUPS[group])
+        return tuple(groups), fields
 
-        def value_parser(x):
-            return TankStateEnum.int_to_state(x)
+    @staticmethod
+    def _buildSnapshot(adapter_ip: str, groups: tuple, fields: dict, values: list) -> 'DaikinSnapshot':
+        parsed = {
+            name: None if value is None or value is TIMED_OUT else parser(value)
+            for (name, (_, _, parser)), value in zip(fields.items(), values)
+        }
+        timed_out = tuple(name for name, value in zip(fields, values) if value is TIMED_OUT)
+        return DaikinSnapshot(adapter_ip=adapter_ip, groups=groups, timed_out=timed_out, **parsed)
 
-        out_schedules = []
-        for schedule in j["data"]:
-            out_schedules.append(self._unmarshall_schedule(schedule, value_parser))
-        return out_schedules
+    def print_all_status(self, without_schedule: bool = False, deadline: float = None):
+        groups = [g for g in SNAPSHOT_GROUPS if not (without_schedule and g == "schedules")]
+        print(self._format_status(self.snapshot(groups, deadline), without_schedule))
+
+    @staticmethod
+    def _format_status(s: 'DaikinSnapshot', without_schedule: bool = False) -> str:
+        def ns(x):
+            return x if x is not None else "--not supported--"
 
-    def set_heating_schedule(self, schedule: HeatingSchedule) -> bool:
-        """Sets the heating schedule for the heating.
+        status = f"""
+Daikin adapter: {ns(s.adapter_ip)} {ns(s.adapter_model)}
+Daikin unit: {ns(s.unit_model)} {ns(s.unit_type)}
+Daikin time: {ns(s.unit_datetime)} (adjustable: {ns(s.is_unit_datetime_adjustable)})
+Software versions:
+    Indoor: {ns(s.indoor_unit_software_version)}
+    Outdoor: {ns(s.outdoor_unit_software_version)}
+    Remote settings: {ns(s.remote_setting_version)}
+    Remote software: {ns(s.remote_software_version)}
+    Pin code: {ns(s.pin_code)}
+Hot water tank:
+    Current: {ns(s.tank_temperature)}°C (target {ns(s.tank_setpoint_temperature)}°C)
+    Heating enabled: {ns(s.is_tank_heating_enabled)} (Powerful: {ns(s.is_tank_powerful)}) (Active: {ns(s.is_tank_active)})
+    Status: {ns(s.tank_error_status)}
+    Schedules: {"(excluded from print)" if without_schedule else ns(s.tank_schedule)}
+    Schedule state: {"(excluded from print)" if without_schedule else ns(s.tank_schedule_state)}
+    Consumption: {ns(s.tank_power_consumption)}
+    Installer state: {ns(s.tank_in_installerstate)}
+Heating:
+    Control mode: {ns(s.control_mode)}
+    Outdoor temp: {ns(s.outdoor_temperature)}°C
+    Indoor temp: {ns(s.indoor_temperature)}°C (target {ns(s.indoor_setpoint_temperature)}°C)
+    Heating enabled: {ns(s.is_heating_enabled)} (Active: {ns(s.is_heating_active)})
+    Status: {ns(s.heating_error_status)}
+    Leaving water: {ns(s.leaving_water_temperature)}°C
+    Leaving water offset: {ns(s.leaving_water_temperature_offset)}°C
+    Heating mode: {ns(s.heating_mode)}
+    Schedules: {"(excluded from print)" if without_schedule else ns(s.heating_schedule)}
+    Schedule state: {"(excluded from print)" if without_schedule else ns(s.heating_schedule_state)}
+    Consumption: {ns(s.heating_power_consumption)}
+    Installer state: {ns(s.in_installerstate)}
+Holiday mode: {ns(s.is_holiday_mode)}
+    """
+        if s.timed_out:
+            status += f"Timed out: {', '.join(s.timed_out)}\n"
+        return status
 
-        :param schedule: the schedule to set
-        :type schedule: HeatingSchedule
-        :return: success
-        :rtype: bool
-        """
-        schedule_str = self._marshall_schedule(schedule)
-        dq = {"data": [schedule_str]}
+    @staticmethod
+    def _parse_flag(x) -> bool:
+        return x == 1
 
-        payload = {
-            "con": json.dumps(dq),
-            "cnf": "text/plain:0",
-        }
-        self._requestValueHP("1/Schedule/List/Heating", "/", payload)
+    @staticmethod
+    def _parse_power(x) -> bool:
+        return x == "on"
 
-    @property
-    def heating_schedule_state(self) -> HeatingScheduleState:
-        """Returns the actual heating schedule state"""
-        d = self._requestValueHP("1/Schedule/Next/la")
-        if d is None:
+    @staticmethod
+    def _parse_datetime(d: str) -> datetime.datetime:
+        return datetime.datetime.strptime(d, DaikinAltherma.DATETIME_FMT)
+
+    @staticmethod
+    def _parse_datetime_adjustable(d: str) -> bool:
+        j = codec.decode_con(d)
+        try:
+            return j["DateTime"]["DateTimeAdjustable"]
+        except KeyError:
             return None
-        j = json.loads(d)
-        dq = j['data']
 
+    @staticmethod
+    def _parse_heating_schedules(d: str) -> list[HeatingSchedule]:
+        j = codec.decode_con(d)
+        return [
+            DaikinAltherma._unmarshall_schedule(schedule, DaikinAltherma._heating_value_parser)
+            for schedule in j["data"]
+        ]
+
+    @staticmethod
+    def _parse_tank_schedules(d: str) -> list[TankSchedule]:
+        j = codec.decode_con(d)
+        return [
+            DaikinAltherma._unmarshall_schedule(schedule, TankStateEnum.int_to_state)
+            for schedule in j["data"]
+        ]
+
+    @staticmethod
+    def _parse_heating_schedule_state(d: str) -> HeatingScheduleState:
+        dq = codec.decode_con(d)['data']
         return HeatingScheduleState(
             OperationMode=dq['OperationMode'],
             StartTime=dq['StartTime'],
@@ -507,15 +936,9 @@ class DaikinAltherma:
             Day=dq['Day'],
         )
 
-    @property
-    def tank_schedule_state(self) -> TankScheduleState:
-        """Returns the actual tank schedule state"""
-        d = self._requestValueHP("2/Schedule/Next/la")
-        if d is None:
-            return None
-        j = json.loads(d)
-        dq = j['data']
-
+    @staticmethod
+    def _parse_tank_schedule_state(d: str) -> TankScheduleState:
+        dq = codec.decode_con(d)['data']
         return TankScheduleState(
             OperationMode=dq['OperationMode'],
             StartTime=dq['StartTime'],
@@ -523,176 +946,154 @@ class DaikinAltherma:
             Day=dq['Day'],
         )
 
-    @property
-    def is_tank_error(self) -> bool:
-        """Returns if the tank has an error"""
-        r = self._requestValueHP("2/UnitStatus/ErrorState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
-        
-    @property
-    def is_tank_warning(self) -> bool:
-        """Returns if the tank has a warning"""
-        r = self._requestValueHP("2/UnitStatus/WarningState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)        
-
-    @property
-    def is_tank_active(self) -> bool:
-        """Returns if the tank is currently active"""
-        r = self._requestValueHP("2/UnitStatus/ActiveState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
-        
-    @property
-    def is_tank_emergency(self) -> bool:
-        """Returns if the tank is in emergency state"""
-        r = self._requestValueHP("2/UnitStatus/EmergencyState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
-        
-    @property
-    def tank_in_installerstate(self) -> bool:
-        """Returns if the tank heating is in the installer mode, will have limited functionality in that case"""
-        r = self._requestValueHP("2/UnitStatus/InstallerState/la")
-        if r is None:
-            return None
-        else:
-            return (r == 1)
-    
-    @property
-    def heating_error_status(self) -> str:
-        """Returns the heating status: OK or Warning or Error or Emergency"""
-        e = self.is_heating_emergency
-        if e is None: 
-            return None
-        if e:
-            return "Emergency"
-        e = self.is_heating_error
-        if e is None: 
-            return None
-        if e:
-            return "Error"
-        e = self.is_heating_warning
-        if e is None: 
-            return None
-        if e:
-            return "Warning"
-        return "OK"
-    
-    @property
-    def tank_error_status(self) -> str:
-        """Returns the tank status: OK or Warning or Error or Emergency"""
-        e = self.is_tank_emergency
-        if e is None: 
-            return None
-        if e:
-            return "Emergency"
-        e = self.is_tank_error
-        if e is None: 
-            return None
-        if e:
-            return "Error"
-        e = self.is_tank_warning
-        if e is None: 
-            return None
-        if e:
-            return "Warning"
-        return "OK"    
-        
-    def print_all_status(self, without_schedule: bool = False):
-        def ns(x):
-            return x if x is not None else "--not supported--"
-        
-        print(
-            f"""
-Daikin adapter: {ns(self.adapter_ip)} {ns(self.adapter_model)}
-Daikin unit: {ns(self.unit_model)} {ns(self.unit_type)}
-Daikin time: {ns(self.unit_datetime)} (adjustable: {ns(self.is_unit_datetime_adjustable)})
-Software versions:
-    Indoor: {ns(self.indoor_unit_software_version)}
-    Outdoor: {ns(self.outdoor_unit_software_version)}
-    Remote settings: {ns(self.remote_setting_version)}
-    Remote software: {ns(self.remote_software_version)}
-    Pin code: {ns(self.pin_code)}
-Hot water tank:
-    Current: {ns(self.tank_temperature)}°C (target {ns(self.tank_setpoint_temperature)}°C)
-    Heating enabled: {ns(self.is_tank_heating_enabled)} (Powerful: {ns(self.is_tank_powerful)}) (Active: {ns(self.is_tank_active)})
-    Status: {ns(self.heating_error_status)}
-    Schedules: {"(excluded from print)" if without_schedule else ns(self.tank_schedule)}
-    Schedule state: {ns(self.tank_schedule_state)}
-    Consumption: {ns(self.tank_power_consumption)}
-    Installer state: {ns(self.tank_in_installerstate)}
-Heating:
-    Control mode: {ns(self.control_mode)}
-    Outdoor temp: {ns(self.outdoor_temperature)}°C
-    Indoor temp: {ns(self.indoor_temperature)}°C (target {ns(self.indoor_setpoint_temperature)}°C)
-    Heating enabled: {ns(self.is_heating_enabled)} (Active: {ns(self.is_heating_active)})
-    Status: {ns(self.tank_error_status)}
-    Leaving water: {ns(self.leaving_water_temperature)}°C
-    Leaving water offset: {ns(self.leaving_water_temperature_offset)}°C
-    Heating mode: {ns(self.heating_mode)}
-    Schedules: {"(excluded from print)" if without_schedule else ns(self.heating_schedule)}
-    Schedule state: {ns(self.heating_schedule_state)}
-    Consumption: {ns(self.heating_power_consumption)}
-    Installer state: {ns(self.in_installerstate)}
-Holiday mode: {ns(self.is_holiday_mode)}
-    """
-        )
-
     @staticmethod
     def _unmarshall_schedule(schedule_str: str, value_parser: Callable):
         """Converts a schedule string to a schedule dict.
         The dict keys are the days (DaikinAltherma.DAYS), and the
         values are a dict of hour (HHMM) -> Setpoint T°
-        Ex: {'Mo': {'0000': 23.4}}"""
-
-        hrs = schedule_str.split("|")[2].split(";")
-        i = 0
-        schedule = {}
-
-        for day in DaikinAltherma.DAYS:
-            schedule_wk = {}
-            temps = hrs[i: i + 6]
-            for c in temps:
-                ctime, cval = c.split(",")
-                if ctime == "":
-                    continue
-                if cval == "":
-                    # For some reason, the time is declared but not the value.. ?
-                    continue
-                val = value_parser(cval)
-                schedule_wk[ctime] = val
-
-            i += 6
-            schedule[day] = schedule_wk
-        return schedule
+        Ex: {'Mo': {'0000': 23.4}}
+        Slots with a time but no value are skipped"""
+        return Schedule.parse(schedule_str).to_dict(value_parser)
 
     @staticmethod
     def _marshall_schedule(schedule) -> str:
         """' Converts a schedule dict to a Daikin schedule string"""
-        week_schedule = []
-        for day in DaikinAltherma.DAYS:
-            sday = schedule.get(day, {})
-            schedule_day = []
-
-            assert len(sday) <= 6
-            for hour in sorted(sday.keys()):
-                schedule_day.append(f"{hour},{int(sday[hour] * 10)}")
-            padding_schedule = 6 - len(schedule_day)
-            schedule_day += [","] * padding_schedule
-            week_schedule += schedule_day
-        schedule_str = "$NULL|1|" + ";".join(week_schedule)
-        return schedule_str
-
+        return Schedule.from_dict(schedule).to_wire()
+
+
+_flag = DaikinAltherma._parse_flag
+_power = DaikinAltherma._parse_power
+
+# Resources read by DaikinAltherma, in the order of SNAPSHOT_GROUPS
+RESOURCES = registry([
+    # unit_info
+    Resource("adapter_model", None, "MNCSE-node/deviceInfo", category="unit_info",
+             output_path="/m2m:rsp/pc/m2m:dvi/mod",  # NOT /m2m:rsp/pc/m2m:cin/con
+             doc="Returns the model of the LAN adapter.\n        Ex: BRP069A61"),  # either BRP069A61 or BRP069A62
+    # There should in theory also be:
+    # 0/UnitInfo/ModelNumber/la, but it's not implemented (in my unit)
+    # 2/UnitInfo/ModelNumber/la, but replies with the reply from 1/UnitInfo/ModelNumber/la (in my unit)
+    Resource("unit_model", 1, "UnitInfo/ModelNumber", category="unit_info",
+             doc="Returns the model of the heating unit.\n        Ex: EAVH16S23DA6V"),
+    # same remarks as with UnitInfo/ModelNumber
+    Resource("unit_type", 1, "UnitInfo/UnitType", category="unit_info", doc="Returns the type of unit"),
+    Resource("unit_datetime", 0, "DateTime", DaikinAltherma._parse_datetime, "unit_info",
+             "Returns the current date of the unit. Is refreshed every minute or so"),
+    Resource("is_unit_datetime_adjustable", 0, "UnitProfile", DaikinAltherma._parse_datetime_adjustable, "unit_info",
+             "Returns True if the datetime of your unit is adjustable", default=False),
+    Resource("indoor_unit_version", 1, "UnitInfo/Version/IndoorSettings", category="unit_info",
+             doc="Returns the unit version"),
+    Resource("indoor_unit_software_version", 1, "UnitInfo/Version/IndoorSoftware", category="unit_info",
+             doc="Returns the unit software version"),
+    Resource("outdoor_unit_software_version", 1, "UnitInfo/Version/OutdoorSoftware", category="unit_info",
+             doc="Returns the unit software version"),
+    Resource("remote_setting_version", 1, "UnitInfo/Version/RemoconSettings", category="unit_info",
+             doc="Returns the remote console setting version"),
+    Resource("remote_software_version", 1, "UnitInfo/Version/RemoconSoftware", category="unit_info",
+             doc="Returns the remote console setting software version"),
+    Resource("pin_code", 1, "ChildLock/PinCode", category="unit_info", doc="Returns the pin code of the LAN adapter"),
+    # example: "ext RT control" for a contact type external room thermostat, that disables the indoor_temperature and indoor_setpoint_temperature
+    Resource("control_mode", 1, "UnitStatus/ControlModeState", category="unit_info",
+             doc="Returns the type of control used for heating. This is an installation setting."),
+    # sensors
+    Resource("indoor_temperature", 1, "Sensor/IndoorTemperature", category="sensors",
+             doc="Returns the indoor temperature, in °C", metric=("daikin_temperature_celsius", {"sensor": "indoor"})),
+    Resource("outdoor_temperature", 1, "Sensor/OutdoorTemperature", category="sensors",
+             doc="Returns the outdoor temperature, in °C", metric=("daikin_temperature_celsius", {"sensor": "outdoor"})),
+    Resource("leaving_water_temperature", 1, "Sensor/LeavingWaterTemperatureCurrent", category="sensors",
+             doc="Returns the heating leaving water temperature, in °C",
+             metric=("daikin_temperature_celsius", {"sensor": "leaving_water"})),
+    Resource("tank_temperature", 2, "Sensor/TankTemperature", category="sensors",
+             doc="Returns the hot water tank temperature, in °C", metric=("daikin_temperature_celsius", {"sensor": "tank"})),
+    Resource("indoor_setpoint_temperature", 1, "Operation/TargetTemperature", category="sensors",
+             doc="Returns the indoor setpoint (target) temperature, in °C",
+             metric=("daikin_setpoint_celsius", {"setpoint": "indoor"})),
+    Resource("tank_setpoint_temperature", 2, "Operation/TargetTemperature", category="sensors",
+             doc="Returns the hot water tank setpoint (target) temperature, in °C",
+             metric=("daikin_setpoint_celsius", {"setpoint": "tank"})),
+    Resource("leaving_water_temperature_offset", 1, "Operation/LeavingWaterTemperatureOffsetHeating", category="sensors",
+             doc="Returns the heating leaving water offset temperature, in °C",
+             metric=("daikin_setpoint_celsius", {"setpoint": "leaving_water_offset"})),
+    # status
+    Resource("is_holiday_mode", 1, "Holiday/HolidayState", _flag, "status",
+             "Returns if the holiday mode active or not", metric=("daikin_holiday_mode", {})),
+    Resource("heating_mode", 1, "Operation/OperationMode", category="status",
+             doc="Returns whether the heat pump is heating or cooling."),
+    Resource("is_heating_enabled", 1, "Operation/Power", _power, "status",
+             "Returns if the unit heating is enabled", metric=("daikin_enabled", {"unit": "heating"})),
+    Resource("is_heating_active", 1, "UnitStatus/ActiveState", _flag, "status",
+             "Returns if the heating is currently active", metric=("daikin_active", {"unit": "heating"})),
+    Resource("in_installerstate", 1, "UnitStatus/InstallerState", _flag, "status",
+             "Returns if the heating is in the installer mode, will have limited functionality in that case",
+             metric=("daikin_installer_state", {"unit": "heating"})),
+    Resource("is_tank_heating_enabled", 2, "Operation/Power", _power, "status",
+             "Returns if the tank heating is currently enabled", metric=("daikin_enabled", {"unit": "tank"})),
+    Resource("is_tank_powerful", 2, "Operation/Powerful", _flag, "status",
+             "Returns if the tank is in powerful state", metric=("daikin_tank_powerful", {})),
+    Resource("is_tank_active", 2, "UnitStatus/ActiveState", _flag, "status",
+             "Returns if the tank is currently active", metric=("daikin_active", {"unit": "tank"})),
+    Resource("tank_in_installerstate", 2, "UnitStatus/InstallerState", _flag, "status",
+             "Returns if the tank heating is in the installer mode, will have limited functionality in that case",
+             metric=("daikin_installer_state", {"unit": "tank"})),
+    # heating_errors / tank_errors
+    Resource("is_heating_error", 1, "UnitStatus/ErrorState", _flag, "heating_errors",
+             "Returns if the heating has an error", metric=("daikin_error", {"unit": "heating"})),
+    Resource("is_heating_warning", 1, "UnitStatus/WarningState", _flag, "heating_errors",
+             "Returns if the heating has a warning", metric=("daikin_warning", {"unit": "heating"})),
+    Resource("is_heating_emergency", 1, "UnitStatus/EmergencyState", _flag, "heating_errors",
+             "Returns if the heating is in emergency state", metric=("daikin_emergency", {"unit": "heating"})),
+    Resource("is_tank_error", 2, "UnitStatus/ErrorState", _flag, "tank_errors",
+             "Returns if the tank has an error", metric=("daikin_error", {"unit": "tank"})),
+    Resource("is_tank_warning", 2, "UnitStatus/WarningState", _flag, "tank_errors",
+             "Returns if the tank has a warning", metric=("daikin_warning", {"unit": "tank"})),
+    Resource("is_tank_emergency", 2, "UnitStatus/EmergencyState", _flag, "tank_errors",
+             "Returns if the tank is in emergency state", metric=("daikin_emergency", {"unit": "tank"})),
+    # schedules
+    Resource("heating_schedule", 1, "Schedule/List/Heating", DaikinAltherma._parse_heating_schedules, "schedules",
+             "Returns the HeatingSchedule list heating", default=[]),
+    Resource("tank_schedule", 2, "Schedule/List/Heating", DaikinAltherma._parse_tank_schedules, "schedules",
+             "Returns the TankSchedule list heating", default=[]),
+    Resource("heating_schedule_state", 1, "Schedule/Next", DaikinAltherma._parse_heating_schedule_state, "schedules",
+             "Returns the actual heating schedule state"),
+    Resource("tank_schedule_state", 2, "Schedule/Next", DaikinAltherma._parse_tank_schedule_state, "schedules",
+             "Returns the actual tank schedule state"),
+    # consumption
+    Resource("heating_power_consumption", 1, "Consumption", category="consumption",
+             doc="Returns the energy (electrical) consumption for heating in kWh per [D]ay, [W]eek, [M]onth"),
+    Resource("tank_power_consumption", 2, "Consumption", category="consumption",
+             doc="Returns the energy (electrical) consumption for hot water in kWh per [D]ay, [W]eek, [M]onth"),
+])
+
+# group name -> DaikinSnapshot field -> (item, output path, parser)
+SNAPSHOT_GROUPS = groups(RESOURCES)
+
+_ON_OFF = {True: 1, False: 0}.__getitem__
+_POWER = {True: "on", False: "standby"}.__getitem__
+
+# Resources written by the setters of DaikinAltherma
+SETTINGS = registry([
+    Setting("set_unit_datetime", 0, "DateTime", lambda d: datetime.datetime.strftime(d, DaikinAltherma.DATETIME_FMT)),
+    Setting("set_holiday_mode", 1, "Holiday/HolidayState", _ON_OFF),
+    Setting("set_tank_heating_enabled", 2, "Operation/Powerful", _ON_OFF),
+    Setting("set_leaving_water_temperature_offset", 1, "Operation/LeavingWaterTemperatureOffsetHeating"),
+    Setting("set_setpoint_temperature", 1, "Operation/TargetTemperature"),
+    Setting("set_heating_enabled", 1, "Operation/Power", _POWER),
+    Setting("set_heating_schedule", 1, "Schedule/List/Heating",
+            lambda schedule: codec.dumps({"data": [schedule.to_wire()]})),
+])
+
+
+def _getter(resource: Resource) -> property:
+    def getter(self):
+        return self._readResource(resource)
+    getter.__name__ = resource.name
+    getter.__qualname__ = f"DaikinAltherma.{resource.name}"
+    getter.__doc__ = resource.doc
+    return property(getter)
+
+
+for _resource in RESOURCES.values():
+    setattr(DaikinAltherma, _resource.name, _getter(_resource))
 
 if __name__ == "__main__":
     ad = DaikinAltherma("192.168.11.100")
@@ -0,0 +1,401 @@
+"""asyncio client for the Daikin LAN adapters.
+
+Needs the `websockets` package (pip install websockets).
+
+    >>> async with AsyncDaikinAltherma('192.168.10.126') as d:
+    ...     print(await d.outdoor_temperature)
+"""
+from typing import Callable
+import asyncio
+import contextlib
+import functools
+import itertools
+import logging
+import random
+import time
+
+from . import DaikinAltherma, DaikinSnapshot, HeatingSchedule, RESOURCES, SETTINGS, SNAPSHOT_GROUPS, TIMED_OUT
+from . import codec
+from .cache import ResourceCache
+from .capabilities import CapabilityMap
+from .metrics import Instrumentation, RequestTiming
+from .schedule import Schedule
+from .writes import SETTERS, write_request
+from .subscriptions import (
+    DELETE, AsyncSubscription, container, notification_response, parse_notification, subscription_payload,
+)
+
+
+class AsyncDaikinAltherma:
+    """asyncio version of DaikinAltherma.
+
+    Properties return awaitables (`await d.indoor_temperature`) and setters
+    are coroutines. Requests may be issued concurrently: they share one
+    websocket and replies are dispatched by rqi. When the connection is
+    lost, a new one is opened and the reads in flight are sent again once;
+    the writes fail with ConnectionError.
+    """
+    UserAgent = DaikinAltherma.UserAgent
+    DAYS = DaikinAltherma.DAYS
+    DATETIME_FMT = DaikinAltherma.DATETIME_FMT
+
+    def __init__(self, adapter_ip: str, max_in_flight: int = 16, timeout: float = 2,
+                 cache: ResourceCache = None, capabilities: CapabilityMap = None,
+                 instrumentation: Instrumentation = None, max_retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 30):
+        """
+        :param adapter_ip: IP address (or hostname) of the LAN adapter
+        :type adapter_ip: str
+        :param max_in_flight: maximum number of unanswered requests, defaults to 16
+        :type max_in_flight: int, optional
+        :param timeout: timeout of a single request, in seconds, defaults to 2
+        :type timeout: float, optional
+        :param cache: cache for the values read from the adapter, defaults to no caching
+        :type cache: ResourceCache, optional
+        :param capabilities: map of the unsupported resources, which are then not
+            queried anymore, defaults to querying everything
+        :type capabilities: CapabilityMap, optional
+        :param instrumentation: gets the timings of every request, defaults to none
+        :type instrumentation: Instrumentation, optional
+        :param max_retries: attempts to reopen a lost connection, defaults to 5
+        :type max_retries: int, optional
+        :param backoff: delay before the second attempt, in seconds, doubled at each attempt, defaults to 0.5
+        :type backoff: float, optional
+        :param max_backoff: maximum delay between two attempts, in seconds, defaults to 30
+        :type max_backoff: float, optional
+        """
+        self.adapter_ip = adapter_ip
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.cache = cache
+        self.capabilities = capabilities
+        self.instrumentation = instrumentation
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._timings = {}  # rqi -> RequestTiming, when instrumented
+        self.ws = None
+        self._futures = {}
+        self._requestIds = itertools.count()
+        self._reader = None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._reconnecting = asyncio.Lock()
+        self._subscriptions = {}  # name -> AsyncSubscription
+
+    async def connect(self):
+        """Opens the websocket, and binds the capability map. Called by `async with`"""
+        await self._open()
+        if self.capabilities is not None and self.capabilities.filename is not None:
+            dvi = await self._requestValue("MNCSE-node/deviceInfo", "/m2m:rsp/pc/m2m:dvi", replays=0) or {}
+            self.capabilities.bind(f"{dvi.get('mod')}/{dvi.get('fwv')}")
+
+    async def _open(self):
+        """Opens the websocket and starts reading it"""
+        import websockets
+
+        self.ws = await websockets.connect(f"ws://{self.adapter_ip}/mca", open_timeout=self.timeout)
+        self._reader = asyncio.create_task(self._readLoop())
+
+    def reprobe(self, paths: list[str] = None):
+        """Queries again the resources that were found unsupported. See `DaikinAltherma.reprobe`"""
+        if self.capabilities is not None:
+            self.capabilities.reprobe(paths)
+
+    async def close(self):
+        """Closes the websocket and fails the pending requests"""
+        for subscription in list(self._subscriptions.values()):
+            if subscription._poller is not None:
+                subscription._poller.cancel()
+            subscription._queue.put_nowait(None)
+        self._subscriptions.clear()
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+        if self._reader is not None:
+            self._reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection closed"))
+        self._futures.clear()
+
+    async def __aenter__(self) -> 'AsyncDaikinAltherma':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _readLoop(self):
+        try:
+            async for frame in self.ws:
+                t0 = time.perf_counter()
+                result = codec.loads(frame)
+                if "m2m:rqp" in result:
+                    await self._handleNotification(result)
+                    continue
+                rqi = result["m2m:rsp"]["rqi"]
+                if rqi in self._timings:
+                    self._timings[rqi].decode = time.perf_counter() - t0
+                future = self._futures.pop(rqi, None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            # Connection closed or broken: fail the requests waiting for a reply
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Connection to the adapter lost: {e!r}"))
+            self._futures.clear()
+
+    def _newRequestId(self) -> str:
+        while True:
+            reqid = "%05x" % (next(self._requestIds) & 0xfffff)
+            if reqid not in self._futures:
+                return reqid
+
+    async def _reconnect(self, ws):
+        """Opens a new websocket, unless `ws` was already replaced or the client
+        closed, retrying with exponential backoff and jitter"""
+        async with self._reconnecting:
+            if ws is None or self.ws is not ws:
+                return
+            logging.warning(f"Connection to {self.adapter_ip} lost, reconnecting")
+            with contextlib.suppress(Exception):
+                await ws.close()
+            if self._reader is not None:
+                self._reader.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await self._reader
+                self._reader = None
+            for attempt in range(self.max_retries):
+                if attempt:
+                    delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                    await asyncio.sleep(delay * random.uniform(0.5, 1))
+                try:
+                    await self._open()
+                    return
+                except Exception as e:
+                    error = e
+                    logging.warning(f"Could not reconnect to {self.adapter_ip}: {e!r}")
+            self.ws = None
+            raise ConnectionError(f"Could not connect to the adapter: {error!r}")
+
+    async def _requestValue(self, item: str, output_path: str, payload=None, replays: int = 1):
+        if not payload and self.capabilities is not None and not self.capabilities.is_supported(item):
+            return None
+        if self.cache is not None:
+            if payload:
+                if DaikinAltherma._isWrite(payload):
+                    self.cache.invalidate(item)
+            else:
+                value = self.cache.get(item)
+                if value is not None:
+                    return value
+
+        while True:
+            ws = self.ws
+            try:
+                result, timing = await self._roundTrip(item, payload)
+                break
+            except ConnectionError:
+                if payload or replays <= 0:
+                    raise
+                replays -= 1
+                await self._reconnect(ws)
+
+        assert result["m2m:rsp"]["to"] == self.UserAgent
+        if timing is None:
+            value = DaikinAltherma._extractValue(item, result, output_path)
+        else:
+            t2 = time.perf_counter()
+            value = DaikinAltherma._extractValue(item, result, output_path)
+            timing.extract = time.perf_counter() - t2
+            timing.wait = t2 - timing.sent_at - timing.decode
+            timing.missing = value is None
+            self.instrumentation.after(timing)
+        if not payload:
+            if value is None and self.capabilities is not None:
+                self.capabilities.missing(item, result)
+            elif value is not None and self.cache is not None:
+                self.cache.put(item, value)
+        return value
+
+    async def _roundTrip(self, item: str, payload=None) -> tuple[dict, RequestTiming]:
+        """Sends one request and waits for its reply, returns the reply and the timing of the request"""
+        timing = None
+        async with self._slots:
+            if self.instrumentation is not None:
+                self.instrumentation.before(item, payload)
+                timing = RequestTiming(item=item, write=DaikinAltherma._isWrite(payload))
+            t0 = time.perf_counter()
+            reqid = self._newRequestId()
+            future = asyncio.get_running_loop().create_future()
+            self._futures[reqid] = future
+            try:
+                frame = DaikinAltherma._frame(reqid, item, payload)
+                if timing is not None:
+                    timing.rqi = reqid
+                    self._timings[reqid] = timing
+                    t1 = time.perf_counter()
+                try:
+                    await self.ws.send(frame)
+                except Exception as e:
+                    raise ConnectionError(f"Connection to the adapter lost: {e!r}") from e
+                if timing is not None:
+                    timing.sent_at = time.perf_counter()
+                    timing.serialize, timing.send = t1 - t0, timing.sent_at - t1
+                result = await asyncio.wait_for(future, self.timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError, ConnectionError) as e:
+                # Cancelled by a deadline, or by the caller: reported as timeouts
+                if timing is not None:
+                    timing.error = "connection" if isinstance(e, ConnectionError) else "timeout"
+                    self.instrumentation.after(timing)
+                raise
+            finally:
+                self._futures.pop(reqid, None)
+                self._timings.pop(reqid, None)
+        return result, timing
+
+    async def _handleNotification(self, message: dict):
+        await self.ws.send(codec.dumps(notification_response(message, self.UserAgent)))
+        notification = parse_notification(message)
+        if notification is None:
+            return
+        path, name, value = notification
+        if self.cache is not None:
+            self.cache.put(f"MNAE/{path}", value)
+        subscription = self._subscriptions.get(name)
+        if subscription is not None:
+            subscription.deliver(path, value)
+
+    async def subscribe(self, paths: list[str], callback: Callable = None, min_interval: float = 1,
+                        max_interval: float = 60) -> AsyncSubscription:
+        """Gets the changes of the values of `paths`, pushed by the adapter or
+        polled. See `DaikinAltherma.subscribe`.
+
+        :return: the subscription: an async iterator of Notification, to cancel() when done
+        :rtype: AsyncSubscription
+        """
+        subscription = AsyncSubscription(self, paths, callback, min_interval, max_interval)
+        self._subscriptions[subscription.name] = subscription
+        payload = subscription_payload(subscription.name, self.UserAgent)
+        results = await asyncio.gather(
+            *(self._requestValue(f"MNAE/{container(path)}", "/m2m:rsp/rsc", payload) for path in paths),
+            return_exceptions=True)
+        for path, rsc in zip(paths, results):
+            (subscription.pushed if rsc in (2000, 2001) else subscription.polled).append(path)
+        await subscription.start_polling()
+        return subscription
+
+    async def _unsubscribe(self, subscription: AsyncSubscription):
+        if self._subscriptions.pop(subscription.name, None) is None or self.ws is None:
+            return
+        results = await asyncio.gather(
+            *(self._requestValue(f"MNAE/{container(path)}/{subscription.name}", "/m2m:rsp/rsc", DELETE)
+              for path in subscription.pushed),
+            return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logging.warning(f"Could not delete subscription {subscription.name}: {result!r}")
+
+    async def _requestValues(self, requests: list[tuple], deadline: float = None) -> list:
+        """Sends the requests concurrently. See `DaikinAltherma._requestValues` for `deadline`"""
+        if deadline is None:
+            return await asyncio.gather(*(self._requestValue(*request) for request in requests))
+
+        async def bounded(request: tuple):
+            try:
+                return await asyncio.wait_for(self._requestValue(*request), max(0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return TIMED_OUT
+        return await asyncio.gather(*(bounded(request) for request in requests))
+
+    async def _requestValueHP(self, item: str, output_path: str = "/m2m:rsp/pc/m2m:cin/con", payload=None):
+        return await self._requestValue(f"MNAE/{item}", output_path, payload)
+
+    async def _read(self, field: str):
+        resource = RESOURCES[field]
+        return resource.parse(await self._requestValue(resource.item, resource.output_path))
+
+    async def available_services(self, unit_nr: int = 1):
+        """Does a discovery of the available services on the unit
+
+        :param unit_nr: number of the unit, normally 0..2, defaults to 1
+        :type unit_nr: int, optional
+        """
+        d = await self._requestValueHP(f"{unit_nr}/UnitProfile/la")
+        if d is None:
+            return None
+        return codec.loads(d)
+
+    async def read_many(self, paths: list[str], deadline: float = None) -> dict:
+        """Reads several resources of the unit concurrently
+
+        :param paths: resource paths below MNAE/, ex: "1/Sensor/IndoorTemperature/la"
+        :type paths: list[str]
+        :param deadline: seconds the whole read may take, after which the values
+            not read are TIMED_OUT, defaults to no limit
+        :type deadline: float, optional
+        :return: path -> raw value (None if not available)
+        :rtype: dict
+        """
+        values = await self._requestValues(
+            [(f"MNAE/{path}", "/m2m:rsp/pc/m2m:cin/con") for path in paths], DaikinAltherma._deadline(deadline))
+        return dict(zip(paths, values))
+
+    async def snapshot(self, groups: list[str] = None, deadline: float = None) -> DaikinSnapshot:
+        """Reads a group of resources concurrently. See `DaikinAltherma.snapshot`"""
+        groups, fields = DaikinAltherma._snapshotFields(groups)
+        values = await self._requestValues(
+            [(item, output_path) for item, output_path, _ in fields.values()], DaikinAltherma._deadline(deadline))
+        return DaikinAltherma._buildSnapshot(self.adapter_ip, groups, fields, values)
+
+    async def set_heating_schedule(self, schedule: HeatingSchedule | Schedule, force: bool = False) -> bool:
+        """Sets the heating schedule for the heating. See `DaikinAltherma.set_heating_schedule`"""
+        if not isinstance(schedule, Schedule):
+            schedule = Schedule.from_dict(schedule)
+        if not force and DaikinAltherma._schedulesEqual(
+                await self._requestValueHP("1/Schedule/List/Heating/la"), schedule):
+            return True
+        return (await self._requestValue(*SETTINGS["set_heating_schedule"].request(schedule)) is not None)
+
+    @property
+    def heating_error_status(self):
+        """Returns the heating status: OK or Warning or Error or Emergency"""
+        return self._snapshotField("heating_errors", "heating_error_status")
+
+    @property
+    def tank_error_status(self):
+        """Returns the tank status: OK or Warning or Error or Emergency"""
+        return self._snapshotField("tank_errors", "tank_error_status")
+
+    async def _snapshotField(self, group: str, field: str):
+        return getattr(await self.snapshot([group]), field)
+
+    async def print_all_status(self, without_schedule: bool = False, deadline: float = None):
+        groups = [g for g in SNAPSHOT_GROUPS if not (without_schedule and g == "schedules")]
+        print(DaikinAltherma._format_status(await self.snapshot(groups, deadline), without_schedule))
+
+
+def _async_getter(field: str) -> property:
+    def getter(self):
+        return self._read(field)
+    getter.__doc__ = getattr(DaikinAltherma, field).__doc__
+    return property(getter)
+
+
+def _async_setter(name: str):
+    sync_setter = getattr(DaikinAltherma, name)
+
+    @functools.wraps(sync_setter)
+    async def setter(self, *args, **kwargs) -> bool:
+        return (await self._requestValue(*write_request(name, *args, **kwargs)) is not None)
+    return setter
+
+
+for _field in RESOURCES:
+    setattr(AsyncDaikinAltherma, _field, _async_getter(_field))
+for _name in SETTERS:
+    setattr(AsyncDaikinAltherma, _name, _async_setter(_name))
@@ -0,0 +1,293 @@
+"""Benchmarks of the client against simulated adapters (see mock_adapter).
+
+    python -m daikin_altherma.benchmark --output bench.json
+
+Measures, and writes as JSON:
+- the p50/p99 latency, requests and round trips of every DaikinAltherma
+  property and of print_all_status,
+- the requests per second on a single connection, lockstep and pipelined,
+- the same over real sockets with every transport of transport.TRANSPORTS,
+  and their CPU time per request,
+- the snapshots per second of 1, 10, 100 and 1000 simulated units read
+  concurrently with AsyncDaikinAltherma (needs the `websockets` package).
+
+By default the sync client talks to an in-process adapter, which measures
+the CPU cost of the request path. Use --transport websocket (and --latency)
+to go through real sockets.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import platform
+import socket
+import threading
+import time
+
+from . import DaikinAltherma, codec, transport
+from .mock_adapter import MockAdapter, LoopbackWebSocket
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Returns the q-th percentile (0..100) of samples, nearest rank"""
+    samples = sorted(samples)
+    rank = max(0, min(len(samples) - 1, round(q / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+def _latency_stats(samples: list[float]) -> dict:
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SimulatedAdapters:
+    """Serves simulated adapters over websockets, from a background event loop.
+    Every connection gets its own MockAdapter, so N connections are N units."""
+
+    def __init__(self, **adapter_options):
+        import websockets
+
+        self.adapter_options = adapter_options
+        self.adapters = []
+        self.port = _free_port()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+        async def start():
+            return await websockets.serve(self._handler, "127.0.0.1", self.port)
+        self.server = asyncio.run_coroutine_threadsafe(start(), self.loop).result()
+
+    async def _handler(self, websocket, path: str = None):
+        adapter = MockAdapter(**self.adapter_options)
+        self.adapters.append(adapter)
+        await adapter.serve_connection(websocket, path)
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    def close(self):
+        async def stop():
+            self.server.close()
+            await self.server.wait_closed()
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class _Client:
+    """A DaikinAltherma and the way to count the requests it sends"""
+
+    def __init__(self, transport: str, latency: float, connect: str = None):
+        if transport == "loopback":
+            self.ws = LoopbackWebSocket()
+            self.daikin = DaikinAltherma("loopback", keepalive=0, connect=lambda url, timeout: self.ws)
+            self.adapter = self.ws.adapter
+            self.server = None
+        else:
+            self.server = SimulatedAdapters(latency=latency)
+            self.daikin = DaikinAltherma(self.server.address, keepalive=0, connect=connect)
+            self.daikin.unit_model  # connect
+            self.adapter = self.server.adapters[0]
+            self.ws = None
+
+    def requests(self) -> int:
+        return sum(self.adapter.requests.values())
+
+    def round_trips(self) -> int:
+        return self.ws.round_trips if self.ws is not None else None
+
+    def close(self):
+        self.daikin.close()
+        if self.server is not None:
+            self.server.close()
+
+
+def _measure(client: _Client, call, iterations: int) -> dict:
+    samples = []
+    requests, round_trips = client.requests(), client.round_trips()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - t0)
+    result = _latency_stats(samples)
+    result["requests"] = (client.requests() - requests) / iterations
+    if round_trips is not None:
+        result["round_trips"] = (client.round_trips() - round_trips) / iterations
+    return result
+
+
+def bench_properties(client: _Client, iterations: int) -> dict:
+    names = sorted(
+        name for name, attr in vars(DaikinAltherma).items()
+        if isinstance(attr, property) and not name.startswith("_") and name != "connection_stats"
+    )
+    results = {}
+    for name in names:
+        results[name] = _measure(client, lambda: getattr(client.daikin, name), iterations)
+
+    def print_all_status():
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.daikin.print_all_status()
+    results["print_all_status"] = _measure(client, print_all_status, iterations)
+    return results
+
+
+def bench_throughput(client: _Client, nb_requests: int) -> dict:
+    items = [item for item in client.adapter.state][:40]
+    batch = [items[i % len(items)] for i in range(nb_requests)]
+    d = client.daikin
+
+    t0 = time.perf_counter()
+    for item in batch:
+        d._requestValueHP(item)
+    lockstep = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    d._requestValuesHP(batch)
+    pipelined = time.perf_counter() - t0
+    return {
+        "requests": nb_requests,
+        "lockstep_requests_per_s": nb_requests / lockstep,
+        "pipelined_requests_per_s": nb_requests / pipelined,
+    }
+
+
+def bench_transports(names: list[str], nb_requests: int, latency: float) -> list[dict]:
+    results = []
+    for name in names:
+        client = _Client("websocket", latency, connect=name)
+        try:
+            cpu = time.process_time()
+            result = bench_throughput(client, nb_requests)
+            # Includes the simulated adapter, the same for every transport
+            result["cpu_us_per_request"] = (time.process_time() - cpu) / (2 * nb_requests) * 1e6
+        finally:
+            client.close()
+        results.append({"transport": name, **result})
+    return results
+
+
+async def _bench_fleet(server: SimulatedAdapters, nb_units: int, rounds: int, groups: list[str]) -> dict:
+    from .aio import AsyncDaikinAltherma
+
+    clients = [AsyncDaikinAltherma(server.address, timeout=30) for _ in range(nb_units)]
+    connecting = asyncio.Semaphore(100)
+
+    async def connect(client):
+        async with connecting:
+            await client.connect()
+    await asyncio.gather(*(connect(c) for c in clients))
+
+    requests = sum(sum(a.requests.values()) for a in server.adapters)
+    samples = []
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        t = time.perf_counter()
+        await asyncio.gather(*(c.snapshot(groups) for c in clients))
+        samples.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - t0
+    requests = sum(sum(a.requests.values()) for a in server.adapters) - requests
+
+    await asyncio.gather(*(c.close() for c in clients))
+    return {
+        "units": nb_units,
+        "sweep": _latency_stats(samples),
+        "snapshots_per_s": nb_units * rounds / elapsed,
+        "requests_per_s": requests / elapsed,
+    }
+
+
+def bench_fleet(sizes: list[int], rounds: int, latency: float, groups: list[str]) -> list[dict]:
+    # Every unit needs two sockets (client and server side)
+    try:
+        import resource
+    except ImportError:  # Windows
+        pass
+    else:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = 2 * max(sizes) + 256
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    results = []
+    for nb_units in sizes:
+        server = SimulatedAdapters(latency=latency)
+        try:
+            results.append(asyncio.run(_bench_fleet(server, nb_units, rounds, groups)))
+        finally:
+            server.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks python-daikin-altherma against simulated adapters")
+    parser.add_argument("--transport", choices=["loopback", "websocket"], default="loopback")
+    parser.add_argument("--latency", type=float, default=0, help="adapter latency in seconds (websocket transports)")
+    parser.add_argument("--iterations", type=int, default=100, help="calls per property")
+    parser.add_argument("--requests", type=int, default=1000, help="requests of the throughput benchmark")
+    parser.add_argument("--transports", default=",".join(transport.TRANSPORTS),
+                        help="transports compared over websockets, empty to skip")
+    parser.add_argument("--fleet", default="1,10,100,1000", help="fleet sizes, empty to skip")
+    parser.add_argument("--fleet-rounds", type=int, default=5)
+    parser.add_argument("--fleet-groups", default="sensors,status")
+    parser.add_argument("--output", help="JSON file, defaults to stdout")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "transport": args.transport,
+            "codec": codec.current().name,
+            "latency_s": args.latency,
+            "iterations": args.iterations,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+    }
+
+    client = _Client(args.transport, args.latency)
+    try:
+        results["properties"] = bench_properties(client, args.iterations)
+        results["print_all_status"] = results["properties"].pop("print_all_status")
+        results["throughput"] = bench_throughput(client, args.requests)
+    finally:
+        client.close()
+
+    # The transports and the fleet are benchmarked over websockets
+    has_websockets = importlib.util.find_spec("websockets") is not None
+    if args.transports:
+        if not has_websockets:
+            results["transports"] = "skipped: websockets is not installed"
+        else:
+            results["transports"] = bench_transports(args.transports.split(","), args.requests, args.latency)
+
+    if args.fleet:
+        if not has_websockets:
+            results["fleet"] = "skipped: websockets is not installed"
+        else:
+            sizes = [int(n) for n in args.fleet.split(",")]
+            results["fleet"] = bench_fleet(sizes, args.fleet_rounds, args.latency, args.fleet_groups.split(","))
+
+    out = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import collections
+import threading
+import time
+
+
+class ResourceCache:
+    """LRU cache of the values read from an adapter, keyed by resource path
+    (ex: "MNAE/1/UnitInfo/ModelNumber/la").
+
+    Every path belongs to a category (see `CATEGORIES`) which gives how long
+    its values are kept. Writing to a resource invalidates its cached values.
+    """
+
+    # Seconds a value is kept, per category. 0 disables caching
+    DEFAULT_TTLS = {
+        "static": 24 * 3600,  # models, software versions, unit profiles
+        "slow": 60,  # date/time, consumption, schedules
+        "live": 0,  # sensors, setpoints and states
+    }
+
+    # (path fragment, category): the first matching fragment wins,
+    # paths matching none of them are "live"
+    CATEGORIES = [
+        ("MNCSE-node/deviceInfo", "static"),
+        ("/UnitInfo/", "static"),
+        ("/UnitProfile/", "static"),
+        ("/DateTime/", "slow"),
+        ("/Consumption/", "slow"),
+        ("/Schedule/List/", "slow"),
+    ]
+
+    def __init__(self, ttls: dict = None, max_size: int = 128):
+        """
+        :param ttls: category -> seconds, overrides DEFAULT_TTLS
+        :type ttls: dict, optional
+        :param max_size: maximum number of cached values, defaults to 128
+        :type max_size: int, optional
+        """
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()  # path -> (expiry, value)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def category(cls, path: str) -> str:
+        """Returns the category of a resource path"""
+        for fragment, category in cls.CATEGORIES:
+            if fragment in path:
+                return category
+        return "live"
+
+    def get(self, path: str):
+        """Returns the cached value of `path`, or None"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            expiry, value = entry
+            if expiry <= time.monotonic():
+                del self._entries[path]
+                return None
+            self._entries.move_to_end(path)
+            return value
+
+    def put(self, path: str, value):
+        """Caches `value` for `path`, if its category is cached"""
+        ttl = self.ttls[self.category(path)]
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[path] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path: str):
+        """Drops the cached values of `path` and of the resources below it,
+        ex: writing MNAE/1/Operation/TargetTemperature drops its /la value"""
+        with self._lock:
+            for key in [k for k in self._entries if k == path or k.startswith(path + "/")]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import threading
+
+
+class CapabilityMap:
+    """Remembers the resource paths an adapter does not support, so that
+    they are not queried again.
+
+    Paths are learned from the first failed reads. The map can be saved to
+    a JSON file where it is stored per adapter model and firmware version,
+    see `bind`.
+    """
+
+    def __init__(self, filename: str = None):
+        """
+        :param filename: JSON file to load the map from and save it to, defaults to in-memory only
+        :type filename: str, optional
+        """
+        self.filename = filename
+        self.key = None
+        self.unsupported = set()
+        self._lock = threading.Lock()
+
+    def bind(self, key: str):
+        """Selects the adapter the map is for, and loads what is known about it
+
+        :param key: adapter identifier, ex: "BRP069A61/1.2.3"
+        :type key: str
+        """
+        known = set()
+        if self.filename is not None and os.path.exists(self.filename):
+            with open(self.filename) as f:
+                known = set(json.load(f).get(key, []))
+        with self._lock:
+            # Keep the paths found missing on this adapter before it was bound
+            learned = self.unsupported - known if self.key is None else set()
+            self.key = key
+            self.unsupported = known | learned
+        if learned:
+            self.save()
+
+    def is_supported(self, path: str) -> bool:
+        return path not in self.unsupported
+
+    def missing(self, path: str, result: dict):
+        """Records that reading `path` returned no value
+
+        :param path: the resource path
+        :type path: str
+        :param result: the m2m:rsp reply of the adapter
+        :type result: dict
+        """
+        rsc = result.get("m2m:rsp", {}).get("rsc")
+        if rsc is not None and int(rsc) >= 5000:
+            # Server side error, ex: the unit is starting up
+            return
+        with self._lock:
+            if path in self.unsupported:
+                return
+            self.unsupported.add(path)
+        logging.info(f"Item {path} is not supported, it will not be queried anymore")
+        self.save()
+
+    def reprobe(self, paths: list[str] = None):
+        """Forgets that paths are unsupported, so that they are queried again
+
+        :param paths: paths to forget, defaults to all of them
+        :type paths: list[str], optional
+        """
+        with self._lock:
+            if paths is None:
+                self.unsupported.clear()
+            else:
+                self.unsupported.difference_update(paths)
+        self.save()
+
+    def save(self):
+        """Writes the map to `filename`, if the map is bound to an adapter"""
+        if self.filename is None or self.key is None:
+            return
+        maps = {}
+        if os.path.exists(self.filename):
+            with open(self.filename) as f:
+                maps = json.load(f)
+        with self._lock:
+            maps[self.key] = sorted(self.unsupported)
+        tmp = f"{self.filename}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(maps, f, indent=2)
+        os.replace(tmp, self.filename)
@@ -0,0 +1,253 @@
+"""Recording and replay of the frames exchanged with an adapter.
+
+A capture file has one JSON line per frame: [seconds since the start of
+the recording, "s" (sent) or "r" (received), frame], gzipped if its name
+ends with .gz. Record the traffic of a real adapter:
+
+    >>> with Recording('unit.capture.gz') as recording:
+    ...     DaikinAltherma('192.168.10.126', connect=recording).print_all_status()
+
+and replay it later, without the adapter:
+
+    >>> d = DaikinAltherma('unit', connect=Replay('unit.capture.gz', delay_scale=1))
+
+The requests are answered with the replies recorded for the same request
+(operation, path and content), with the rqi of the new request, after the
+recorded delay multiplied by `delay_scale` (0: at once). Requests that got no
+reply in the recording time out, requests that were not recorded are
+answered as missing resources. The notifications of the subscriptions
+are not replayed.
+"""
+from typing import Callable
+from dataclasses import dataclass
+import collections
+import gzip
+import heapq
+import json
+import logging
+import re
+import threading
+import time
+
+from websocket import create_connection, WebSocketTimeoutException
+
+_HEADER = {"format": "daikin-capture", "version": 1}
+SENT, RECEIVED = "s", "r"
+
+_RQI = re.compile(r'"rqi"\s*:\s*"([^"\\]*)"')
+_TIMEOUT = object()  # replies of the requests which were not answered
+
+
+@dataclass(frozen=True)
+class CapturedFrame:
+    time: float  # seconds since the start of the recording
+    direction: str  # SENT or RECEIVED
+    frame: str
+
+
+def _open(filename: str, mode: str):
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode + "t", encoding="utf-8")
+    return open(filename, mode, encoding="utf-8")
+
+
+def load(filename: str) -> list[CapturedFrame]:
+    """Returns the frames of a capture file"""
+    with _open(filename, "r") as f:
+        if json.loads(f.readline()) != _HEADER:
+            raise ValueError(f"{filename} is not a capture file of this version")
+        return [CapturedFrame(*json.loads(line)) for line in f if line.strip()]
+
+
+class Recording:
+    """Records the frames of the connections it opens. To pass as `connect`
+    to DaikinAltherma"""
+
+    def __init__(self, filename: str, connect: Callable = create_connection):
+        """
+        :param filename: capture file, overwritten
+        :type filename: str
+        :param connect: opens the real websocket, defaults to websocket-client's create_connection
+        :type connect: Callable, optional
+        """
+        self.filename = filename
+        self._connect = connect
+        self._file = _open(filename, "w")
+        self._file.write(json.dumps(_HEADER) + "\n")
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str, timeout: float = None, **options) -> 'RecordingWebSocket':
+        return RecordingWebSocket(self._connect(url, timeout=timeout, **options), self)
+
+    def write(self, direction: str, frame: str):
+        line = json.dumps([round(time.monotonic() - self._start, 6), direction, frame])
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'Recording':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingWebSocket:
+    """Websocket writing the frames it sends and receives to a Recording"""
+
+    def __init__(self, ws, recording: Recording):
+        self.ws = ws
+        self.recording = recording
+
+    def send(self, frame: str):
+        self.recording.write(SENT, frame)
+        return self.ws.send(frame)
+
+    def recv(self) -> str:
+        frame = self.ws.recv()
+        self.recording.write(RECEIVED, frame)
+        return frame
+
+    def ping(self):
+        self.ws.ping()
+
+    def gettimeout(self) -> float:
+        return self.ws.gettimeout()
+
+    def settimeout(self, timeout: float):
+        self.ws.settimeout(timeout)
+
+    def close(self):
+        self.ws.close()
+
+
+def _requestKey(message: dict) -> tuple:
+    """Identifies a request whatever the codec that serialised it: the JSON
+    cons, like the schedules, are compared decoded"""
+    rqp = message["m2m:rqp"]
+    pc = rqp.get("pc")
+    cin = pc.get("m2m:cin") if isinstance(pc, dict) else None
+    if cin is not None and isinstance(cin.get("con"), str):
+        try:
+            pc = {**pc, "m2m:cin": {**cin, "con": json.loads(cin["con"])}}
+        except ValueError:
+            pass  # a plain text value
+    return (rqp.get("op"), rqp.get("ty"), rqp.get("to"), json.dumps(pc, sort_keys=True))
+
+
+class Replay:
+    """Replays a capture file: every connection it opens answers like the
+    recorded adapter. To pass as `connect` to DaikinAltherma"""
+
+    def __init__(self, filename: str, delay_scale: float = 0):
+        """
+        :param filename: capture file
+        :type filename: str
+        :param delay_scale: multiplies the recorded delays of the replies: 1 replays at
+            the original timing, 2 twice slower, 0 as fast as possible, defaults to 0
+        :type delay_scale: float, optional
+        """
+        self.filename = filename
+        self.delay_scale = delay_scale
+        # request key -> [(delay, reply template or _TIMEOUT, ...)] of every time it was sent
+        self.exchanges: dict[tuple, list[list]] = collections.defaultdict(list)
+        self._index(load(filename))
+
+    def _index(self, frames: list[CapturedFrame]):
+        sent = {}  # rqi -> (time, replies) of the requests waiting for their reply
+        for captured in frames:
+            message = json.loads(captured.frame)
+            if captured.direction == SENT:
+                if "m2m:rqp" not in message:  # acknowledgement of a notification
+                    continue
+                replies = []
+                self.exchanges[_requestKey(message)].append(replies)
+                sent[message["m2m:rqp"]["rqi"]] = (captured.time, replies)
+            elif "m2m:rsp" in message and message["m2m:rsp"].get("rqi") in sent:
+                t, replies = sent.pop(message["m2m:rsp"]["rqi"])
+                replies.append((captured.time - t, _template(captured.frame)))
+        for _, replies in sent.values():
+            replies.append((None, _TIMEOUT))
+
+    def __call__(self, url: str = None, timeout: float = 2, **options) -> 'ReplayWebSocket':
+        return ReplayWebSocket(self, timeout)
+
+
+def _template(frame: str) -> tuple[str, str]:
+    """Splits a reply around the value of its rqi"""
+    m = _RQI.search(frame)
+    return frame[:m.start(1)], frame[m.end(1):]
+
+
+class ReplayWebSocket:
+    """websocket-client lookalike answering from a Replay"""
+
+    def __init__(self, replay: Replay, timeout: float = 2):
+        self.replay = replay
+        self.timeout = timeout
+        self.unmatched = []  # requests which were not recorded
+        self._used = collections.Counter()  # request key -> times it was answered
+        self._pending = []  # heap of (due time, sequence, frame)
+        self._sequence = 0
+        self._received = threading.Condition()
+
+    def _push(self, due: float, frame):
+        heapq.heappush(self._pending, (due, self._sequence, frame))
+        self._sequence += 1
+        self._received.notify()
+
+    def send(self, frame: str):
+        message = json.loads(frame)
+        if "m2m:rqp" not in message:
+            return
+        rqi = message["m2m:rqp"]["rqi"]
+        key = _requestKey(message)
+        now = time.monotonic()
+        with self._received:
+            exchanges = self.replay.exchanges.get(key)
+            if not exchanges:
+                logging.warning(f"Request not in the capture: {frame}")
+                self.unmatched.append(frame)
+                reply = {"rqi": rqi, "to": message["m2m:rqp"]["fr"], "rsc": 4004}
+                self._push(now, json.dumps({"m2m:rsp": reply}))
+                return
+            # The n-th same request gets the n-th recorded replies, the last ones once they run out
+            replies = exchanges[min(self._used[key], len(exchanges) - 1)]
+            self._used[key] += 1
+            for delay, reply in replies:
+                if reply is _TIMEOUT:
+                    self._push(now + self.timeout * self.replay.delay_scale, _TIMEOUT)
+                else:
+                    prefix, suffix = reply
+                    self._push(now + delay * self.replay.delay_scale, prefix + rqi + suffix)
+
+    def recv(self) -> str:
+        with self._received:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                now = time.monotonic()
+                if self._pending and self._pending[0][0] <= now:
+                    _, _, frame = heapq.heappop(self._pending)
+                    if frame is _TIMEOUT:
+                        raise WebSocketTimeoutException("Connection timed out (no reply in the capture)")
+                    return frame
+                wait = min(self._pending[0][0], deadline) if self._pending else deadline
+                if wait <= now:
+                    raise WebSocketTimeoutException("Connection timed out")
+                self._received.wait(wait - now)
+
+    def ping(self):
+        pass
+
+    def gettimeout(self) -> float:
+        return self.timeout
+
+    def settimeout(self, timeout: float):
+        self.timeout = timeout
+
+    def close(self):
+        pass
@@ -0,0 +1,92 @@
+"""JSON encoding and decoding of the frames.
+
+Uses orjson when it is installed (pip install orjson), which decodes the
+replies about 3 times faster than the json module; `use()` selects
+another codec.
+
+The con of some resources (schedules, profiles) is itself JSON. It is
+only decoded by the parsers of the values actually read, through
+`decode_con`, which keeps the latest decoded ones: the same schedule
+read again, or on other units, is not decoded again.
+"""
+import functools
+import json
+
+
+class JsonCodec:
+    """Codec of the json module"""
+    name = "json"
+
+    def loads(self, s: str | bytes):
+        return json.loads(s)
+
+    def dumps(self, obj) -> str:
+        return json.dumps(obj)
+
+
+class OrjsonCodec(JsonCodec):
+    """Codec of orjson"""
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def loads(self, s: str | bytes):
+        return self._orjson.loads(s)
+
+    def dumps(self, obj) -> str:
+        return self._orjson.dumps(obj).decode()
+
+
+CODECS = {
+    "json": JsonCodec,
+    "orjson": OrjsonCodec,
+}
+
+_codec: JsonCodec = None
+
+
+def use(codec: str | JsonCodec = None) -> JsonCodec:
+    """Selects the codec of all the clients
+
+    :param codec: a name of CODECS, or a codec, defaults to orjson if installed, json otherwise
+    :type codec: str or JsonCodec, optional
+    :return: the codec
+    :rtype: JsonCodec
+    """
+    global _codec
+    if codec is None:
+        try:
+            codec = OrjsonCodec()
+        except ImportError:
+            codec = JsonCodec()
+    elif isinstance(codec, str):
+        codec = CODECS[codec]()
+    _codec = codec
+    decode_con.cache_clear()
+    return codec
+
+
+def current() -> JsonCodec:
+    """Returns the codec in use"""
+    return _codec
+
+
+def loads(s: str | bytes):
+    return _codec.loads(s)
+
+
+def dumps(obj) -> str:
+    return _codec.dumps(obj)
+
+
+@functools.lru_cache(maxsize=256)
+def decode_con(con: str):
+    """Returns the decoded JSON of a con. The decoded values are shared
+    between the callers: they must not be modified"""
+    return _codec.loads(con)
+
+
+use()
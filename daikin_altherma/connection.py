@@ -0,0 +1,194 @@
+from typing import Callable
+from dataclasses import dataclass, replace
+import logging
+import random
+import threading
+import time
+
+from websocket import WebSocketException, WebSocketTimeoutException
+
+
+@dataclass
+class ConnectionStats:
+    """Health of the connection to an adapter"""
+    connected: bool = False
+    connects: int = 0  # successful connections, including the first one
+    reconnects: int = 0
+    failures: int = 0  # failed connection attempts and dropped connections
+    replayed_requests: int = 0
+    pings: int = 0
+    last_error: str = None
+    connected_since: float = None  # time.time() of the last connection
+    last_activity: float = None  # time.monotonic() of the last frame
+
+
+def _recvWithin(ws, timeout: float) -> str:
+    """Receives a frame, waiting `timeout` seconds at most if the websocket
+    has settimeout/gettimeout"""
+    if not hasattr(ws, "settimeout"):
+        return ws.recv()
+    previous = ws.gettimeout()
+    if previous is not None and previous <= timeout:
+        return ws.recv()
+    ws.settimeout(timeout)
+    try:
+        return ws.recv()
+    finally:
+        ws.settimeout(previous)
+
+
+class Connection:
+    """Websocket to an adapter that is opened on first use, kept alive with
+    pings, and reopened with exponential backoff when it drops.
+
+    Has the send/recv/close interface of a websocket-client WebSocket.
+    Errors of a dropped connection are raised as ConnectionError.
+    """
+
+    def __init__(self, connect: Callable, keepalive: float = 30, max_retries: int = 5,
+                 backoff: float = 0.5, max_backoff: float = 30):
+        """
+        :param connect: opens and returns a new websocket
+        :type connect: Callable
+        :param keepalive: seconds of inactivity after which a ping is sent, 0 disables them, defaults to 30
+        :type keepalive: float, optional
+        :param max_retries: connection attempts before giving up, defaults to 5
+        :type max_retries: int, optional
+        :param backoff: delay before the first retry, in seconds, doubled at each retry, defaults to 0.5
+        :type backoff: float, optional
+        :param max_backoff: maximum delay between two retries, in seconds, defaults to 30
+        :type max_backoff: float, optional
+        """
+        self._connect = connect
+        self.keepalive = keepalive
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.ws = None
+        self.generation = 0  # incremented at every new connection
+        self._stats = ConnectionStats()
+        self._lock = threading.RLock()
+        self._connected = threading.Event()
+        self._closing = threading.Event()
+        self._pinger = None
+
+    @property
+    def stats(self) -> ConnectionStats:
+        """Returns a copy of the connection health metrics"""
+        with self._lock:
+            return replace(self._stats, connected=self.ws is not None)
+
+    @property
+    def connected(self) -> bool:
+        return self.ws is not None
+
+    def connect(self):
+        """Opens the websocket if it is not, retrying with exponential backoff and jitter"""
+        with self._lock:
+            if self.ws is not None:
+                return
+            self._closing.clear()
+            for attempt in range(self.max_retries):
+                if attempt:
+                    delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                    time.sleep(delay * random.uniform(0.5, 1))
+                try:
+                    self.ws = self._connect()
+                    break
+                except (WebSocketException, OSError) as e:
+                    self._failed(e)
+            else:
+                raise ConnectionError(f"Could not connect to the adapter: {self._stats.last_error}")
+
+            if self._stats.connects:
+                self._stats.reconnects += 1
+            self._stats.connects += 1
+            self._stats.connected_since = time.time()
+            self._stats.last_activity = time.monotonic()
+            self.generation += 1
+            self._connected.set()
+            if self.keepalive and (self._pinger is None or not self._pinger.is_alive()):
+                self._pinger = threading.Thread(target=self._pingLoop, name="daikin-keepalive", daemon=True)
+                self._pinger.start()
+
+    def wait_connected(self, timeout: float) -> bool:
+        return self._connected.wait(timeout)
+
+    def drop(self, generation: int = None):
+        """Closes the websocket after an error, it will be reopened on next use.
+
+        :param generation: only drop if the websocket is still this one, defaults to the current one
+        :type generation: int, optional
+        """
+        with self._lock:
+            if self.ws is None or (generation is not None and generation != self.generation):
+                return
+            self._connected.clear()
+            ws, self.ws = self.ws, None
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+    def _failed(self, e: Exception):
+        logging.warning(f"Connection to the adapter failed: {e}")
+        self._stats.failures += 1
+        self._stats.last_error = repr(e)
+
+    def _call(self, method: str | Callable, *args):
+        if self.ws is None:
+            self.connect()
+        generation, ws = self.generation, self.ws
+        try:
+            r = method(ws, *args) if callable(method) else getattr(ws, method)(*args)
+        except WebSocketTimeoutException:
+            raise
+        except (WebSocketException, OSError) as e:
+            with self._lock:
+                if generation == self.generation:
+                    self._failed(e)
+            self.drop(generation)
+            raise ConnectionError(f"Connection to the adapter lost: {e}") from e
+        self._stats.last_activity = time.monotonic()
+        return r
+
+    def send(self, frame: str):
+        return self._call("send", frame)
+
+    def recv(self, timeout: float = None) -> str:
+        """Returns the next frame
+
+        :param timeout: seconds to wait at most, when shorter than the timeout of
+            the websocket (if it has settimeout), defaults to the latter
+        :type timeout: float, optional
+        """
+        if timeout is None:
+            return self._call("recv")
+        return self._call(_recvWithin, timeout)
+
+    def ping(self):
+        self._call("ping")
+        self._stats.pings += 1
+
+    def count_replayed(self, nb_requests: int):
+        with self._lock:
+            self._stats.replayed_requests += nb_requests
+
+    def close(self):
+        self._closing.set()
+        self.drop()
+
+    def _pingLoop(self):
+        while not self._closing.wait(self.keepalive / 2):
+            if self.ws is None:
+                continue
+            if time.monotonic() - self._stats.last_activity < self.keepalive:
+                continue
+            try:
+                self.ping()
+            except (ConnectionError, WebSocketException):
+                # Reconnect now, rather than on next use
+                try:
+                    self.connect()
+                except ConnectionError:
+                    pass
@@ -0,0 +1,221 @@
+"""Prometheus exporter for one or many adapters.
+
+    python -m daikin_altherma.exporter --adapter 192.168.10.126 --adapter 192.168.10.127 --port 9101
+
+Every adapter is read with one batched snapshot, at most every
+--min-interval seconds whatever the number of scrapes: concurrent scrapes
+wait for the same read. The read is bounded by --scrape-timeout: the
+values not read by then are left out. When an adapter answers none
+of its sensors and states (cached values do not count), its last values
+are served and daikin_data_age_seconds tells how old they are.
+"""
+from typing import Callable
+import argparse
+import http.server
+import logging
+import threading
+import time
+
+from . import RESOURCES, SNAPSHOT_GROUPS, DaikinAltherma, DaikinSnapshot
+from .cache import ResourceCache
+from .metrics import Instrumentation, MetricsRegistry
+
+GROUPS = ["unit_info", "sensors", "status", "heating_errors", "tank_errors", "consumption"]
+# Fields never answered by a cache: a read where none of them came back failed
+_LIVE_FIELDS = frozenset(SNAPSHOT_GROUPS["sensors"]) | frozenset(SNAPSHOT_GROUPS["status"])
+
+# Help of the gauges, see Resource.metric
+HELP = {
+    "daikin_temperature_celsius": "Measured temperatures",
+    "daikin_setpoint_celsius": "Target temperatures",
+    "daikin_holiday_mode": "1 if the holiday mode is on",
+    "daikin_enabled": "1 if enabled",
+    "daikin_tank_powerful": "1 if the tank is in powerful mode",
+    "daikin_active": "1 if currently running",
+    "daikin_installer_state": "1 if in installer mode",
+    "daikin_error": "1 if in error",
+    "daikin_warning": "1 if there is a warning",
+    "daikin_emergency": "1 if in emergency state",
+}
+
+# DaikinSnapshot field -> (metric, labels), for the resources having a gauge
+GAUGES = {name: resource.metric for name, resource in RESOURCES.items() if resource.metric is not None}
+
+# Part of the scrape timeout given to the snapshot, the rest is for serving it
+DEADLINE_SHARE = 0.8
+
+CONSUMPTIONS = {
+    "heating_power_consumption": "heating",
+    "tank_power_consumption": "tank",
+}
+
+
+class AdapterCollector:
+    """Reads the snapshots of one adapter, at most every `min_interval`
+    seconds. Concurrent callers share the same read."""
+
+    def __init__(self, client_factory: Callable[[], DaikinAltherma], address: str, min_interval: float = 10):
+        self.address = address
+        self.min_interval = min_interval
+        self._client_factory = client_factory
+        self._client = None
+        self._lock = threading.Lock()
+        self._refreshing = None  # Event set when the refresh in progress ends
+        self.snapshot: DaikinSnapshot = None
+        self.updated_at: float = None  # time.monotonic() of the snapshot
+        self.last_error: str = None
+        self.refreshes = 0
+
+    def _refresh(self, done: threading.Event, deadline: float):
+        try:
+            if self._client is None:
+                self._client = self._client_factory()
+            snapshot = self._client.snapshot(GROUPS, deadline=deadline)
+            if _LIVE_FIELDS.issubset(snapshot.timed_out):
+                raise TimeoutError(f"No sensor or status read within {deadline:.1f}s")
+            with self._lock:
+                self.snapshot, self.updated_at, self.last_error = snapshot, time.monotonic(), None
+                self.refreshes += 1
+        except Exception as e:
+            logging.warning(f"Could not read adapter {self.address}: {e!r}")
+            with self._lock:
+                self.last_error = repr(e)
+        finally:
+            with self._lock:
+                self._refreshing = None
+            done.set()
+
+    def age(self) -> float:
+        if self.updated_at is None:
+            return None
+        return time.monotonic() - self.updated_at
+
+    def collect(self, timeout: float) -> tuple[DaikinSnapshot, float]:
+        """Returns the latest snapshot and its age in seconds, refreshing it
+        if it is older than `min_interval`. Waits for at most `timeout` seconds,
+        the refresh returns the values read by then"""
+        with self._lock:
+            age = self.age()
+            if age is not None and age < self.min_interval:
+                return self.snapshot, age
+            done = self._refreshing
+            if done is None:
+                done = self._refreshing = threading.Event()
+                threading.Thread(
+                    target=self._refresh, args=(done, timeout * DEADLINE_SHARE), daemon=True).start()
+        done.wait(timeout)
+        with self._lock:
+            return self.snapshot, self.age()
+
+
+def render(collectors: list[AdapterCollector], timeout: float, instrumentation: Instrumentation = None) -> str:
+    """Returns the metrics of all the adapters, in the Prometheus text format"""
+    # Start all the refreshes before waiting for any of them
+    results = [None] * len(collectors)
+
+    def collect(i: int):
+        results[i] = collectors[i].collect(timeout)
+    threads = [threading.Thread(target=collect, args=(i,)) for i in range(len(collectors))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    r = MetricsRegistry()
+    r.describe("daikin_up", "1 if the adapter was read, and its last read succeeded")
+    r.describe("daikin_data_age_seconds", "Age of the values served for the adapter")
+    r.describe("daikin_consumption_kwh", "Electrical consumption per [D]ay (2h slots), [W]eek (days), [M]onth")
+    r.describe("daikin_info", "Adapter and unit models")
+    for metric, help in HELP.items():
+        r.describe(metric, help)
+
+    for collector, (snapshot, age) in zip(collectors, results):
+        adapter = collector.address
+        r.set("daikin_up", 0 if snapshot is None or collector.last_error else 1, adapter=adapter)
+        if snapshot is None:
+            continue
+        r.set("daikin_data_age_seconds", round(age, 3), adapter=adapter)
+        r.set("daikin_info", 1, adapter=adapter, adapter_model=snapshot.adapter_model or "",
+              unit_model=snapshot.unit_model or "", unit_type=snapshot.unit_type or "")
+        for field, (metric, labels) in GAUGES.items():
+            value = getattr(snapshot, field)
+            if value is not None:
+                r.set(metric, float(value), adapter=adapter, **labels)
+        for field, unit in CONSUMPTIONS.items():
+            for source, modes in (getattr(snapshot, field) or {}).items():
+                for mode, periods in modes.items():
+                    for period, values in periods.items():
+                        for slot, value in enumerate(values):
+                            if value is not None:
+                                r.set("daikin_consumption_kwh", value, adapter=adapter, unit=unit,
+                                      source=source, mode=mode, period=period, slot=slot)
+
+    text = r.to_prometheus()
+    if instrumentation is not None:
+        text += instrumentation.registry.to_prometheus()
+    return text
+
+
+class Exporter:
+    """HTTP server serving the metrics of adapters on /metrics"""
+
+    def __init__(self, adapters: list[str], host: str = "", port: int = 9101, min_interval: float = 10,
+                 scrape_timeout: float = 5, client_factory: Callable[[str], DaikinAltherma] = None):
+        self.instrumentation = Instrumentation()
+        if client_factory is None:
+            def client_factory(address: str) -> DaikinAltherma:
+                return DaikinAltherma(address, cache=ResourceCache(), instrumentation=self.instrumentation)
+        self.collectors = [
+            AdapterCollector(lambda address=address: client_factory(address), address, min_interval)
+            for address in adapters
+        ]
+        self.scrape_timeout = scrape_timeout
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render(exporter.collectors, exporter.scrape_timeout, exporter.instrumentation).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prometheus exporter for Daikin Altherma LAN adapters")
+    parser.add_argument("--adapter", action="append", required=True, help="adapter address, can be repeated")
+    parser.add_argument("--host", default="")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--min-interval", type=float, default=10,
+                        help="minimum seconds between two reads of an adapter")
+    parser.add_argument("--scrape-timeout", type=float, default=5,
+                        help="seconds to wait for an adapter before serving its last values")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    exporter = Exporter(args.adapter, args.host, args.port, args.min_interval, args.scrape_timeout)
+    logging.info(f"Serving metrics of {len(args.adapter)} adapters on :{args.port}/metrics")
+    try:
+        exporter.serve_forever()
+    except KeyboardInterrupt:
+        exporter.shutdown()
+
+
+if __name__ == "__main__":
+    main()
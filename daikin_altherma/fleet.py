@@ -0,0 +1,273 @@
+"""Concurrent polling of many adapters.
+
+    >>> fleet = Fleet(['192.168.10.126', '192.168.10.127'], concurrency=100, deadline=5)
+    >>> async for result in fleet.poll(['sensors', 'status']):
+    ...     print(result.address, result.snapshot.indoor_temperature if result.ok else result.error)
+
+Results are streamed as soon as each unit is read, so a slow or dead
+adapter only delays itself. The values a unit did not send before the
+deadline are left out, see DaikinSnapshot.timed_out. `poll_sharded` spreads a fleet over several
+worker processes when one core is not enough.
+
+`deploy_schedule` rolls a heating schedule out the same way: it is only
+written to the units having another one, and read back to verify it.
+
+    >>> async for result in fleet.deploy_schedule(schedule):
+    ...     print(result.address, result.status, result.error or "")
+"""
+from typing import Awaitable, AsyncIterator, Callable, Iterator
+from dataclasses import dataclass, replace
+import asyncio
+import logging
+import multiprocessing
+import time
+
+from . import SNAPSHOT_GROUPS, DaikinAltherma, DaikinSnapshot, HeatingSchedule, codec
+from .aio import AsyncDaikinAltherma
+from .schedule import Schedule
+
+
+@dataclass(frozen=True)
+class FleetResult:
+    """Result of reading one unit of a fleet"""
+    address: str
+    snapshot: DaikinSnapshot = None  # may miss the values not read before the deadline
+    error: str = None  # "deadline" if nothing was read in time, the exception otherwise
+    elapsed: float = 0  # seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class DeploymentResult:
+    """Result of deploying a schedule to one unit of a fleet"""
+    address: str
+    status: str  # "unchanged", "updated", "failed", "unsupported", or "outdated" in dry runs
+    error: str = None  # why it failed
+    changes: list = None  # slots that differed, see Schedule.diff
+    elapsed: float = 0  # seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("unchanged", "updated")
+
+
+class Fleet:
+    """Polls groups of resources (see SNAPSHOT_GROUPS) on many adapters at once"""
+
+    def __init__(self, addresses: list[str], concurrency: int = 100, deadline: float = 10,
+                 min_interval: float = 1, client_factory: Callable[[str], AsyncDaikinAltherma] = None):
+        """
+        :param addresses: addresses of the adapters
+        :type addresses: list[str]
+        :param concurrency: maximum number of units read at the same time, defaults to 100
+        :type concurrency: int, optional
+        :param deadline: seconds after which the read of a unit is abandoned, defaults to 10
+        :type deadline: float, optional
+        :param min_interval: minimum seconds between two reads of the same adapter, defaults to 1
+        :type min_interval: float, optional
+        :param client_factory: creates the client of an adapter, defaults to AsyncDaikinAltherma
+        :type client_factory: Callable[[str], AsyncDaikinAltherma], optional
+        """
+        self.addresses = list(addresses)
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.min_interval = min_interval
+        self._client_factory = client_factory or AsyncDaikinAltherma
+        self._clients = {}  # address -> connected client
+        self._last_poll = {}  # address -> time.monotonic() of the last read
+        self._slots = None
+
+    def shard(self, index: int, count: int) -> 'Fleet':
+        """Returns the `index`-th of `count` disjoint parts of the fleet"""
+        return Fleet(self.addresses[index::count], self.concurrency, self.deadline,
+                     self.min_interval, self._client_factory)
+
+    async def _client(self, address: str) -> AsyncDaikinAltherma:
+        client = self._clients.get(address)
+        if client is None:
+            client = self._client_factory(address)
+            self._clients[address] = client  # closed by _drop if the connection fails
+            await client.connect()
+        return client
+
+    async def _drop(self, address: str):
+        client = self._clients.pop(address, None)
+        if client is not None:
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+    async def _run(self, address: str,
+                   work: Callable[[AsyncDaikinAltherma, float], Awaitable]) -> tuple[object, str, float]:
+        """Runs `work(client, seconds left before the deadline)` on the adapter
+        at `address`, within the rate limit and the concurrency limit. `work`
+        must end by the deadline, raising asyncio.TimeoutError if it cannot.
+
+        :return: (result, error, elapsed): error is None on success, "deadline" if
+            the unit was too slow, the exception otherwise
+        """
+        # Per host rate limit
+        last = self._last_poll.get(address)
+        if last is not None:
+            wait = last + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        async with self._slots:
+            t0 = time.monotonic()
+            self._last_poll[address] = t0
+
+            try:
+                client = await asyncio.wait_for(self._client(address), self.deadline)
+                result = await work(client, max(0, t0 + self.deadline - time.monotonic()))
+                return result, None, time.monotonic() - t0
+            except asyncio.TimeoutError:
+                error = "deadline"
+            except Exception as e:
+                error = repr(e)
+            logging.warning(f"Could not reach {address}: {error}")
+            await self._drop(address)
+            return None, error, time.monotonic() - t0
+
+    async def _read(self, address: str, groups: list[str]) -> FleetResult:
+        async def read(client: AsyncDaikinAltherma, left: float) -> DaikinSnapshot:
+            snapshot = await client.snapshot(groups, deadline=left)
+            if len(snapshot.timed_out) == sum(len(SNAPSHOT_GROUPS[group]) for group in snapshot.groups):
+                raise asyncio.TimeoutError()
+            return snapshot
+
+        snapshot, error, elapsed = await self._run(address, read)
+        return FleetResult(address, snapshot, error, elapsed)
+
+    def _start(self, coroutines: list) -> list[asyncio.Task]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return [asyncio.create_task(coroutine) for coroutine in coroutines]
+
+    @staticmethod
+    async def _completed(tasks: list[asyncio.Task]) -> AsyncIterator:
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def poll(self, groups: list[str] = None) -> AsyncIterator[FleetResult]:
+        """Reads `groups` (defaults to all) on every adapter, yielding the
+        results as they complete"""
+        async for result in self._completed(self._start(self._read(address, groups) for address in self.addresses)):
+            yield result
+
+    async def poll_all(self, groups: list[str] = None) -> list[FleetResult]:
+        """Reads `groups` on every adapter, returns the results in completion order"""
+        return [result async for result in self.poll(groups)]
+
+    async def _deploy(self, address: str, schedule: Schedule, dry_run: bool) -> DeploymentResult:
+        async def deploy(client: AsyncDaikinAltherma) -> DeploymentResult:
+            current = await client._requestValueHP(_HEATING_SCHEDULE)
+            if current is None:
+                return DeploymentResult(address, "unsupported")
+            if DaikinAltherma._schedulesEqual(current, schedule):
+                return DeploymentResult(address, "unchanged")
+            changes = _changes(current, schedule)
+            if dry_run:
+                return DeploymentResult(address, "outdated", changes=changes)
+            if not await client.set_heating_schedule(schedule, force=True):
+                return DeploymentResult(address, "failed", "write rejected", changes)
+            if not DaikinAltherma._schedulesEqual(await client._requestValueHP(_HEATING_SCHEDULE), schedule):
+                return DeploymentResult(address, "failed", "not applied", changes)
+            return DeploymentResult(address, "updated", changes=changes)
+
+        result, error, elapsed = await self._run(address, lambda client, left: asyncio.wait_for(deploy(client), left))
+        if result is None:
+            return DeploymentResult(address, "failed", error, elapsed=elapsed)
+        return replace(result, elapsed=elapsed)
+
+    async def deploy_schedule(self, schedule: HeatingSchedule | Schedule,
+                              dry_run: bool = False) -> AsyncIterator[DeploymentResult]:
+        """Sets the heating schedule of every unit, yielding the results as they complete.
+
+        The schedules are read concurrently, and `schedule` is only written to
+        the units having another one, then read back. The deadline applies to
+        the whole read, write and verification of each unit.
+
+        :param schedule: the schedule to set
+        :type schedule: HeatingSchedule or Schedule
+        :param dry_run: only report the units that would be updated, as
+            "outdated", defaults to False
+        :type dry_run: bool, optional
+        """
+        if not isinstance(schedule, Schedule):
+            schedule = Schedule.from_dict(schedule)
+        tasks = self._start(self._deploy(address, schedule, dry_run) for address in self.addresses)
+        async for result in self._completed(tasks):
+            yield result
+
+    async def deploy_schedule_all(self, schedule: HeatingSchedule | Schedule,
+                                  dry_run: bool = False) -> list[DeploymentResult]:
+        """Sets the heating schedule of every unit, returns the results in completion order"""
+        return [result async for result in self.deploy_schedule(schedule, dry_run)]
+
+    async def close(self):
+        await asyncio.gather(*(self._drop(address) for address in list(self._clients)))
+
+    async def __aenter__(self) -> 'Fleet':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+_HEATING_SCHEDULE = "1/Schedule/List/Heating/la"
+
+
+def _changes(current: str, schedule: Schedule) -> list:
+    """Returns the slots of `schedule` differing from the schedule list
+    `current` of a unit, see Schedule.diff. None if it cannot be parsed"""
+    try:
+        return schedule.diff(Schedule.parse(codec.decode_con(current)["data"][0]))
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def _poll_shard(fleet: Fleet, groups: list[str], queue):
+    async def run():
+        async with fleet:
+            async for result in fleet.poll(groups):
+                queue.put(result)
+    try:
+        asyncio.run(run())
+    finally:
+        queue.put(None)
+
+
+def poll_sharded(addresses: list[str], groups: list[str] = None, processes: int = None,
+                 **fleet_options) -> Iterator[FleetResult]:
+    """Polls a fleet once, split over `processes` worker processes (defaults
+    to the number of CPUs). Yields the results as they complete.
+
+    :param fleet_options: arguments of Fleet (concurrency is per process)
+    """
+    processes = processes or multiprocessing.cpu_count()
+    fleet = Fleet(addresses, **fleet_options)
+    queue = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_poll_shard, args=(fleet.shard(i, processes), groups, queue), daemon=True)
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    running = len(workers)
+    while running:
+        result = queue.get()
+        if result is None:
+            running -= 1
+        else:
+            yield result
+    for worker in workers:
+        worker.join()
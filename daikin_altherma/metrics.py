@@ -0,0 +1,228 @@
+"""Request instrumentation: per request phase timings, hooks, and an
+in-process metrics registry that can be dumped or scraped (Prometheus text
+format).
+
+    >>> instrumentation = Instrumentation()
+    >>> d = DaikinAltherma('192.168.10.126', instrumentation=instrumentation)
+    >>> d.print_all_status()
+    >>> print(instrumentation.registry.to_prometheus())
+"""
+from typing import Callable
+from dataclasses import dataclass, field
+import bisect
+import threading
+
+# Upper bounds of the latency histograms, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+PHASES = ("serialize", "send", "wait", "decode", "extract")
+
+
+@dataclass
+class RequestTiming:
+    """What happened to one request. Phase durations are in seconds:
+    serialize: building and encoding the frame,
+    send: writing it to the websocket,
+    wait: waiting for the reply (network and adapter), excluding its decoding,
+    decode: JSON decoding of the reply,
+    extract: getting the value out of the decoded reply.
+    """
+    item: str
+    write: bool = False
+    rqi: str = None
+    serialize: float = 0
+    send: float = 0
+    wait: float = 0
+    decode: float = 0
+    extract: float = 0
+    missing: bool = False  # the reply had no value
+    error: str = None  # "timeout" or "connection"
+    sent_at: float = field(default=None, repr=False)
+
+    @property
+    def total(self) -> float:
+        return self.serialize + self.send + self.wait + self.decode + self.extract
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, like the Prometheus ones"""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """Returns (upper bound, observations <= bound) pairs, ending with +Inf"""
+        out = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+    def quantile(self, q: float) -> float:
+        """Returns an estimate (the bucket upper bound) of the q quantile (0..1)"""
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+class MetricsRegistry:
+    """Thread safe store of counters, gauges and histograms, identified by
+    name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name: str, help: str):
+        self._help[name] = help
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, buckets: tuple = DEFAULT_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(self._key(name, labels), 0)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._histograms.get(self._key(name, labels))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def dump(self) -> dict:
+        """Returns all the metrics as a JSON serializable dict"""
+        def series(store: dict, value: Callable) -> dict:
+            out = {}
+            for (name, labels), v in sorted(store.items(), key=lambda kv: kv[0]):
+                out.setdefault(name, []).append({"labels": dict(labels), **value(v)})
+            return out
+
+        with self._lock:
+            return {
+                "counters": series(self._counters, lambda v: {"value": v}),
+                "gauges": series(self._gauges, lambda v: {"value": v}),
+                "histograms": series(self._histograms, lambda h: {
+                    "count": h.count,
+                    "sum": h.sum,
+                    "buckets": [[b if b != float("inf") else "+Inf", c] for b, c in h.cumulative()],
+                }),
+            }
+
+    def to_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges)):
+                names = sorted({name for name, _ in store})
+                for name in names:
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (n, labels), v in sorted(store.items()):
+                        if n == name:
+                            lines.append(f"{name}{_labels(dict(labels))} {v}")
+            for name in sorted({name for name, _ in self._histograms}):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for (n, labels), h in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                    if n != name:
+                        continue
+                    labels = dict(labels)
+                    for bound, count in h.cumulative():
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {h.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Instrumentation:
+    """Collects the RequestTiming of the requests of a client into a
+    MetricsRegistry, and calls hooks before and after each request.
+
+    Pre-request hooks are called with (item, payload), post-request hooks
+    with the RequestTiming.
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or MetricsRegistry()
+        self.pre_request: list[Callable] = []
+        self.post_request: list[Callable] = []
+        r = self.registry
+        r.describe("daikin_requests_total", "Requests sent to the adapter")
+        r.describe("daikin_request_missing_total", "Replies without a value (None results)")
+        r.describe("daikin_request_errors_total", "Requests that failed")
+        r.describe("daikin_request_timeouts_total", "Requests without a reply in time")
+        r.describe("daikin_request_seconds", "Time from building the request to getting its value")
+        r.describe("daikin_request_phase_seconds", "Time spent in each phase of the requests")
+
+    def add_hooks(self, pre: Callable = None, post: Callable = None):
+        if pre is not None:
+            self.pre_request.append(pre)
+        if post is not None:
+            self.post_request.append(post)
+
+    def before(self, item: str, payload=None):
+        for hook in self.pre_request:
+            hook(item, payload)
+
+    def after(self, timing: RequestTiming):
+        r = self.registry
+        r.inc("daikin_requests_total", path=timing.item)
+        if timing.error is not None:
+            r.inc("daikin_request_errors_total", path=timing.item, error=timing.error)
+            if timing.error == "timeout":
+                r.inc("daikin_request_timeouts_total", path=timing.item)
+        else:
+            if timing.missing:
+                r.inc("daikin_request_missing_total", path=timing.item)
+            r.observe("daikin_request_seconds", timing.total, path=timing.item)
+            for phase in PHASES:
+                r.observe("daikin_request_phase_seconds", getattr(timing, phase), phase=phase)
+        for hook in self.post_request:
+            hook(timing)
@@ -0,0 +1,364 @@
+"""Simulated LAN adapter, for testing and benchmarking without a heat pump.
+
+It speaks the m2m:rqp/m2m:rsp protocol of the /mca websocket, serves all
+the resources used by DaikinAltherma, keeps the values that are written
+and notifies their changes to the subscriptions (see `update`). Latency,
+jitter, dropped and reordered replies, and units without some resources
+can be configured.
+
+The websocket servers need the `websockets` package. Run a fleet of
+simulated units on ports 8000..8099 with:
+
+    python -m daikin_altherma.mock_adapter --units 100 --port 8000 --latency 0.05
+
+and connect to them with DaikinAltherma('127.0.0.1:8000').
+"""
+import argparse
+import asyncio
+import collections
+import json
+import random
+import threading
+import time
+import uuid
+
+_SCHEDULE = "$NULL|1|0000,180;0600,200;2200,180;,;,;,;0000,180;0600,200;2200,180;,;,;,;0000,180;0600,200;2200,180;,;,;,;0000,180;0600,200;2200,180;,;,;,;0000,180;0600,200;2200,180;,;,;,;0000,180;0800,200;2300,180;,;,;,;0000,180;0800,200;2300,180;,;,;,"
+_TANK_SCHEDULE = "$NULL|1|0000,0;0500,1;2200,0;,;,;,;0000,0;0500,1;2200,0;,;,;,;0000,0;0500,1;2200,0;,;,;,;0000,0;0500,1;2200,0;,;,;,;0000,0;0500,1;2200,0;,;,;,;0000,0;0700,1;2200,0;,;,;,;0000,0;0700,1;2200,0;,;,;,"
+
+
+def _consumption(scale: float) -> dict:
+    return {
+        "Electrical": {
+            "Heating": {
+                "D": [round(scale * (i % 5), 1) for i in range(24)],
+                "W": [round(scale * 20 + i, 1) for i in range(14)],
+                "M": [round(scale * 400 + i * 10, 1) for i in range(24)],
+            },
+        },
+    }
+
+
+def default_state() -> dict[str, object]:
+    """Returns the resources of a simulated unit: path below MNAE/ -> value"""
+    return {
+        "0/DateTime/la": time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()),
+        "0/UnitProfile/la": json.dumps({"DateTime": {"DateTimeAdjustable": True}}),
+        "1/UnitProfile/la": json.dumps({"SyncStatus": "reinitialise", "Sensor": ["IndoorTemperature", "OutdoorTemperature", "LeavingWaterTemperatureCurrent"], "UnitStatus": ["ActiveState", "ErrorState", "WarningState", "EmergencyState", "InstallerState"], "Operation": {"Power": ["on", "standby"], "OperationMode": ["heating", "cooling", "auto"]}}),
+        "2/UnitProfile/la": json.dumps({"SyncStatus": "reinitialise", "Sensor": ["TankTemperature"], "Operation": {"Power": ["on", "standby"], "Powerful": [0, 1]}}),
+        "1/UnitInfo/ModelNumber/la": "EAVH16S23DA6V",
+        "1/UnitInfo/UnitType/la": "0",
+        "1/UnitInfo/Version/IndoorSettings/la": "2.4",
+        "1/UnitInfo/Version/IndoorSoftware/la": "ID5A",
+        "1/UnitInfo/Version/OutdoorSoftware/la": "OD69",
+        "1/UnitInfo/Version/RemoconSettings/la": "1.0",
+        "1/UnitInfo/Version/RemoconSoftware/la": "RM11",
+        "1/ChildLock/PinCode/la": "0000",
+        "1/Holiday/HolidayState/la": 0,
+        "1/UnitStatus/ControlModeState/la": "RT control",
+        "1/Sensor/IndoorTemperature/la": 21.5,
+        "1/Sensor/OutdoorTemperature/la": 4.0,
+        "1/Sensor/LeavingWaterTemperatureCurrent/la": 32.0,
+        "1/Operation/TargetTemperature/la": 21.0,
+        "1/Operation/LeavingWaterTemperatureOffsetHeating/la": 0,
+        "1/Operation/Power/la": "on",
+        "1/Operation/OperationMode/la": "heating",
+        "1/UnitStatus/ActiveState/la": 1,
+        "1/UnitStatus/ErrorState/la": 0,
+        "1/UnitStatus/WarningState/la": 0,
+        "1/UnitStatus/EmergencyState/la": 0,
+        "1/UnitStatus/InstallerState/la": 0,
+        "1/Schedule/List/Heating/la": json.dumps({"data": [_SCHEDULE]}),
+        "1/Schedule/Next/la": json.dumps({"data": {"OperationMode": "heating", "StartTime": 1320, "TargetTemperature": 180, "Day": "Mo"}}),
+        "1/Consumption/la": _consumption(1.0),
+        "2/Sensor/TankTemperature/la": 48.0,
+        "2/Operation/TargetTemperature/la": 49.0,
+        "2/Operation/Power/la": "on",
+        "2/Operation/Powerful/la": 0,
+        "2/UnitStatus/ActiveState/la": 0,
+        "2/UnitStatus/ErrorState/la": 0,
+        "2/UnitStatus/WarningState/la": 0,
+        "2/UnitStatus/EmergencyState/la": 0,
+        "2/UnitStatus/InstallerState/la": 0,
+        "2/Schedule/List/Heating/la": json.dumps({"data": [_TANK_SCHEDULE]}),
+        "2/Schedule/Next/la": json.dumps({"data": {"OperationMode": "heating", "StartTime": 1320, "TargetTemperature": 0, "Day": "Mo"}}),
+        "2/Consumption/la": _consumption(0.5),
+    }
+
+
+# Profile name -> prefixes of the resources the unit does not have
+PROFILES = {
+    "full": [],
+    "no_tank": ["2/"],
+    "no_room_sensor": ["1/Sensor/IndoorTemperature/"],
+    "minimal": ["2/", "1/Sensor/IndoorTemperature/", "1/Consumption/", "1/Schedule/", "0/UnitProfile/"],
+}
+
+
+class MockAdapter:
+    """State and protocol of one simulated adapter, independent of the transport"""
+
+    def __init__(self, profile: str = "full", model: str = "BRP069A61", firmware: str = "1.0.0",
+                 latency: float = 0, jitter: float = 0, drop_rate: float = 0, reorder_rate: float = 0,
+                 seed: int = None, subscriptions: bool = True):
+        """
+        :param profile: name of the set of unsupported resources, see PROFILES, defaults to "full"
+        :type profile: str, optional
+        :param model: adapter model, defaults to "BRP069A61"
+        :type model: str, optional
+        :param firmware: adapter firmware version, defaults to "1.0.0"
+        :type firmware: str, optional
+        :param latency: seconds before a reply is sent, defaults to 0
+        :type latency: float, optional
+        :param jitter: maximum random seconds added to the latency, defaults to 0
+        :type jitter: float, optional
+        :param drop_rate: probability that a request is never answered, defaults to 0
+        :type drop_rate: float, optional
+        :param reorder_rate: probability that a reply is held back behind the
+            next ones (by one more latency), defaults to 0
+        :type reorder_rate: float, optional
+        :param seed: seed of the random generator, defaults to a random seed
+        :type seed: int, optional
+        :param subscriptions: whether subscriptions can be created, defaults to True
+        :type subscriptions: bool, optional
+        """
+        self.model = model
+        self.firmware = firmware
+        self.unsupported = list(PROFILES[profile])
+        self.state = {
+            path: value for path, value in default_state().items()
+            if not any(path.startswith(prefix) for prefix in self.unsupported)
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.reorder_rate = reorder_rate
+        self.random = random.Random(seed)
+        self.requests = collections.Counter()  # path -> number of requests
+        self.allow_subscriptions = subscriptions
+        self.subscriptions = {}  # container -> {subscription name: notification URI}
+        # Called with every notification frame, by the transports
+        self.listeners = []
+
+    def handle(self, frame: str) -> str:
+        """Returns the reply to a request frame, or None if it is dropped"""
+        message = json.loads(frame)
+        if "m2m:rqp" not in message:  # acknowledgement of a notification
+            return None
+        rqp = message["m2m:rqp"]
+        to = rqp["to"]
+        self.requests[to] += 1
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            return None
+
+        rsp = {"rqi": rqp["rqi"], "to": rqp["fr"], "fr": to}
+        if to == "/[0]/MNCSE-node/deviceInfo":
+            rsp.update(rsc=2000, pc={"m2m:dvi": {"mod": self.model, "fwv": self.firmware, "man": "Daikin"}})
+        elif to.startswith("/[0]/MNAE/"):
+            path = to[len("/[0]/MNAE/"):]
+            if rqp.get("op") == 1 and rqp.get("ty") == 23:
+                rsp.update(self._subscribe(path, rqp.get("pc", {}).get("m2m:sub", {})))
+            elif rqp.get("op") == 4:
+                rsp.update(self._delete(path))
+            elif rqp.get("op") == 1:
+                rsp.update(self._write(path, rqp.get("pc", {}).get("m2m:cin", {})))
+            else:
+                rsp.update(self._read(path))
+        else:
+            rsp["rsc"] = 4004
+        return json.dumps({"m2m:rsp": rsp})
+
+    def _read(self, path: str) -> dict:
+        if path not in self.state:
+            return {"rsc": 4004}
+        return {"rsc": 2000, "pc": {"m2m:cin": {
+            "con": self.state[path],
+            "cnf": "text/plain:0",
+            "rn": "00000001",
+            "ct": time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()),
+        }}}
+
+    def _write(self, path: str, cin: dict) -> dict:
+        latest = f"{path}/la"
+        if latest not in self.state or "con" not in cin:
+            return {"rsc": 4004}
+        self.update(latest, cin["con"])
+        return {"rsc": 2001, "pc": {"m2m:cin": cin}}
+
+    def _subscribe(self, container: str, sub: dict) -> dict:
+        if not self.allow_subscriptions:
+            return {"rsc": 4005}  # operation not allowed
+        if f"{container}/la" not in self.state or "rn" not in sub:
+            return {"rsc": 4004}
+        self.subscriptions.setdefault(container, {})[sub["rn"]] = (sub.get("nu") or [None])[0]
+        return {"rsc": 2001, "pc": {"m2m:sub": sub}}
+
+    def _delete(self, path: str) -> dict:
+        container, _, name = path.rpartition("/")
+        if self.subscriptions.get(container, {}).pop(name, None) is None:
+            return {"rsc": 4004}
+        return {"rsc": 2002}
+
+    def update(self, path: str, value):
+        """Changes the value of a resource, as the unit would, and notifies
+        the subscriptions of its container"""
+        self.state[path] = value
+        container = path.removesuffix("/la")
+        for name, uri in list(self.subscriptions.get(container, {}).items()):
+            frame = json.dumps({"m2m:rqp": {
+                "op": 5,
+                "rqi": uuid.uuid4().hex[0:5],
+                "fr": "/[0]/MNAE",
+                "to": uri,
+                "pc": {"m2m:sgn": {
+                    "nev": {"net": 3, "rep": {"m2m:cin": {
+                        "con": value,
+                        "cnf": "text/plain:0",
+                        "ct": time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()),
+                    }}},
+                    "sur": f"/[0]/MNAE/{container}/{name}",
+                }},
+            }})
+            for listener in list(self.listeners):
+                listener(frame)
+
+    def delay(self) -> float:
+        """Returns the seconds to wait before sending a reply"""
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if self.reorder_rate and self.random.random() < self.reorder_rate:
+            delay += self.latency + self.jitter
+        return delay
+
+    async def serve_connection(self, websocket, path: str = None):
+        """websockets connection handler"""
+        request = getattr(websocket, "request", None)
+        if request is not None:
+            path = request.path
+        if path != "/mca":
+            await websocket.close(code=1008, reason="Unknown path")
+            return
+
+        async def reply(frame: str, delay: float):
+            await asyncio.sleep(delay)
+            await websocket.send(frame)
+
+        tasks = set()
+        loop = asyncio.get_running_loop()
+
+        def notify(frame: str):
+            # update() may be called from another thread
+            asyncio.run_coroutine_threadsafe(websocket.send(frame), loop)
+        self.listeners.append(notify)
+        try:
+            async for frame in websocket:
+                answer = self.handle(frame)
+                if answer is None:
+                    continue
+                delay = self.delay()
+                if delay <= 0:
+                    await websocket.send(answer)
+                    continue
+                task = asyncio.create_task(reply(answer, delay))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self.listeners.remove(notify)
+
+
+class LoopbackWebSocket:
+    """In-process websocket-client lookalike talking to a MockAdapter, without
+    any network or delay. Dropped replies raise a timeout on recv, at once
+    or after `timeout` seconds"""
+
+    def __init__(self, adapter: MockAdapter = None, timeout: float = 0):
+        self.adapter = adapter or MockAdapter()
+        self.timeout = timeout
+        self.replies = collections.deque()  # (number of the request answered, None for notifications, frame)
+        self.sent = 0
+        # Round trips an adapter with latency would take: requests in flight
+        # together share one, and a round trip ends with the first reply to
+        # a request sent after it started
+        self.round_trips = 0
+        self._roundTripEnd = 0  # number of the last request of the current round trip
+        self._received = threading.Condition()
+        self.adapter.listeners.append(self._push)
+
+    def _push(self, frame: str, request: int = None):
+        with self._received:
+            self.replies.append((request, frame))
+            self._received.notify()
+
+    def send(self, frame: str):
+        self.sent += 1
+        answer = self.adapter.handle(frame)
+        if answer is not None:
+            self._push(answer, self.sent)
+
+    def recv(self) -> str:
+        with self._received:
+            if not self.replies and self.timeout:
+                self._received.wait(self.timeout)
+            if not self.replies:
+                from websocket import WebSocketTimeoutException
+                raise WebSocketTimeoutException("Connection timed out")
+            request, frame = self.replies.popleft()
+            if request is not None and request > self._roundTripEnd:
+                self.round_trips += 1
+                self._roundTripEnd = self.sent
+            return frame
+
+    def ping(self):
+        pass
+
+    def gettimeout(self) -> float:
+        return self.timeout
+
+    def settimeout(self, timeout: float):
+        self.timeout = timeout
+
+    def close(self):
+        pass
+
+
+async def serve(adapters: list[MockAdapter], host: str = "127.0.0.1", port: int = 8000):
+    """Serves each adapter on its own port, starting at `port`, until cancelled"""
+    import websockets
+
+    servers = [
+        await websockets.serve(adapter.serve_connection, host, port + i)
+        for i, adapter in enumerate(adapters)
+    ]
+    try:
+        await asyncio.Future()
+    finally:
+        for server in servers:
+            server.close()
+        for server in servers:
+            await server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Daikin LAN adapters")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="port of the first unit")
+    parser.add_argument("--units", type=int, default=1, help="number of units, on consecutive ports")
+    parser.add_argument("--profile", default="full", choices=sorted(PROFILES))
+    parser.add_argument("--latency", type=float, default=0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0, help="seconds")
+    parser.add_argument("--drop-rate", type=float, default=0)
+    parser.add_argument("--reorder-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    adapters = [
+        MockAdapter(args.profile, latency=args.latency, jitter=args.jitter,
+                    drop_rate=args.drop_rate, reorder_rate=args.reorder_rate)
+        for _ in range(args.units)
+    ]
+    print(f"Serving {args.units} units on ws://{args.host}:{args.port}..{args.port + args.units - 1}/mca")
+    try:
+        asyncio.run(serve(adapters, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
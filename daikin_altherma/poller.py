@@ -0,0 +1,180 @@
+"""Polling of resources that only reports their changes.
+
+Every resource is read at its own interval, learnt from how often its
+value changes: a temperature drifting every few minutes is read more often
+than UnitInfo, which never changes.
+
+    >>> d = DaikinAltherma('192.168.10.126', thread_safe=True)
+    >>> with DeltaPoller(d, ['1/Sensor/IndoorTemperature/la', '1/Operation/TargetTemperature/la'], print):
+    ...     d.set_setpoint_temperature(21)  # 1/Operation/TargetTemperature/la is read again at once
+"""
+from typing import Callable
+from dataclasses import dataclass
+import logging
+import threading
+import time
+
+
+@dataclass(frozen=True)
+class Change:
+    """A resource changed between two reads"""
+    path: str  # below MNAE/, ex: "1/Sensor/IndoorTemperature/la"
+    old: object
+    new: object
+    timestamp: float  # time.time() of the read
+
+
+class ChangeRate:
+    """Polling interval of one resource, learnt from its changes.
+
+    The interval is half the (exponentially weighted) average time between
+    two changes, within [min_interval, max_interval]. Until a change is
+    seen, it grows by half at every read without change."""
+
+    def __init__(self, min_interval: float, max_interval: float, weight: float = 0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.weight = weight
+        self.interval = min_interval
+        self.mean = None  # average seconds between two changes
+        self.since = time.monotonic()  # time of the last change, or of the first read
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def update(self, changed: bool, now: float = None) -> float:
+        """Returns the seconds until the next read, after a read at `now` (time.monotonic())"""
+        now = time.monotonic() if now is None else now
+        elapsed = now - self.since
+        if changed:
+            self.mean = elapsed if self.mean is None else self.weight * elapsed + (1 - self.weight) * self.mean
+            self.since = now
+            self.interval = self._clamp(self.mean / 2)
+        elif self.mean is None:
+            self.interval = self._clamp(self.interval * 1.5)
+        elif elapsed > self.mean:
+            # Changing less often than it used to
+            self.interval = self._clamp(max(self.interval, elapsed / 2))
+        return self.interval
+
+
+class DeltaPoller:
+    """Reads resources of a DaikinAltherma, each one at its learnt interval,
+    and passes their changes to `callback`.
+
+    The first read of a resource gives its reference value, in `values`.
+    After an acknowledged write, the resources of the written container are
+    read again at once. `poll` can be called from a loop, or `start` runs it
+    in a thread (the client must then be thread_safe if it is used by other
+    threads too)."""
+
+    def __init__(self, client, paths: list[str], callback: Callable[[Change], None] = None,
+                 min_interval: float = 5, max_interval: float = 3600):
+        """
+        :param client: the client reading the resources
+        :type client: DaikinAltherma
+        :param paths: resource paths below MNAE/, ex: "1/Sensor/IndoorTemperature/la"
+        :type paths: list[str]
+        :param callback: called with every Change, defaults to none
+        :type callback: Callable[[Change], None], optional
+        :param min_interval: minimum seconds between two reads of a resource, defaults to 5
+        :type min_interval: float, optional
+        :param max_interval: maximum seconds between two reads of a resource, defaults to 3600
+        :type max_interval: float, optional
+        """
+        self.client = client
+        self.paths = list(paths)
+        self.callback = callback
+        self.rates = {path: ChangeRate(min_interval, max_interval) for path in self.paths}
+        self.values = {}  # path -> last value read
+        self._due = dict.fromkeys(self.paths, 0)  # path -> time.monotonic() of the next read
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        client.write_listeners.append(self._written)
+
+    @property
+    def intervals(self) -> dict[str, float]:
+        """Returns the current polling interval of every resource, in seconds"""
+        return {path: rate.interval for path, rate in self.rates.items()}
+
+    def refresh(self, paths: list[str] = None):
+        """Reads `paths` (defaults to all) at the next poll, and wakes up the polling thread"""
+        with self._lock:
+            for path in self.paths if paths is None else paths:
+                if path in self._due:
+                    self._due[path] = 0
+        self._wakeup.set()
+
+    def _written(self, item: str):
+        written = item.removeprefix("MNAE/") + "/"
+        self.refresh([path for path in self.paths if path.startswith(written)])
+
+    def next_poll(self) -> float:
+        """Returns the seconds until a resource is due"""
+        with self._lock:
+            return max(0, min(self._due.values()) - time.monotonic())
+
+    def poll(self) -> list[Change]:
+        """Reads the resources that are due, in one batch
+
+        :return: the changes, also passed to the callback
+        :rtype: list[Change]
+        """
+        now = time.monotonic()
+        with self._lock:
+            paths = [path for path, due in self._due.items() if due <= now]
+        if not paths:
+            return []
+        values = self.client.read_many(paths)
+        now, timestamp = time.monotonic(), time.time()
+        changes = []
+        with self._lock:
+            for path, value in values.items():
+                changed = False
+                if value is not None:
+                    if path in self.values and self.values[path] != value:
+                        changes.append(Change(path, self.values[path], value, timestamp))
+                        changed = True
+                    self.values[path] = value
+                self._due[path] = now + self.rates[path].update(changed, now)
+        if self.callback is not None:
+            for change in changes:
+                self.callback(change)
+        return changes
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                self.poll()
+            except Exception as e:
+                logging.warning(f"Polling failed: {e!r}")
+                self._stop.wait(min(rate.min_interval for rate in self.rates.values()))
+            self._wakeup.wait(self.next_poll())
+
+    def start(self):
+        """Polls in a background thread until `stop`"""
+        self._stop.clear()
+        if self._written not in self.client.write_listeners:
+            self.client.write_listeners.append(self._written)
+        self._thread = threading.Thread(target=self._run, name="daikin-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the polling thread and the refreshes after writes"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._written in self.client.write_listeners:
+            self.client.write_listeners.remove(self._written)
+
+    def __enter__(self) -> 'DeltaPoller':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,229 @@
+"""Profiling of the requests made by the high-level calls.
+
+RequestProfiler records every request a DaikinAltherma sends to its
+adapter inside a `with` block, with the line of code that triggered it,
+and flags the reads of a resource that was already read in the block:
+
+    >>> with RequestProfiler(d) as profile:
+    ...     d.print_all_status()
+    ...     d.heating_error_status
+    >>> print(profile.report())
+
+The requests in flight at the same time form a round trip. The report
+gives the round trips, the time spent waiting for them, and estimates of
+the time that could be saved:
+- by caching: the share of their round trips of the duplicate reads,
+- by batching: the reads were spread over several round trips, one
+  pipelined batch would take about as long as the slowest of them.
+
+Reads answered by the cache or skipped as unsupported are not requests,
+and are not recorded. Works with the sync client, whose requests are
+timed by its Instrumentation (one is set up for the block if it has none).
+"""
+from dataclasses import dataclass, field
+import collections
+import os
+import sys
+import threading
+import time
+
+from . import DaikinAltherma
+from .metrics import Instrumentation, RequestTiming
+
+_PACKAGE = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_TESTS = os.path.join(_PACKAGE, "tests") + os.sep
+# The generated properties all share the code of _GETTER, which passes
+# the Resource read to _readResource
+_READ_RESOURCE = DaikinAltherma._readResource.__code__
+_GETTER = DaikinAltherma.indoor_temperature.fget.__code__
+
+
+@dataclass
+class ProfiledRequest:
+    item: str
+    write: bool
+    call_site: str  # "file:line in function" of the code calling the client, None if internal
+    api: str  # DaikinAltherma method or property that made the request
+    start: float  # perf_counter when the request was built
+    end: float  # perf_counter when its value was extracted, or it failed
+    error: str = None  # "timeout" or "connection"
+    duplicate: bool = False  # read of a resource already read in the block, and not written since
+    round_trip: int = None  # index in RequestProfiler.round_trips
+
+
+@dataclass
+class RoundTrip:
+    """Requests in flight at the same time"""
+    start: float
+    end: float
+    requests: list[ProfiledRequest] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def share(self) -> float:
+        """Returns the part of the duration attributed to each of its requests"""
+        return self.duration / len(self.requests)
+
+
+def _isPackage(filename: str) -> bool:
+    return filename.startswith(_PACKAGE) and not filename.startswith(_TESTS)
+
+
+def _callSite() -> tuple[str, str]:
+    """Returns the call site of the code calling the client, and the API it called"""
+    frame = sys._getframe(1)
+    api = None
+    while frame is not None:
+        code = frame.f_code
+        if not _isPackage(os.path.abspath(code.co_filename)):
+            site = f"{os.path.basename(code.co_filename)}:{frame.f_lineno} in {code.co_name}"
+            return site, api
+        if code is _READ_RESOURCE:
+            api = frame.f_locals["resource"].name
+        elif code is not _GETTER and code.co_filename == DaikinAltherma.__init__.__code__.co_filename:
+            api = code.co_name
+        frame = frame.f_back
+    return None, api
+
+
+class RequestProfiler:
+    """Records the requests of a client inside a `with` block"""
+
+    def __init__(self, client: DaikinAltherma):
+        """
+        :param client: the profiled client. It should not be used by other
+            threads when the block starts and ends
+        :type client: DaikinAltherma
+        """
+        self.client = client
+        self.requests: list[ProfiledRequest] = []
+        self.round_trips: list[RoundTrip] = []
+        self._lock = threading.Lock()
+        self._instrumentation = None  # set up for the block
+
+    def __enter__(self) -> 'RequestProfiler':
+        self.requests.clear()
+        self.round_trips.clear()
+        if self.client.instrumentation is None:
+            self._instrumentation = self.client.instrumentation = Instrumentation()
+        self.client.instrumentation.add_hooks(post=self._record)
+        return self
+
+    def __exit__(self, *exc):
+        self.client.instrumentation.post_request.remove(self._record)
+        if self._instrumentation is not None:
+            self.client.instrumentation = self._instrumentation = None
+        self._analyse()
+
+    def _record(self, timing: RequestTiming):
+        end = time.perf_counter()
+        start = end if timing.sent_at is None else timing.sent_at - timing.send - timing.serialize
+        site, api = _callSite()
+        request = ProfiledRequest(timing.item, timing.write, site, api, start, end, timing.error)
+        with self._lock:
+            self.requests.append(request)
+
+    def _analyse(self):
+        """Flags the duplicate reads and groups the requests in round trips"""
+        read = set()  # resources read since their last write
+        for request in sorted(self.requests, key=lambda r: r.start):
+            resource = request.item.removesuffix("/la")
+            if request.write:
+                read.discard(resource)
+            else:
+                request.duplicate = resource in read
+                read.add(resource)
+
+        for request in sorted(self.requests, key=lambda r: r.start):
+            if not self.round_trips or request.start > self.round_trips[-1].end:
+                self.round_trips.append(RoundTrip(request.start, request.end))
+            round_trip = self.round_trips[-1]
+            round_trip.end = max(round_trip.end, request.end)
+            round_trip.requests.append(request)
+            request.round_trip = len(self.round_trips) - 1
+
+    @property
+    def wait(self) -> float:
+        """Returns the seconds spent waiting for the adapter"""
+        return sum(rt.duration for rt in self.round_trips)
+
+    def duplicates(self) -> dict[str, list[ProfiledRequest]]:
+        """Returns the reads of the resources read more than once, by item"""
+        reads = collections.defaultdict(list)
+        for request in self.requests:
+            if not request.write:
+                reads[request.item].append(request)
+        return {
+            item: requests for item, requests in reads.items()
+            if any(r.duplicate for r in requests)
+        }
+
+    def cache_savings(self) -> float:
+        """Returns the seconds that caching the duplicate reads would save"""
+        return sum(self.round_trips[r.round_trip].share for r in self.requests if r.duplicate)
+
+    def batch_savings(self) -> float:
+        """Returns the seconds that reading the other resources in one
+        pipelined batch would save, instead of their current round trips"""
+        shares = [
+            rt.duration * sum(not r.duplicate for r in rt.requests) / len(rt.requests)
+            for rt in self.round_trips
+            if not any(r.write for r in rt.requests)
+        ]
+        return sum(shares) - max(shares, default=0)
+
+    def summary(self) -> dict:
+        """Returns the totals, and the requests per call site, as a JSON serializable dict"""
+        sites = {}
+        for request in self.requests:
+            site = sites.setdefault((request.call_site, request.api), {
+                "call_site": request.call_site,
+                "api": request.api,
+                "requests": 0,
+                "duplicates": 0,
+                "round_trips": set(),
+                "wait_s": 0,
+            })
+            site["requests"] += 1
+            site["duplicates"] += request.duplicate
+            site["round_trips"].add(request.round_trip)
+            site["wait_s"] += self.round_trips[request.round_trip].share
+        for site in sites.values():
+            site["round_trips"] = len(site["round_trips"])
+        return {
+            "requests": len(self.requests),
+            "round_trips": len(self.round_trips),
+            "wait_s": self.wait,
+            "duplicate_reads": sum(r.duplicate for r in self.requests),
+            "cache_savings_s": self.cache_savings(),
+            "batch_savings_s": self.batch_savings(),
+            "call_sites": sorted(sites.values(), key=lambda s: -s["wait_s"]),
+            "duplicates": {
+                item: [f"{r.api} ({r.call_site or 'internal'})" for r in requests]
+                for item, requests in self.duplicates().items()
+            },
+        }
+
+    def report(self) -> str:
+        """Returns the summary as text"""
+        s = self.summary()
+        lines = [
+            f"{s['requests']} requests in {s['round_trips']} round trips, "
+            f"{s['wait_s'] * 1000:.1f} ms waiting for the adapter",
+            f"could save {s['cache_savings_s'] * 1000:.1f} ms by caching {s['duplicate_reads']} duplicate reads, "
+            f"{s['batch_savings_s'] * 1000:.1f} ms by batching",
+            "",
+            f"{'call site':<40} {'api':<30} {'requests':>8} {'duplicates':>10} {'round trips':>11} {'wait ms':>8}",
+        ]
+        for site in s["call_sites"]:
+            lines.append(
+                f"{site['call_site'] or '(internal)':<40} {site['api'] or '':<30} {site['requests']:>8} "
+                f"{site['duplicates']:>10} {site['round_trips']:>11} {site['wait_s'] * 1000:>8.1f}")
+        if s["duplicates"]:
+            lines += ["", "duplicate reads:"]
+            for item, reads in s["duplicates"].items():
+                lines.append(f"  {item} x{len(reads)}: {', '.join(reads)}")
+        return "\n".join(lines)
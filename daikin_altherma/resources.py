@@ -0,0 +1,118 @@
+"""Declarative description of the resources of the adapters.
+
+Every value read by DaikinAltherma is a Resource: its unit and path on
+the adapter, how to parse it and the snapshot group it belongs to. The
+properties, SNAPSHOT_GROUPS and the Prometheus gauges are generated from
+the registry (daikin_altherma.RESOURCES).
+
+The request frames of the reads are serialised once per item, only the
+rqi is substituted, and the values are taken out of the replies with
+precompiled key lookups.
+"""
+from typing import Callable
+from dataclasses import dataclass, field
+import functools
+import json
+
+CON = "/m2m:rsp/pc/m2m:cin/con"
+
+_RQI = "\0rqi\0"  # placeholder of the rqi in the frame templates
+
+
+def _identity(x):
+    return x
+
+
+@dataclass(frozen=True)
+class Resource:
+    """A value of the adapter, ex: Resource("indoor_temperature", 1, "Sensor/IndoorTemperature", category="sensors")"""
+    name: str  # property of DaikinAltherma and field of DaikinSnapshot
+    unit: int  # 0 (adapter), 1 (heating) or 2 (tank), None for the resources outside of MNAE
+    path: str  # below the unit, ex: "Sensor/IndoorTemperature"
+    parser: Callable = _identity  # converts the raw value
+    category: str = None  # group of SNAPSHOT_GROUPS
+    doc: str = None  # docstring of the property
+    default: object = None  # value of the property when the resource is missing
+    output_path: str = CON
+    metric: tuple[str, dict] = None  # Prometheus gauge (name, labels) of the exporter
+    item: str = field(init=False)
+
+    def __post_init__(self):
+        item = self.path if self.unit is None else f"MNAE/{self.unit}/{self.path}/la"
+        object.__setattr__(self, "item", item)
+
+    def parse(self, value):
+        """Returns the parsed raw value, or the default if None"""
+        return self.default if value is None else self.parser(value)
+
+
+@dataclass(frozen=True)
+class Setting:
+    """A value written by a setter, ex: Setting("set_setpoint_temperature", 1, "Operation/TargetTemperature")"""
+    name: str  # setter of DaikinAltherma
+    unit: int  # 0 (adapter), 1 (heating) or 2 (tank)
+    path: str  # below the unit, ex: "Operation/TargetTemperature"
+    encoder: Callable = _identity  # converts the argument of the setter to the written value
+
+    def request(self, value) -> tuple:
+        """Returns the (item, output path, payload) request writing `value`"""
+        return f"MNAE/{self.unit}/{self.path}", "/", {"con": self.encoder(value), "cnf": "text/plain:0"}
+
+
+def registry(resources: list[Resource | Setting]) -> dict[str, Resource | Setting]:
+    """Returns the resources (or settings) by name, checking their names are unique"""
+    by_name = {}
+    for resource in resources:
+        if resource.name in by_name:
+            raise ValueError(f"Resource {resource.name} is defined twice")
+        by_name[resource.name] = resource
+    return by_name
+
+
+def groups(resources: dict[str, Resource]) -> dict[str, dict[str, tuple]]:
+    """Returns the SNAPSHOT_GROUPS of the resources: category -> name -> (item, output path, parser)"""
+    by_category = {}
+    for resource in resources.values():
+        if resource.category is not None:
+            by_category.setdefault(resource.category, {})[resource.name] = (
+                resource.item, resource.output_path, resource.parser)
+    return by_category
+
+
+@functools.lru_cache(maxsize=None)
+def output_keys(output_path: str) -> tuple[str, ...]:
+    """Returns the keys of an output path, ex: "/m2m:rsp/rsc" -> ("m2m:rsp", "rsc")"""
+    return tuple(key for key in output_path.split("/") if key)
+
+
+def extract(result: dict, output_path: str):
+    """Returns the value at `output_path` of a reply ("/" is the whole reply)
+
+    :raises KeyError: the reply has no such value
+    """
+    value = result
+    try:
+        for key in output_keys(output_path):
+            value = value[key]
+    except TypeError:
+        raise KeyError(output_path)
+    return value
+
+
+def acknowledged(result: dict) -> bool:
+    """Returns whether a reply reports a success (rsc 2xxx)"""
+    rsc = (result or {}).get("m2m:rsp", {}).get("rsc")
+    return isinstance(rsc, int) and 2000 <= rsc < 3000
+
+
+@functools.lru_cache(maxsize=4096)
+def _read_template(user_agent: str, item: str) -> tuple[str, str]:
+    frame = json.dumps({"m2m:rqp": {"fr": user_agent, "rqi": _RQI, "op": 2, "to": f"/[0]/{item}"}})
+    prefix, suffix = frame.split(json.dumps(_RQI))
+    return prefix + '"', '"' + suffix
+
+
+def read_frame(user_agent: str, reqid: str, item: str) -> str:
+    """Returns the serialised read request of `item`. `reqid` must not need escaping"""
+    prefix, suffix = _read_template(user_agent, item)
+    return prefix + reqid + suffix
@@ -0,0 +1,278 @@
+"""Compact model of the week schedules of the units.
+
+On the wire, a schedule is "NAME|ACTIVE|" followed by 7 days of 6 slots
+separated by ";". A slot is "HHMM,VALUE" (the value in tenths of degree
+for the heating, a tank state for the tank), or "," when unused. The
+adapter also sends slots without value ("0000,"), unsorted or repeated
+times: they are all kept, so that parse(s).to_wire() == s.
+
+ScheduleEvaluator answers locally what a schedule sets at a given time,
+LocalSchedule keeps the one of a unit up to date.
+"""
+from typing import Callable
+from array import array
+import bisect
+import datetime
+import logging
+import time
+
+DAYS = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]
+SLOTS = 6  # per day
+
+_EMPTY = -1  # minute of a slot without time
+_NO_VALUE = -32768  # value of a slot without value
+
+Slot = tuple[int, int]  # (minute of the day, raw value), None if unused
+
+
+class Schedule:
+    """Week schedule as on the wire: 7 × 6 slots of (minute, raw value),
+    stored in one array. Schedules are equal when they would be sent the same."""
+
+    __slots__ = ("name", "active", "_slots")
+
+    def __init__(self, name: str = "$NULL", active: str = "1", slots: array = None):
+        self.name = name
+        self.active = active
+        # minute, value, minute, value... for the 42 slots
+        self._slots = slots if slots is not None else array("h", [_EMPTY, _NO_VALUE] * len(DAYS) * SLOTS)
+
+    @classmethod
+    def parse(cls, wire: str) -> 'Schedule':
+        """Returns the schedule of a wire string. Partial schedules are
+        accepted: the missing slots are empty, the slots past the last day ignored"""
+        name, active, slots = wire.split("|", 2)
+        slots = slots.split(";")[:len(DAYS) * SLOTS]
+        values = array("h")
+        for slot in slots:
+            hhmm, value = slot.split(",")
+            values.append(_EMPTY if hhmm == "" else int(hhmm[:2]) * 60 + int(hhmm[2:]))
+            values.append(_NO_VALUE if value == "" else int(value))
+        values.extend([_EMPTY, _NO_VALUE] * (len(DAYS) * SLOTS - len(slots)))
+        return cls(name, active, values)
+
+    def to_wire(self) -> str:
+        slots = []
+        for i in range(0, len(self._slots), 2):
+            minute, value = self._slots[i], self._slots[i + 1]
+            hhmm = "" if minute == _EMPTY else "%02d%02d" % divmod(minute, 60)
+            slots.append(f"{hhmm},{'' if value == _NO_VALUE else value}")
+        return f"{self.name}|{self.active}|" + ";".join(slots)
+
+    @classmethod
+    def from_dict(cls, schedule: dict, value_encoder: Callable = lambda t: round(t * 10),
+                  name: str = "$NULL", active: str = "1") -> 'Schedule':
+        """Returns the schedule of a day -> HHMM -> value dict, like HeatingSchedule.
+        The slots of each day are sorted by time
+
+        :param value_encoder: converts the values to the raw wire ones, defaults to heating temperatures
+        :type value_encoder: Callable, optional
+        """
+        s = cls(name, active)
+        for d, day in enumerate(DAYS):
+            hours = schedule.get(day, {})
+            if len(hours) > SLOTS:
+                raise ValueError(f"At most {SLOTS} changes per day, got {len(hours)} on {day}")
+            for i, hhmm in enumerate(sorted(hours)):
+                s._set(d * SLOTS + i, int(hhmm[:2]) * 60 + int(hhmm[2:]), value_encoder(hours[hhmm]))
+        return s
+
+    def to_dict(self, value_parser: Callable) -> dict:
+        """Returns the day -> HHMM -> value dict of the schedule, without the
+        slots lacking a time or a value. See DaikinAltherma._unmarshall_schedule"""
+        schedule = {}
+        for day in DAYS:
+            hours = {}
+            for minute, value in self.day(day):
+                if value is not None:
+                    hours["%02d%02d" % divmod(minute, 60)] = value_parser(value)
+            schedule[day] = hours
+        return schedule
+
+    def _set(self, slot: int, minute: int, value: int):
+        self._slots[2 * slot] = minute
+        self._slots[2 * slot + 1] = _NO_VALUE if value is None else value
+
+    def slot(self, slot: int) -> Slot:
+        """Returns (minute, raw value or None) of a slot (0..41), None if unused"""
+        minute, value = self._slots[2 * slot], self._slots[2 * slot + 1]
+        if minute == _EMPTY and value == _NO_VALUE:
+            return None
+        return (minute, None if value == _NO_VALUE else value)
+
+    def day(self, day: str) -> list[Slot]:
+        """Returns the used slots of a day (see DAYS) having a time, in the wire order"""
+        d = DAYS.index(day)
+        slots = (self.slot(d * SLOTS + i) for i in range(SLOTS))
+        return [slot for slot in slots if slot is not None and slot[0] != _EMPTY]
+
+    def diff(self, other: 'Schedule') -> list[tuple[str, int, Slot, Slot]]:
+        """Returns the slots that differ from `other`, as (day, slot of the day, ours, theirs)"""
+        if self._slots == other._slots:
+            return []
+        changes = []
+        for slot in range(len(DAYS) * SLOTS):
+            ours, theirs = self.slot(slot), other.slot(slot)
+            if ours != theirs:
+                changes.append((DAYS[slot // SLOTS], slot % SLOTS, ours, theirs))
+        return changes
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return (self.name, self.active, self._slots) == (other.name, other.active, other._slots)
+
+    def __hash__(self) -> int:
+        return hash((self.name, self.active, self._slots.tobytes()))
+
+    def __repr__(self) -> str:
+        return f"Schedule({self.to_wire()!r})"
+
+
+WEEK = len(DAYS) * 24 * 60  # minutes
+
+
+def week_minute(t: datetime.datetime) -> int:
+    """Returns the minutes since Monday 00:00 of `t`"""
+    return t.weekday() * 24 * 60 + t.hour * 60 + t.minute
+
+
+class ScheduleEvaluator:
+    """Answers what a week schedule sets at any time, without asking the unit.
+
+    The transitions of the week are kept sorted by minute since Monday 00:00:
+    the value at a time is the one of the last transition before it (of the
+    previous week if none), found by bisection. Times are naive datetimes
+    in the time of the unit.
+    """
+
+    def __init__(self, schedule: dict):
+        """
+        :param schedule: HeatingSchedule or TankSchedule (day -> HHMM -> value),
+            ex: DaikinAltherma.heating_schedule[0]
+        :type schedule: dict
+        """
+        transitions = {}
+        for d, day in enumerate(DAYS):
+            for hhmm, value in schedule.get(day, {}).items():
+                transitions[d * 24 * 60 + int(hhmm[:2]) * 60 + int(hhmm[2:])] = value
+        self.times = sorted(transitions)
+        self.values = [transitions[t] for t in self.times]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def at(self, t: datetime.datetime):
+        """Returns the value active at `t`, None if the schedule is empty"""
+        if not self.times:
+            return None
+        # Index -1 is the last transition of the previous week
+        return self.values[bisect.bisect_right(self.times, week_minute(t)) - 1]
+
+    def next_transition(self, t: datetime.datetime) -> tuple[datetime.datetime, object]:
+        """Returns the (time, value) of the first transition after `t`, None if the schedule is empty"""
+        if not self.times:
+            return None
+        minute = week_minute(t)
+        i = bisect.bisect_right(self.times, minute)
+        delay = (self.times[i % len(self.times)] - minute) % WEEK or WEEK
+        start = t.replace(second=0, microsecond=0) + datetime.timedelta(minutes=delay)
+        return start, self.values[i % len(self.times)]
+
+    def per_minute(self, start: datetime.datetime, minutes: int):
+        """Returns the values active at every minute from `start`, as a NumPy
+        array (float for heating schedules). Needs the `numpy` package"""
+        import numpy as np
+
+        week_minutes = (week_minute(start) + np.arange(minutes)) % WEEK
+        if not self.times:
+            return np.full(minutes, np.nan)
+        numeric = all(isinstance(v, (int, float)) for v in self.values)
+        values = np.array(self.values, dtype=float if numeric else object)
+        return values[np.searchsorted(self.times, week_minutes, side="right") - 1]
+
+    def matches(self, state, t: datetime.datetime) -> bool:
+        """Returns whether the next transition after `t` is the one announced
+        by the unit (HeatingScheduleState or TankScheduleState, see
+        DaikinAltherma.heating_schedule_state)"""
+        transition = self.next_transition(t)
+        if transition is None or state is None:
+            return transition is None and state is None
+        start, value = transition
+        expected = getattr(state, "TargetTemperature", getattr(state, "TankState", None))
+        return (DAYS[start.weekday()], start.hour * 60 + start.minute, value) == \
+            (state.Day, state.StartTime, expected)
+
+
+class LocalSchedule:
+    """ScheduleEvaluator of the heating or tank schedule of a unit. The
+    schedule is read once, and checked against the next transition announced
+    by the unit (Schedule/Next) at most every `verify_interval` seconds: it is
+    read again when they disagree.
+
+        >>> schedule = LocalSchedule(d, "heating")
+        >>> schedule.at(), schedule.next_transition()
+        (18.0, (datetime.datetime(2023, 10, 23, 6, 0), 20.0))
+    """
+
+    def __init__(self, client, unit: str = "heating", verify_interval: float = 3600):
+        """
+        :param client: the client of the unit
+        :type client: DaikinAltherma
+        :param unit: "heating" or "tank", defaults to "heating"
+        :type unit: str, optional
+        :param verify_interval: seconds between two checks against the unit, defaults to 3600
+        :type verify_interval: float, optional
+        """
+        if unit not in ("heating", "tank"):
+            raise ValueError(f"Unknown unit {unit}")
+        self.client = client
+        self.unit = unit
+        self.verify_interval = verify_interval
+        self._evaluator = None
+        self._verified_at = None  # time.monotonic() of the last check
+
+    def reload(self) -> ScheduleEvaluator:
+        """Reads the schedule of the unit again"""
+        schedules = getattr(self.client, f"{self.unit}_schedule")
+        self._evaluator = ScheduleEvaluator(schedules[0] if schedules else {})
+        self._verified_at = time.monotonic()
+        return self._evaluator
+
+    def verify(self, t: datetime.datetime = None) -> bool:
+        """Checks the schedule against the unit, reloading it if they disagree
+
+        :param t: current time of the unit, defaults to now
+        :type t: datetime.datetime, optional
+        :return: whether they agreed
+        :rtype: bool
+        """
+        if self._evaluator is None:
+            self.reload()
+        state = getattr(self.client, f"{self.unit}_schedule_state")
+        self._verified_at = time.monotonic()
+        if self._evaluator.matches(state, t or datetime.datetime.now()):
+            return True
+        logging.info(f"The {self.unit} schedule of the unit changed, reading it again")
+        self.reload()
+        return False
+
+    @property
+    def evaluator(self) -> ScheduleEvaluator:
+        if self._evaluator is None:
+            self.reload()
+        elif time.monotonic() - self._verified_at > self.verify_interval:
+            self.verify()
+        return self._evaluator
+
+    def at(self, t: datetime.datetime = None):
+        """Returns the value active at `t`, defaults to now"""
+        return self.evaluator.at(t or datetime.datetime.now())
+
+    def next_transition(self, t: datetime.datetime = None) -> tuple[datetime.datetime, object]:
+        """Returns the (time, value) of the first transition after `t`, defaults to now"""
+        return self.evaluator.next_transition(t or datetime.datetime.now())
+
+    def per_minute(self, start: datetime.datetime, minutes: int):
+        """See ScheduleEvaluator.per_minute"""
+        return self.evaluator.per_minute(start, minutes)
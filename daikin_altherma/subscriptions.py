@@ -0,0 +1,238 @@
+"""Change notifications of the adapter resources.
+
+The adapter is a oneM2M CSE: a subscription (m2m:sub) created on a
+container makes it send a notification request (op 5) on the websocket
+for every new content instance. `DaikinAltherma.subscribe` and
+`AsyncDaikinAltherma.subscribe` create them, and poll the resources that
+cannot be subscribed to, at an interval learnt from how often they change
+(see `poller.ChangeRate`).
+
+    >>> d = DaikinAltherma('192.168.10.126', thread_safe=True)
+    >>> s = d.subscribe(['1/Sensor/IndoorTemperature/la'], print)
+    ...
+    >>> s.cancel()
+"""
+from typing import Callable
+from dataclasses import dataclass
+import asyncio
+import logging
+import threading
+import time
+import uuid
+
+from .poller import ChangeRate
+
+# Payload of a request deleting the resource it is sent to
+DELETE = object()
+
+# Notification event types: 3 is "creation of a direct child resource",
+# ie a new content instance in the container
+_NET_CHILD_CREATED = 3
+
+
+@dataclass(frozen=True)
+class Notification:
+    """A new value of a resource"""
+    path: str  # below MNAE/, ex: "1/Sensor/IndoorTemperature/la"
+    value: object
+    timestamp: float  # time.time()
+    pushed: bool = True  # False if found by polling
+
+
+def subscription_payload(name: str, notification_uri: str) -> dict:
+    """Returns the primitive content creating the subscription `name`"""
+    return {"m2m:sub": {
+        "rn": name,
+        "enc": {"net": [_NET_CHILD_CREATED]},
+        "nu": [notification_uri],
+        "nct": 1,  # the notifications contain the whole new resource
+    }}
+
+
+def container(path: str) -> str:
+    """Returns the container of a resource path: 1/Sensor/IndoorTemperature/la -> 1/Sensor/IndoorTemperature"""
+    return path.removesuffix("/la")
+
+
+def parse_notification(message: dict) -> tuple[str, str, object]:
+    """Returns the (path, subscription name, value) of a notification request,
+    or None if it is not the notification of a new value (ex: a verification request)"""
+    rqp = message.get("m2m:rqp", {})
+    if rqp.get("op") != 5:
+        return None
+    sgn = rqp.get("pc", {}).get("m2m:sgn", {})
+    cin = sgn.get("nev", {}).get("rep", {}).get("m2m:cin")
+    if cin is None or "sur" not in sgn:
+        return None
+    # sur: /[0]/MNAE/<container>/<subscription name>
+    subscribed, _, name = sgn["sur"].removeprefix("/[0]/MNAE/").rpartition("/")
+    return f"{subscribed}/la", name, cin.get("con")
+
+
+def notification_response(message: dict, user_agent: str) -> dict:
+    """Returns the acknowledgement of a notification request"""
+    rqp = message["m2m:rqp"]
+    return {"m2m:rsp": {"rqi": rqp.get("rqi"), "to": rqp.get("fr"), "fr": user_agent, "rsc": 2000}}
+
+
+class Subscription:
+    """Subscription of a client to a set of resources. Changes are passed
+    to `callback` with a Notification.
+
+    `pushed` are the paths notified by the adapter, `polled` the ones that
+    could not be subscribed to and are polled."""
+
+    def __init__(self, paths: list[str], callback: Callable[[Notification], None] = None,
+                 min_interval: float = 1, max_interval: float = 60):
+        self.paths = list(paths)
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.name = f"sub-{uuid.uuid4().hex[0:8]}"
+        self.pushed: list[str] = []
+        self.polled: list[str] = []
+        self.values = {}  # path -> last known value
+        self._lock = threading.Lock()
+
+    def _changed(self, path: str, value) -> bool:
+        with self._lock:
+            changed = path not in self.values or self.values[path] != value
+            self.values[path] = value
+        return changed
+
+    def deliver(self, path: str, value, pushed: bool = True) -> bool:
+        """Passes a new value of `path` to the callback, if it changed
+
+        :return: whether the value changed
+        :rtype: bool
+        """
+        if not self._changed(path, value):
+            return False
+        notification = Notification(path, value, time.time(), pushed)
+        if self.callback is not None:
+            try:
+                self.callback(notification)
+            except Exception:
+                logging.exception(f"Subscription callback failed on {path}")
+        self._put(notification)
+        return True
+
+    def _put(self, notification: Notification):
+        pass
+
+    def _polled(self, intervals: dict, due: dict, values: dict):
+        """Handles the values of a poll and schedules the next ones"""
+        for path, value in values.items():
+            changed = False
+            if value is None:  # the read failed
+                pass
+            elif path not in self.values:  # first read: the reference value
+                self._changed(path, value)
+            else:
+                changed = self.deliver(path, value, pushed=False)
+            due[path] = time.monotonic() + intervals[path].update(changed)
+
+    def _intervals(self) -> tuple[dict, dict]:
+        intervals = {path: ChangeRate(self.min_interval, self.max_interval) for path in self.polled}
+        return intervals, {path: 0 for path in self.polled}
+
+
+class SyncSubscription(Subscription):
+    """Subscription of a DaikinAltherma. The callback is called from the
+    reader thread (pushed changes) or from the polling thread, and must not
+    wait for requests of the same client"""
+
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = client
+        self._stop = threading.Event()
+        self._poller = None
+
+    def start_polling(self):
+        """Reads the reference values of the polled paths, and starts polling them"""
+        if self.polled:
+            intervals, due = self._intervals()
+            self._poll(intervals, due)
+            self._poller = threading.Thread(target=self._pollLoop, args=(intervals, due),
+                                            name=f"daikin-{self.name}", daemon=True)
+            self._poller.start()
+
+    def _poll(self, intervals: dict, due: dict):
+        paths = [path for path in self.polled if due[path] <= time.monotonic()]
+        try:
+            values = self._client.read_many(paths) if paths else {}
+        except Exception as e:
+            logging.warning(f"Polling {paths} failed: {e!r}")
+            values = dict.fromkeys(paths)
+        self._polled(intervals, due, values)
+
+    def _pollLoop(self, intervals: dict, due: dict):
+        while not self._stop.wait(max(0, min(due.values()) - time.monotonic())):
+            self._poll(intervals, due)
+
+    def cancel(self):
+        """Stops the polling and deletes the subscriptions on the adapter"""
+        self._stop.set()
+        if self._poller is not None and self._poller is not threading.current_thread():
+            self._poller.join()
+        self._client._unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription of an AsyncDaikinAltherma. The changes are passed to
+    the callback, and can be iterated over:
+
+        >>> async for notification in await d.subscribe(paths):
+        ...     print(notification.path, notification.value)
+    """
+
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = client
+        self._queue = asyncio.Queue()
+        self._poller = None
+
+    def _put(self, notification: Notification):
+        self._queue.put_nowait(notification)
+
+    async def start_polling(self):
+        """Reads the reference values of the polled paths, and starts polling them"""
+        if self.polled:
+            intervals, due = self._intervals()
+            await self._poll(intervals, due)
+            self._poller = asyncio.create_task(self._pollLoop(intervals, due))
+
+    async def _poll(self, intervals: dict, due: dict):
+        paths = [path for path in self.polled if due[path] <= time.monotonic()]
+        try:
+            values = await self._client.read_many(paths) if paths else {}
+        except Exception as e:
+            logging.warning(f"Polling {paths} failed: {e!r}")
+            values = dict.fromkeys(paths)
+        self._polled(intervals, due, values)
+
+    async def _pollLoop(self, intervals: dict, due: dict):
+        while True:
+            await asyncio.sleep(max(0, min(due.values()) - time.monotonic()))
+            await self._poll(intervals, due)
+
+    def __aiter__(self) -> 'AsyncSubscription':
+        return self
+
+    async def __anext__(self) -> Notification:
+        notification = await self._queue.get()
+        if notification is None:
+            raise StopAsyncIteration
+        return notification
+
+    async def cancel(self):
+        """Stops the polling, deletes the subscriptions on the adapter and ends the iteration"""
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        await self._client._unsubscribe(self)
+        self._queue.put_nowait(None)
@@ -0,0 +1,125 @@
+"""Fake websockets and clients shared by the tests"""
+import asyncio
+import json
+
+from daikin_altherma import DaikinAltherma
+from daikin_altherma.aio import AsyncDaikinAltherma
+from daikin_altherma.mock_adapter import LoopbackWebSocket, MockAdapter
+
+# Odd schedules seen on real units
+RL_S1 = "$NULL|0|0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,"
+RL_S2 = "$NULL|0|0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,"
+RL_S3 = "$NULL|0|0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,"
+RL_S4 = "JANEDOE|1|0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;0000,180;0000,180"
+RL_S5 = "$NULL|1|0010,120;0000,180;0000,180;0000,180;0000,180;0000,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,"
+RL_S6 = "$NULL|1|,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,"
+RL_SCHEDULES = [RL_S1, RL_S2, RL_S3, RL_S4, RL_S5, RL_S6]
+
+
+class FakeWebSocket:
+    """Answers every request with the value of its path in `values` (or the
+    path itself), holding back replies until `batch` requests are pending
+    and then sending them in reverse"""
+
+    def __init__(self, batch: int = 1, values: dict = None):
+        self.batch = batch
+        self.values = values
+        self.pending = []
+        self.replies = []
+        self.sent = 0
+
+    def send(self, frame: str):
+        self.sent += 1
+        rqp = json.loads(frame)["m2m:rqp"]
+        rsp = {"rqi": rqp["rqi"], "to": rqp["fr"]}
+        item = rqp["to"].removeprefix("/[0]/MNAE/")
+        if self.values is None:
+            rsp["pc"] = {"m2m:cin": {"con": rqp["to"]}}
+        elif item in self.values:
+            rsp["pc"] = {"m2m:cin": {"con": self.values[item]}}
+        self.pending.append({"m2m:rsp": rsp})
+        if len(self.pending) >= self.batch:
+            self.replies += reversed(self.pending)
+            self.pending = []
+
+    def recv(self) -> str:
+        if not self.replies:
+            self.replies += reversed(self.pending)
+            self.pending = []
+        return json.dumps(self.replies.pop(0))
+
+
+class SilentWebSocket(LoopbackWebSocket):
+    """Loopback websocket of an adapter that does not answer the requests
+    of some resources (all of them if None), until released"""
+
+    def __init__(self, adapter: MockAdapter, silent: list[str] = None, timeout: float = 0.05):
+        super().__init__(adapter, timeout)
+        self.silent = silent
+        self.held = []
+
+    def send(self, frame: str):
+        if self.silent is None or json.loads(frame)["m2m:rqp"]["to"].removeprefix("/[0]/MNAE/") in self.silent:
+            self.sent += 1
+            self.held.append(self.adapter.handle(frame))
+            return
+        super().send(frame)
+
+    def release(self):
+        for answer in self.held:
+            self._push(answer)
+        self.held = []
+
+
+def make_client(ws, **kwargs) -> DaikinAltherma:
+    """Returns a client talking over the websocket `ws`"""
+    kwargs.setdefault("keepalive", 0)
+    return DaikinAltherma("mock", connect=lambda url, timeout: ws, **kwargs)
+
+
+def mock_client(adapter: MockAdapter, timeout: float = 0, **kwargs) -> DaikinAltherma:
+    """Returns a client talking to `adapter` over a LoopbackWebSocket"""
+    return make_client(LoopbackWebSocket(adapter, timeout), **kwargs)
+
+
+class FakeAsyncWebSocket:
+    """Replies to the requests of each batch of `batch` frames in reverse order"""
+
+    def __init__(self, values: dict, batch: int = 1):
+        self.values = values
+        self.batch = batch
+        self.pending = []
+        self.written = []
+        self.replies = asyncio.Queue()
+
+    async def send(self, frame: str):
+        rqp = json.loads(frame)["m2m:rqp"]
+        rsp = {"rqi": rqp["rqi"], "to": rqp["fr"]}
+        item = rqp["to"].removeprefix("/[0]/MNAE/")
+        if "pc" in rqp:
+            self.written.append((item, rqp["pc"]["m2m:cin"]["con"]))
+            rsp["pc"] = rqp["pc"]
+        elif item in self.values:
+            rsp["pc"] = {"m2m:cin": {"con": self.values[item]}}
+        self.pending.append(json.dumps({"m2m:rsp": rsp}))
+        if len(self.pending) >= self.batch:
+            for reply in reversed(self.pending):
+                self.replies.put_nowait(reply)
+            self.pending = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        return await self.replies.get()
+
+    async def close(self):
+        pass
+
+
+async def make_async_client(ws) -> AsyncDaikinAltherma:
+    """Returns an async client talking over the websocket `ws`"""
+    d = AsyncDaikinAltherma("localhost")
+    d.ws = ws
+    d._reader = asyncio.create_task(d._readLoop())
+    return d
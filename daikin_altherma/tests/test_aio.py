@@ -0,0 +1,165 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from daikin_altherma.aio import AsyncDaikinAltherma
+from daikin_altherma.capabilities import CapabilityMap
+from daikin_altherma.metrics import Instrumentation
+from daikin_altherma.tests.helpers import FakeAsyncWebSocket, make_async_client
+
+
+class DroppingWebSocket(FakeAsyncWebSocket):
+    """Loses the connection when a request is sent, after answering the first `after` ones"""
+
+    def __init__(self, values: dict, after: int = 0):
+        super().__init__(values)
+        self.after = after
+        self.paths = []
+
+    async def send(self, frame: str):
+        self.paths.append(json.loads(frame)["m2m:rqp"]["to"])
+        if len(self.paths) <= self.after:
+            await super().send(frame)
+        else:
+            self.replies.put_nowait(None)
+
+    async def __anext__(self) -> str:
+        reply = await self.replies.get()
+        if reply is None:
+            raise ConnectionResetError("Connection reset by peer")
+        return reply
+
+
+class SilentAsyncWebSocket(FakeAsyncWebSocket):
+    async def send(self, frame: str):
+        pass
+
+
+class TestAsyncClient(unittest.TestCase):
+    VALUES = {
+        "1/Sensor/IndoorTemperature/la": 21.5,
+        "1/Sensor/OutdoorTemperature/la": 4.0,
+        "1/Operation/Power/la": "on",
+        "1/UnitStatus/EmergencyState/la": 0,
+        "1/UnitStatus/ErrorState/la": 0,
+        "1/UnitStatus/WarningState/la": 1,
+    }
+
+    def test_concurrent_getters(self):
+        async def run():
+            d = await make_async_client(FakeAsyncWebSocket(self.VALUES, batch=3))
+            values = await asyncio.gather(
+                d.indoor_temperature, d.outdoor_temperature, d.is_heating_enabled)
+            status = await d.heating_error_status
+            await d.close()
+            return values, status
+
+        values, status = asyncio.run(run())
+        assert values == [21.5, 4.0, True]
+        assert status == "Warning"
+
+    def test_setter(self):
+        async def run():
+            ws = FakeAsyncWebSocket(self.VALUES)
+            d = await make_async_client(ws)
+            ok = await d.set_heating_enabled(False)
+            await d.close()
+            return ok, ws.written
+
+        ok, written = asyncio.run(run())
+        assert ok
+        assert written == [("1/Operation/Power", "standby")]
+
+    def reconnecting_client(self, sockets: list = None, **kwargs) -> AsyncDaikinAltherma:
+        """Client opening the websockets of `sockets` in turn (an exception
+        fails the connection), by default one lost on the first request"""
+        if sockets is None:
+            sockets = [DroppingWebSocket(self.VALUES), FakeAsyncWebSocket(self.VALUES)]
+
+        class Client(AsyncDaikinAltherma):
+            connections = 0
+
+            async def _open(self):
+                Client.connections += 1
+                ws = sockets.pop(0)
+                if isinstance(ws, Exception):
+                    raise ws
+                self.ws = ws
+                self._reader = asyncio.create_task(self._readLoop())
+        return Client("localhost", **kwargs)
+
+    def test_reconnect(self):
+        async def run():
+            d = self.reconnecting_client()
+            await d.connect()
+            values = await asyncio.gather(d.indoor_temperature, d.outdoor_temperature)
+            await d.close()
+            return values, type(d).connections
+
+        values, connections = asyncio.run(run())
+        assert values == [21.5, 4.0]
+        assert connections == 2
+
+    def test_reconnect_bound_capabilities(self):
+        # The capability map is bound once, not at every reconnection
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = DroppingWebSocket(self.VALUES, after=1), DroppingWebSocket(self.VALUES, after=10)
+            d = self.reconnecting_client(
+                [first, second], capabilities=CapabilityMap(os.path.join(tmp, "capabilities.json")))
+
+            async def run():
+                await d.connect()
+                slots = d._slots
+                value = await asyncio.wait_for(d.indoor_temperature, 2)
+                assert d._slots is slots
+                await d.close()
+                return value
+
+            assert asyncio.run(run()) == 21.5
+            assert first.paths[0] == "/[0]/MNCSE-node/deviceInfo"
+            assert second.paths == ["/[0]/MNAE/1/Sensor/IndoorTemperature/la"]
+            assert d.capabilities.key == "None/None"
+
+    def test_reconnect_backoff(self):
+        async def run(sockets: list):
+            d = self.reconnecting_client(sockets, max_retries=3, backoff=0.01)
+            await d.connect()
+            try:
+                return await d.indoor_temperature
+            finally:
+                await d.close()
+
+        refused = ConnectionRefusedError("Connection refused")
+        sockets = [DroppingWebSocket(self.VALUES), refused, refused, FakeAsyncWebSocket(self.VALUES)]
+        assert asyncio.run(run(sockets)) == 21.5
+        with self.assertRaises(ConnectionError):
+            asyncio.run(run([DroppingWebSocket(self.VALUES), refused, refused, refused]))
+
+    def test_writes_not_replayed(self):
+        async def run():
+            d = self.reconnecting_client()
+            await d.connect()
+            try:
+                with self.assertRaises(ConnectionError):
+                    await d.set_heating_enabled(False)
+            finally:
+                await d.close()
+        asyncio.run(run())
+
+    def test_instrumented_deadline(self):
+        timings = []
+
+        async def run():
+            d = await make_async_client(SilentAsyncWebSocket(self.VALUES))
+            d.instrumentation = Instrumentation()
+            d.instrumentation.add_hooks(post=timings.append)
+            snapshot = await d.snapshot(["sensors"], deadline=0.05)
+            await d.close()
+            return snapshot
+
+        snapshot = asyncio.run(run())
+        assert snapshot.timed_out
+        assert len(timings) == len(snapshot.timed_out)
+        assert all(timing.error == "timeout" for timing in timings)
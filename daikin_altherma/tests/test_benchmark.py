@@ -0,0 +1,22 @@
+import unittest
+
+from daikin_altherma import SNAPSHOT_GROUPS
+from daikin_altherma.benchmark import percentile, bench_properties, _Client
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        assert percentile(samples, 50) == 50
+        assert percentile(samples, 99) == 99
+        assert percentile([3.0], 99) == 3.0
+
+    def test_print_all_status_is_batched(self):
+        client = _Client("loopback", 0)
+        results = bench_properties(client, 2)
+        client.close()
+
+        nb_fields = sum(len(group) for group in SNAPSHOT_GROUPS.values())
+        assert results["print_all_status"]["requests"] == nb_fields
+        assert results["print_all_status"]["round_trips"] < nb_fields / 2
+        assert results["indoor_temperature"]["round_trips"] == 1
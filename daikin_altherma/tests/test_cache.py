@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+from daikin_altherma.cache import ResourceCache
+from daikin_altherma.tests.helpers import FakeWebSocket, make_client
+
+
+class TestResourceCache(unittest.TestCase):
+    VALUES = {
+        "1/UnitInfo/ModelNumber/la": "EAVH16S23DA6V",
+        "1/Operation/TargetTemperature/la": 21.0,
+    }
+
+    def test_static_values_are_cached(self):
+        ws = FakeWebSocket(values=self.VALUES)
+        d = make_client(ws, cache=ResourceCache())
+        assert d.unit_model == "EAVH16S23DA6V"
+        assert d.unit_model == "EAVH16S23DA6V"
+        assert ws.sent == 1
+        d.indoor_setpoint_temperature
+        d.indoor_setpoint_temperature
+        assert ws.sent == 3  # live values are not cached by default
+
+    def test_write_invalidates(self):
+        ws = FakeWebSocket(values=self.VALUES)
+        d = make_client(ws, cache=ResourceCache(ttls={"live": 60}))
+        d.indoor_setpoint_temperature
+        assert len(d.cache) == 1
+        d.set_setpoint_temperature(22.0)
+        assert len(d.cache) == 0
+
+    def test_ttl_and_lru(self):
+        cache = ResourceCache(ttls={"live": 10}, max_size=2)
+        with mock.patch("time.monotonic", return_value=100):
+            cache.put("a", 1)
+            cache.put("b", 2)
+            cache.get("a")
+            cache.put("c", 3)
+            assert cache.get("b") is None  # least recently used
+            assert cache.get("a") == 1
+        with mock.patch("time.monotonic", return_value=111):
+            assert cache.get("a") is None
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from daikin_altherma import DaikinAltherma
+from daikin_altherma.capabilities import CapabilityMap
+from daikin_altherma.mock_adapter import LoopbackWebSocket, MockAdapter
+from daikin_altherma.tests.helpers import FakeWebSocket, make_client
+
+
+TANK = "MNAE/2/Sensor/TankTemperature/la"
+
+
+class SlowModelWebSocket(LoopbackWebSocket):
+    """Answers the request of the adapter model after `delay` seconds"""
+
+    def __init__(self, adapter: MockAdapter, delay: float):
+        super().__init__(adapter, timeout=0.5)
+        self.delay = delay
+        self.paths = []
+
+    def send(self, frame: str):
+        path = json.loads(frame)["m2m:rqp"]["to"].removeprefix("/[0]/")
+        self.paths.append(path)
+        if path != "MNCSE-node/deviceInfo":
+            return super().send(frame)
+        self.sent += 1
+        threading.Timer(self.delay, self._push, (self.adapter.handle(frame), self.sent)).start()
+
+
+class TestCapabilityMap(unittest.TestCase):
+    def test_unsupported_not_queried(self):
+        ws = FakeWebSocket(values={"1/Sensor/IndoorTemperature/la": 21.5})
+        d = make_client(ws, capabilities=CapabilityMap())
+        assert d.tank_temperature is None
+        assert d.tank_temperature is None
+        assert d.indoor_temperature == 21.5
+        assert ws.sent == 2
+        d.reprobe()
+        assert d.tank_temperature is None
+        assert ws.sent == 3
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "capabilities.json")
+            m = CapabilityMap(filename)
+            m.bind("BRP069A61/1.0")
+            m.missing("MNAE/2/Sensor/TankTemperature/la", {"m2m:rsp": {"rsc": 4004}})
+            m.missing("MNAE/1/Sensor/IndoorTemperature/la", {"m2m:rsp": {"rsc": 5000}})
+
+            with open(filename) as f:
+                assert json.load(f) == {"BRP069A61/1.0": ["MNAE/2/Sensor/TankTemperature/la"]}
+
+            m = CapabilityMap(filename)
+            m.bind("BRP069A61/1.0")
+            assert not m.is_supported("MNAE/2/Sensor/TankTemperature/la")
+            m.bind("BRP069A62/1.0")
+            assert m.is_supported("MNAE/2/Sensor/TankTemperature/la")
+
+    def test_bound_on_first_request(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "capabilities.json")
+            connects = []
+
+            def connect(url, timeout):
+                connects.append(url)
+                return LoopbackWebSocket(MockAdapter("no_tank"))
+            d = DaikinAltherma("mock", keepalive=0, capabilities=CapabilityMap(filename), connect=connect)
+            assert connects == [] and d.capabilities.key is None
+
+            assert d.tank_temperature is None
+            assert d.capabilities.key == "BRP069A61/1.0.0"
+            with open(filename) as f:
+                assert json.load(f) == {"BRP069A61/1.0.0": ["MNAE/2/Sensor/TankTemperature/la"]}
+
+    def test_requests_wait_for_the_binding(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "capabilities.json")
+            with open(filename, "w") as f:
+                json.dump({"BRP069A61/1.0.0": [TANK]}, f)
+            ws = SlowModelWebSocket(MockAdapter(), 0.3)
+            d = make_client(ws, thread_safe=True, capabilities=CapabilityMap(filename))
+            first = threading.Thread(target=lambda: d.indoor_temperature)
+            first.start()
+            time.sleep(0.05)
+            assert d.tank_temperature is None
+            first.join()
+            assert TANK not in ws.paths
+            d.close()
+
+    def test_missing_before_bind(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "capabilities.json")
+            with open(filename, "w") as f:
+                json.dump({"BRP069A61/1.0": ["MNAE/1/Sensor/OutdoorTemperature/la"]}, f)
+            m = CapabilityMap(filename)
+            m.missing(TANK, {"m2m:rsp": {"rsc": 4004}})
+            m.bind("BRP069A61/1.0")
+            assert not m.is_supported(TANK)
+            assert not m.is_supported("MNAE/1/Sensor/OutdoorTemperature/la")
+            with open(filename) as f:
+                assert json.load(f) == {"BRP069A61/1.0": ["MNAE/1/Sensor/OutdoorTemperature/la", TANK]}
@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from websocket import WebSocketTimeoutException
+
+from daikin_altherma import DaikinAltherma, codec
+from daikin_altherma.capture import RECEIVED, SENT, Recording, Replay, load
+from daikin_altherma.mock_adapter import LoopbackWebSocket, MockAdapter
+from daikin_altherma.schedule import Schedule
+from daikin_altherma.tests.helpers import RL_S1
+
+
+class SlowWebSocket(LoopbackWebSocket):
+    """Loopback websocket of a slow adapter"""
+    delay = 0.05
+
+    def recv(self) -> str:
+        time.sleep(self.delay)
+        return super().recv()
+
+
+class CompactCodec(codec.JsonCodec):
+    """Serialises without spaces, like orjson"""
+    name = "compact"
+
+    def dumps(self, obj) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "unit.capture.gz")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def record(self, adapter: MockAdapter, calls, websocket=LoopbackWebSocket):
+        with Recording(self.filename, connect=lambda url, timeout: websocket(adapter)) as recording:
+            d = DaikinAltherma("mock", keepalive=0, connect=recording)
+            calls(d)
+            d.close()
+
+    def test_record_and_replay(self):
+        adapter = MockAdapter(profile="no_tank")
+        adapter.state["1/Schedule/List/Heating/la"] = f'{{"data": ["{RL_S1}"]}}'
+
+        def calls(d):
+            d.snapshot(["sensors", "schedules"])
+            d.set_setpoint_temperature(23)
+            d.snapshot(["sensors"])
+        self.record(adapter, calls)
+        expected = DaikinAltherma("mock", keepalive=0, connect=lambda url, timeout: LoopbackWebSocket(adapter))
+        expected = expected.snapshot(["sensors", "schedules"])
+
+        frames = load(self.filename)
+        assert len([f for f in frames if f.direction == SENT]) == 19
+        assert len([f for f in frames if f.direction == RECEIVED]) == 19
+
+        adapter.requests.clear()
+        replay = Replay(self.filename)
+        d = DaikinAltherma("replay", keepalive=0, connect=replay)
+        first = d.snapshot(["sensors", "schedules"])
+        assert first.indoor_setpoint_temperature == 21.0
+        assert first.tank_temperature is None
+        assert first.heating_schedule == expected.heating_schedule
+        assert d.set_setpoint_temperature(23)
+        assert d.indoor_setpoint_temperature == 23  # the second recorded read
+        assert d.indoor_setpoint_temperature == 23  # the last one again
+        assert d.ws.ws.unmatched == []
+        assert d.unit_model is None  # not recorded
+        assert len(d.ws.ws.unmatched) == 1
+        assert not adapter.requests
+
+    def test_codecs(self):
+        # A schedule written with one codec is matched when replayed with another
+        schedule = Schedule.parse(RL_S1)
+        previous = codec.current()
+        try:
+            codec.use("json")
+            self.record(MockAdapter(), lambda d: d.set_heating_schedule(schedule, force=True))
+            codec.use(CompactCodec())
+            d = DaikinAltherma("replay", keepalive=0, connect=Replay(self.filename))
+            assert d.set_heating_schedule(schedule, force=True)
+            assert d.ws.ws.unmatched == []
+        finally:
+            codec.use(previous)
+
+    def test_timing(self):
+        self.record(MockAdapter(), lambda d: d.indoor_temperature, SlowWebSocket)
+
+        d = DaikinAltherma("replay", keepalive=0, connect=Replay(self.filename, delay_scale=1))
+        t0 = time.monotonic()
+        assert d.indoor_temperature == 21.5
+        assert time.monotonic() - t0 >= SlowWebSocket.delay * 0.9
+
+        d = DaikinAltherma("replay", keepalive=0, connect=Replay(self.filename))
+        t0 = time.monotonic()
+        assert d.indoor_temperature == 21.5
+        assert time.monotonic() - t0 < SlowWebSocket.delay / 2
+
+    def test_no_reply(self):
+        def calls(d):
+            with self.assertRaises(WebSocketTimeoutException):
+                d.indoor_temperature
+        self.record(MockAdapter(drop_rate=1), calls)
+
+        d = DaikinAltherma("replay", keepalive=0, connect=Replay(self.filename))
+        t0 = time.monotonic()
+        with self.assertRaises(WebSocketTimeoutException):
+            d.indoor_temperature
+        assert time.monotonic() - t0 < 1
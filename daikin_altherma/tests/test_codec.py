@@ -0,0 +1,38 @@
+import unittest
+
+from daikin_altherma import codec
+from daikin_altherma.codec import JsonCodec
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.tests.helpers import mock_client
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class TestCodec(unittest.TestCase):
+    def tearDown(self):
+        codec.use()
+
+    def test_default(self):
+        assert codec.current().name == ("json" if orjson is None else "orjson")
+
+    def test_clients_with_json(self):
+        assert codec.use("json").name == "json"
+        d = mock_client(MockAdapter())
+        assert d.indoor_temperature == 21.5
+        assert d.heating_schedule[0]["Mo"]["0600"] == 20.0
+        assert d.set_setpoint_temperature(22.0)
+
+    @unittest.skipIf(orjson is None, "needs orjson")
+    def test_same_values(self):
+        frame = '{"m2m:rsp": {"rqi": "a", "pc": {"m2m:cin": {"con": "{\\"data\\": [\\"x\\"]}"}}}}'
+        assert codec.OrjsonCodec().loads(frame) == JsonCodec().loads(frame)
+        assert JsonCodec().loads(codec.OrjsonCodec().dumps({"con": 1.5})) == {"con": 1.5}
+
+    def test_decode_con(self):
+        codec.use(JsonCodec())
+        con = '{"data": ["$NULL|1|"]}'
+        assert codec.decode_con(con) is codec.decode_con(con)
+        assert codec.decode_con.cache_info().hits == 1
@@ -0,0 +1,50 @@
+import unittest
+from unittest import mock
+
+from websocket import WebSocketConnectionClosedException
+
+from daikin_altherma import DaikinAltherma
+from daikin_altherma.tests.helpers import FakeWebSocket
+
+
+class DroppingWebSocket(FakeWebSocket):
+    """Drops the connection after `nb_replies` replies"""
+
+    def __init__(self, nb_replies: int, **kwargs):
+        super().__init__(**kwargs)
+        self.nb_replies = nb_replies
+
+    def recv(self) -> str:
+        if self.nb_replies == 0:
+            raise WebSocketConnectionClosedException("Connection is already closed.")
+        self.nb_replies -= 1
+        return super().recv()
+
+
+class TestConnection(unittest.TestCase):
+    def test_lazy_connect(self):
+        with mock.patch("daikin_altherma.create_connection", return_value=FakeWebSocket()) as connect:
+            d = DaikinAltherma("localhost", keepalive=0)
+            connect.assert_not_called()
+            d.unit_model
+            connect.assert_called_once()
+
+    def test_reconnect_and_replay(self):
+        first, second = DroppingWebSocket(2), FakeWebSocket(batch=4)
+        with mock.patch("daikin_altherma.create_connection", side_effect=[first, second]):
+            d = DaikinAltherma("localhost", keepalive=0)
+            items = [f"1/Item{i}/la" for i in range(6)]
+            assert d._requestValuesHP(items) == [f"/[0]/MNAE/{item}" for item in items]
+
+        stats = d.connection_stats
+        assert stats.connects == 2 and stats.reconnects == 1
+        assert stats.failures == 1
+        assert stats.replayed_requests == 4
+        assert d._responses == {}
+
+    def test_writes_are_not_replayed(self):
+        with mock.patch("daikin_altherma.create_connection", side_effect=[DroppingWebSocket(0), FakeWebSocket()]):
+            d = DaikinAltherma("localhost", keepalive=0)
+            with self.assertRaises(ConnectionError):
+                d.set_heating_enabled(True)
+            assert d.set_heating_enabled(True)
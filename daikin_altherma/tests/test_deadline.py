@@ -0,0 +1,104 @@
+import asyncio
+import contextlib
+import io
+import json
+import time
+import unittest
+
+from websocket import WebSocketTimeoutException
+
+from daikin_altherma import TIMED_OUT
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.tests.helpers import FakeAsyncWebSocket, SilentWebSocket, make_async_client, make_client
+
+OUTDOOR = "1/Sensor/OutdoorTemperature/la"
+INDOOR = "1/Sensor/IndoorTemperature/la"
+
+
+class TestDeadline(unittest.TestCase):
+    def check_partial(self, thread_safe: bool):
+        ws = SilentWebSocket(MockAdapter("no_tank"), [OUTDOOR])
+        d = make_client(ws, thread_safe=thread_safe)
+        try:
+            s = d.snapshot(["sensors"], deadline=1)
+            assert s.indoor_temperature == 21.5
+            assert s.outdoor_temperature is None and s.tank_temperature is None
+            assert s.timed_out == ("outdoor_temperature",)  # the tank is not supported, not timed out
+            assert not s.complete
+
+            # The late reply is dropped
+            ws.release()
+            assert d.indoor_temperature == 21.5
+            assert d.read_many([OUTDOOR, INDOOR], deadline=1) == {OUTDOOR: TIMED_OUT, INDOOR: 21.5}
+            ws.release()
+            assert d.indoor_temperature == 21.5
+            time.sleep(0.01)  # for the reader thread
+            assert not d._responses
+        finally:
+            d.close()
+
+    def test_partial_results(self):
+        self.check_partial(thread_safe=False)
+
+    def test_partial_results_thread_safe(self):
+        self.check_partial(thread_safe=True)
+
+    def test_deadline_shorter_than_timeout(self):
+        adapter = MockAdapter()
+        ws = SilentWebSocket(adapter, [INDOOR, OUTDOOR], timeout=2)
+        d = make_client(ws)
+        t0 = time.monotonic()
+        s = d.snapshot(["sensors"], deadline=0.2)
+        assert time.monotonic() - t0 < 1
+        assert set(s.timed_out) == {"indoor_temperature", "outdoor_temperature"}
+        assert s.tank_temperature == 48.0
+        assert ws.gettimeout() == 2
+
+    def test_without_deadline(self):
+        ws = SilentWebSocket(MockAdapter(), [OUTDOOR])
+        d = make_client(ws)
+        with self.assertRaises(WebSocketTimeoutException):
+            d.read_many([OUTDOOR, INDOOR])
+
+        # The replies of the requests in flight are dropped
+        ws.release()
+        assert d.indoor_temperature == 21.5
+        assert d.indoor_temperature == 21.5
+        assert not d._responses
+
+    def test_print_all_status(self):
+        d = make_client(SilentWebSocket(MockAdapter(), [OUTDOOR]))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            d.print_all_status(deadline=1)
+        assert "Timed out: outdoor_temperature" in out.getvalue()
+
+
+class SilentAsyncWebSocket(FakeAsyncWebSocket):
+    """Does not answer the requests of some resources"""
+
+    def __init__(self, values: dict, silent: list[str]):
+        super().__init__(values)
+        self.silent = silent
+
+    async def send(self, frame: str):
+        if json.loads(frame)["m2m:rqp"]["to"].removeprefix("/[0]/MNAE/") not in self.silent:
+            await super().send(frame)
+
+
+class TestAsyncDeadline(unittest.TestCase):
+    def test_partial_results(self):
+        async def run():
+            d = await make_async_client(SilentAsyncWebSocket({INDOOR: 21.5, OUTDOOR: 4.0}, [OUTDOOR]))
+            t0 = time.monotonic()
+            s = await d.snapshot(["sensors"], deadline=0.2)
+            elapsed = time.monotonic() - t0
+            values = await d.read_many([INDOOR, OUTDOOR], deadline=0.1)
+            await d.close()
+            return s, elapsed, values
+
+        s, elapsed, values = asyncio.run(run())
+        assert elapsed < 1
+        assert (s.indoor_temperature, s.outdoor_temperature, s.tank_temperature) == (21.5, None, None)
+        assert s.timed_out == ("outdoor_temperature",)
+        assert values == {INDOOR: 21.5, OUTDOOR: TIMED_OUT}
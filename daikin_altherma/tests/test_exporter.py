@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+
+from daikin_altherma.cache import ResourceCache
+from daikin_altherma.exporter import AdapterCollector, render
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.tests.helpers import SilentWebSocket, make_client, mock_client
+
+
+class SlowClient:
+    def __init__(self, client, delay: float):
+        self.client = client
+        self.delay = delay
+
+    def snapshot(self, groups, deadline=None):
+        time.sleep(self.delay)
+        return self.client.snapshot(groups, deadline=deadline)
+
+
+class TestExporter(unittest.TestCase):
+    def test_render(self):
+        adapter = MockAdapter()
+        collector = AdapterCollector(lambda: mock_client(adapter), "unit1")
+        text = render([collector], timeout=5)
+        assert 'daikin_temperature_celsius{adapter="unit1",sensor="indoor"} 21.5' in text
+        assert 'daikin_enabled{adapter="unit1",unit="heating"} 1.0' in text
+        assert 'daikin_consumption_kwh{adapter="unit1",mode="Heating",period="M",slot="0",source="Electrical",unit="tank"} 200.0' in text
+        assert 'daikin_up{adapter="unit1"} 1' in text
+
+    def test_coalesced_scrapes(self):
+        adapter = MockAdapter()
+        collector = AdapterCollector(lambda: SlowClient(mock_client(adapter), 0.1), "unit1", min_interval=60)
+        threads = [threading.Thread(target=collector.collect, args=(5,)) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        collector.collect(5)
+        assert collector.refreshes == 1
+
+    def test_stale_values(self):
+        adapter = MockAdapter()
+        collector = AdapterCollector(lambda: SlowClient(mock_client(adapter), 0.2), "unit1", min_interval=0)
+        snapshot, age = collector.collect(5)
+        assert snapshot.indoor_temperature == 21.5
+        snapshot, age = collector.collect(0.01)  # the adapter is too slow: serve the last values
+        assert snapshot.indoor_temperature == 21.5
+        assert age > 0
+
+    def test_down_until_read(self):
+        collector = AdapterCollector(lambda: SlowClient(mock_client(MockAdapter()), 0.2), "unit1")
+        assert 'daikin_up{adapter="unit1"} 0' in render([collector], timeout=0.01)
+        time.sleep(0.3)
+        assert 'daikin_up{adapter="unit1"} 1' in render([collector], timeout=0.01)
+
+    def test_partial_read(self):
+        ws = SilentWebSocket(MockAdapter(), ["1/Sensor/OutdoorTemperature/la"], timeout=2)
+        collector = AdapterCollector(lambda: make_client(ws), "unit1")
+        t0 = time.monotonic()
+        text = render([collector], timeout=0.5)
+        assert time.monotonic() - t0 < 1
+        assert 'daikin_temperature_celsius{adapter="unit1",sensor="indoor"} 21.5' in text
+        assert 'sensor="outdoor"' not in text
+        assert 'daikin_up{adapter="unit1"} 1' in text
+
+    def test_nothing_read(self):
+        ws = SilentWebSocket(MockAdapter(), [])
+        collector = AdapterCollector(lambda: make_client(ws), "unit1", min_interval=0)
+        assert collector.collect(0.5)[0].indoor_temperature == 21.5
+        ws.silent = None  # answers nothing anymore
+        snapshot, age = collector.collect(0.2)
+        assert snapshot.indoor_temperature == 21.5  # the last values
+        assert collector.last_error.startswith("TimeoutError")
+
+    def test_nothing_live_read(self):
+        # The cached unit info and consumptions do not make a silent adapter up
+        ws = SilentWebSocket(MockAdapter(), [])
+        collector = AdapterCollector(lambda: make_client(ws, cache=ResourceCache()), "unit1", min_interval=0)
+        assert collector.collect(0.5)[0].indoor_temperature == 21.5
+        ws.silent = None
+        text = render([collector], timeout=0.2)
+        assert collector.last_error.startswith("TimeoutError")
+        assert 'daikin_up{adapter="unit1"} 0' in text
+        assert 'daikin_temperature_celsius{adapter="unit1",sensor="indoor"} 21.5' in text
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import time
+import unittest
+
+from daikin_altherma.aio import AsyncDaikinAltherma
+from daikin_altherma.fleet import Fleet, poll_sharded
+from daikin_altherma.schedule import Schedule
+from daikin_altherma.tests.helpers import FakeAsyncWebSocket
+
+HEATING_SCHEDULE = "1/Schedule/List/Heating/la"
+
+
+class SlowWebSocket(FakeAsyncWebSocket):
+    def __init__(self, values: dict, delay: float, counter: dict):
+        super().__init__(values)
+        self.delay = delay
+        self.counter = counter
+
+    async def send(self, frame: str):
+        self.counter["active"] += 1
+        self.counter["max"] = max(self.counter["max"], self.counter["active"])
+        await asyncio.sleep(self.delay)
+        self.counter["active"] -= 1
+        await super().send(frame)
+
+
+def client_factory(delays: dict, counter: dict):
+    """Clients of fake adapters answering after delays[address] seconds"""
+    class Client(AsyncDaikinAltherma):
+        def __init__(self, address: str):
+            super().__init__(address, max_in_flight=1)
+
+        async def _open(self):
+            self.ws = SlowWebSocket({"1/Sensor/IndoorTemperature/la": 21.5}, delays.get(self.adapter_ip, 0), counter)
+            self._reader = asyncio.create_task(self._readLoop())
+    return Client
+
+
+class PartialWebSocket(FakeAsyncWebSocket):
+    """Never answers the requests of the outdoor temperature"""
+
+    async def send(self, frame: str):
+        if not json.loads(frame)["m2m:rqp"]["to"].endswith("OutdoorTemperature/la"):
+            await super().send(frame)
+
+
+class HangingClient(AsyncDaikinAltherma):
+    """Client of an adapter accepting no connection"""
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.closed = False
+        HangingClient.instances.append(self)
+
+    async def connect(self):
+        await asyncio.sleep(10)
+
+    async def close(self):
+        self.closed = True
+
+
+def sharded_client(address: str) -> AsyncDaikinAltherma:
+    return client_factory({}, {"active": 0, "max": 0})(address)
+
+
+class TestFleet(unittest.TestCase):
+    GROUPS = ["sensors"]
+
+    def test_streaming_and_deadline(self):
+        delays = {"slow": 0.02, "dead": 10}
+        counter = {"active": 0, "max": 0}
+
+        async def run():
+            async with Fleet(["dead", "slow", "fast"], deadline=0.5,
+                             client_factory=client_factory(delays, counter)) as fleet:
+                return [r async for r in fleet.poll(self.GROUPS)]
+
+        results = asyncio.run(run())
+        assert [r.address for r in results] == ["fast", "slow", "dead"]
+        assert results[0].snapshot.indoor_temperature == 21.5
+        assert results[0].ok and results[1].ok
+        assert results[2].error == "deadline"
+        assert results[2].snapshot is None
+
+    def test_partial_results(self):
+        class Client(AsyncDaikinAltherma):
+            async def _open(self):
+                self.ws = PartialWebSocket({"1/Sensor/IndoorTemperature/la": 21.5})
+                self._reader = asyncio.create_task(self._readLoop())
+
+        async def run():
+            async with Fleet(["unit"], deadline=0.2, client_factory=Client) as fleet:
+                return await fleet.poll_all(self.GROUPS)
+
+        result, = asyncio.run(run())
+        assert result.ok
+        assert result.snapshot.indoor_temperature == 21.5
+        assert result.snapshot.timed_out == ("outdoor_temperature",)
+
+    def test_connect_timeout(self):
+        async def run():
+            fleet = Fleet(["unit"], deadline=0.1, client_factory=HangingClient)
+            results = await fleet.poll_all(self.GROUPS)
+            return results, fleet._clients
+
+        results, clients = asyncio.run(run())
+        assert results[0].error == "deadline"
+        assert not clients
+        assert HangingClient.instances[-1].closed
+
+    def test_concurrency_limit(self):
+        addresses = [f"unit{i}" for i in range(20)]
+        delays = {address: 0.005 for address in addresses}
+        counter = {"active": 0, "max": 0}
+
+        async def run():
+            async with Fleet(addresses, concurrency=4, client_factory=client_factory(delays, counter)) as fleet:
+                return await fleet.poll_all(self.GROUPS)
+
+        results = asyncio.run(run())
+        assert len(results) == 20
+        assert all(r.ok for r in results)
+        assert counter["max"] <= 4
+
+    def test_rate_limit(self):
+        counter = {"active": 0, "max": 0}
+
+        async def run():
+            async with Fleet(["unit"], min_interval=0.2, client_factory=client_factory({}, counter)) as fleet:
+                await fleet.poll_all(self.GROUPS)
+                t0 = time.monotonic()
+                await fleet.poll_all(self.GROUPS)
+                return time.monotonic() - t0
+
+        assert asyncio.run(run()) >= 0.15
+
+    def test_shards(self):
+        fleet = Fleet([f"unit{i}" for i in range(10)])
+        shards = [fleet.shard(i, 3).addresses for i in range(3)]
+        assert sorted(sum(shards, [])) == fleet.addresses
+        assert len(shards[0]) == 4
+
+        results = list(poll_sharded(fleet.addresses, self.GROUPS, processes=3, client_factory=sharded_client))
+        assert sorted(r.address for r in results) == sorted(fleet.addresses)
+        assert all(r.snapshot.indoor_temperature == 21.5 for r in results)
+
+
+class ScheduleWebSocket(FakeAsyncWebSocket):
+    """Applies the writes of the heating schedule, unless `stuck`"""
+
+    def __init__(self, values: dict, stuck: bool = False):
+        super().__init__(values)
+        self.stuck = stuck
+
+    async def send(self, frame: str):
+        await super().send(frame)
+        if self.written and not self.stuck:
+            item, con = self.written[-1]
+            self.values[item + "/la"] = con
+
+
+def schedule_client(units: dict):
+    """Clients of fake adapters, units[address] being their ScheduleWebSocket"""
+    class Client(AsyncDaikinAltherma):
+        async def _open(self):
+            self.ws = units[self.adapter_ip]
+            self._reader = asyncio.create_task(self._readLoop())
+    return Client
+
+
+class TestDeploySchedule(unittest.TestCase):
+    OLD = Schedule.from_dict({day: {"0600": 20.0, "2200": 18.0} for day in AsyncDaikinAltherma.DAYS})
+    NEW = Schedule.from_dict({day: {"0600": 20.5, "2200": 18.0} for day in AsyncDaikinAltherma.DAYS})
+
+    def unit(self, schedule: Schedule = None, stuck: bool = False) -> ScheduleWebSocket:
+        values = {}
+        if schedule is not None:
+            values[HEATING_SCHEDULE] = json.dumps({"data": [schedule.to_wire()]})
+        return ScheduleWebSocket(values, stuck)
+
+    def deploy(self, units: dict, dry_run: bool = False) -> dict:
+        async def run():
+            async with Fleet(list(units), client_factory=schedule_client(units)) as fleet:
+                return await fleet.deploy_schedule_all(self.NEW, dry_run)
+        return {r.address: r for r in asyncio.run(run())}
+
+    def test_report(self):
+        units = {
+            "old": self.unit(self.OLD),
+            "new": self.unit(self.NEW),
+            "stuck": self.unit(self.OLD, stuck=True),
+            "gas": self.unit(),
+        }
+        report = self.deploy(units)
+        assert {address: r.status for address, r in report.items()} == {
+            "old": "updated", "new": "unchanged", "stuck": "failed", "gas": "unsupported"}
+        assert report["stuck"].error == "not applied"
+        assert len(report["old"].changes) == 7
+        assert report["old"].changes[0] == ("Mo", 0, (360, 205), (360, 200))
+        assert not units["new"].written
+        assert json.loads(units["old"].values[HEATING_SCHEDULE]) == {"data": [self.NEW.to_wire()]}
+
+    def test_dry_run(self):
+        units = {"old": self.unit(self.OLD), "new": self.unit(self.NEW)}
+        report = self.deploy(units, dry_run=True)
+        assert report["old"].status == "outdated"
+        assert report["new"].ok
+        assert not units["old"].written
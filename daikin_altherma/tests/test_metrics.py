@@ -0,0 +1,37 @@
+import unittest
+
+from daikin_altherma.metrics import Instrumentation, MetricsRegistry
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.tests.helpers import mock_client
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_request_metrics(self):
+        instrumentation = Instrumentation()
+        timings = []
+        instrumentation.add_hooks(post=timings.append)
+        d = mock_client(MockAdapter("no_tank"), instrumentation=instrumentation)
+
+        d.indoor_temperature
+        d.tank_temperature
+        d.snapshot(["sensors"])
+
+        r = instrumentation.registry
+        assert r.counter("daikin_requests_total", path="MNAE/1/Sensor/IndoorTemperature/la") == 2
+        assert r.counter("daikin_request_missing_total", path="MNAE/2/Sensor/TankTemperature/la") == 2
+        assert r.histogram("daikin_request_phase_seconds", phase="wait").count == 9
+        assert len(timings) == 9
+        assert all(t.rqi and t.serialize > 0 and t.decode > 0 for t in timings)
+        assert 'daikin_requests_total{path="MNAE/1/Sensor/IndoorTemperature/la"} 2' in r.to_prometheus()
+
+    def test_registry(self):
+        r = MetricsRegistry()
+        r.inc("hits", path='a"b')
+        r.observe("latency", 0.003, buckets=(0.001, 0.01))
+        r.observe("latency", 0.5, buckets=(0.001, 0.01))
+        assert r.histogram("latency").cumulative() == [(0.001, 0), (0.01, 1), (float("inf"), 2)]
+        assert r.histogram("latency").quantile(0.5) == 0.01
+        text = r.to_prometheus()
+        assert 'hits{path="a\\"b"} 1' in text
+        assert 'latency_bucket{le="+Inf"} 2' in text
+        assert r.dump()["counters"]["hits"] == [{"labels": {"path": 'a"b'}, "value": 1}]
@@ -0,0 +1,75 @@
+import asyncio
+import contextlib
+import io
+import socket
+import threading
+import unittest
+
+from daikin_altherma import DaikinAltherma
+from daikin_altherma.mock_adapter import MockAdapter, serve
+from daikin_altherma.tests.helpers import mock_client
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+class TestMockAdapter(unittest.TestCase):
+    def test_read_write(self):
+        d = mock_client(MockAdapter())
+        assert d.unit_model == "EAVH16S23DA6V"
+        assert d.adapter_model == "BRP069A61"
+        assert d.indoor_setpoint_temperature == 21.0
+        assert d.set_setpoint_temperature(22.5)
+        assert d.indoor_setpoint_temperature == 22.5
+
+        schedule = d.heating_schedule[0]
+        schedule["Mo"] = {"0000": 17.0, "0700": 21.0}
+        d.set_heating_schedule(schedule)
+        assert d.heating_schedule == [schedule]
+
+    def test_profile(self):
+        d = mock_client(MockAdapter("no_tank"))
+        assert d.tank_temperature is None
+        assert d.tank_error_status is None
+        assert d.heating_error_status == "OK"
+
+    def test_print_all_status(self):
+        d = mock_client(MockAdapter())
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            d.print_all_status()
+        assert "--not supported--" not in out.getvalue()
+
+    @unittest.skipIf(websockets is None, "websockets is not installed")
+    def test_websocket_server(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        loop = asyncio.new_event_loop()
+        adapter = MockAdapter(latency=0.01, jitter=0.01, reorder_rate=0.3, seed=1)
+        server = loop.create_task(serve([adapter], port=port))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            for _ in range(50):
+                try:
+                    d = DaikinAltherma(f"127.0.0.1:{port}", keepalive=0)
+                    d.unit_model
+                    break
+                except ConnectionError:
+                    pass
+            s = d.snapshot(["sensors", "status"])
+            assert s.indoor_temperature == 21.5
+            assert s.is_tank_heating_enabled is True
+            d.close()
+        finally:
+            async def stop():
+                server.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await server
+            asyncio.run_coroutine_threadsafe(stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
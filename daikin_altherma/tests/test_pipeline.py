@@ -0,0 +1,52 @@
+import unittest
+
+from daikin_altherma.tests.helpers import FakeWebSocket, make_client
+
+
+class TestPipeline(unittest.TestCase):
+    def test_single_request(self):
+        d = make_client(FakeWebSocket())
+        assert d.unit_model == "/[0]/MNAE/1/UnitInfo/ModelNumber/la"
+
+    def test_out_of_order(self):
+        ws = FakeWebSocket(batch=5)
+        d = make_client(ws, max_in_flight=5)
+        items = [f"1/Item{i}/la" for i in range(12)]
+        values = d._requestValuesHP(items)
+        assert values == [f"/[0]/MNAE/{item}" for item in items]
+        assert ws.sent == 12
+        assert d._responses == {}
+
+
+class TestSnapshot(unittest.TestCase):
+    VALUES = {
+        "1/Sensor/IndoorTemperature/la": 21.5,
+        "1/Operation/Power/la": "on",
+        "1/UnitStatus/EmergencyState/la": 0,
+        "1/UnitStatus/ErrorState/la": 1,
+        "1/UnitStatus/WarningState/la": 0,
+        "0/DateTime/la": "20231020T185608Z",
+    }
+
+    def test_snapshot(self):
+        ws = FakeWebSocket(batch=4, values=self.VALUES)
+        d = make_client(ws)
+        s = d.snapshot(["sensors", "status", "heating_errors"])
+        assert s.indoor_temperature == 21.5
+        assert s.outdoor_temperature is None
+        assert s.is_heating_enabled is True
+        assert s.heating_error_status == "Error"
+        assert s.tank_error_status is None
+        assert s.unit_datetime is None  # unit_info was not requested
+
+    def test_error_status(self):
+        d = make_client(FakeWebSocket(values=self.VALUES))
+        assert d.heating_error_status == "Error"
+        assert d.tank_error_status is None
+
+    def test_read_many(self):
+        d = make_client(FakeWebSocket(batch=2, values=self.VALUES))
+        assert d.read_many(["0/DateTime/la", "1/Operation/Power/la"]) == {
+            "0/DateTime/la": "20231020T185608Z",
+            "1/Operation/Power/la": "on",
+        }
@@ -0,0 +1,67 @@
+import unittest
+
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.poller import ChangeRate, DeltaPoller
+from daikin_altherma.tests.helpers import mock_client
+
+INDOOR = "1/Sensor/IndoorTemperature/la"
+SETPOINT = "1/Operation/TargetTemperature/la"
+MODEL = "1/UnitInfo/ModelNumber/la"
+POWERFUL = "2/Operation/Powerful/la"
+
+
+class TestChangeRate(unittest.TestCase):
+    def test_learns_interval(self):
+        rate = ChangeRate(1, 100)
+        rate.since = 0
+        for t in range(10, 101, 10):
+            rate.update(True, t)
+        assert rate.interval == 5
+
+        # Changes stop: the interval grows back, within bounds
+        for t in range(110, 2000, 10):
+            rate.update(False, t)
+        assert rate.interval == 100
+
+    def test_never_changes(self):
+        rate = ChangeRate(1, 60)
+        for t in range(30):
+            rate.update(False, t)
+        assert rate.interval == 60
+
+
+class TestDeltaPoller(unittest.TestCase):
+    def test_changes_only(self):
+        adapter = MockAdapter()
+        changes = []
+        poller = DeltaPoller(mock_client(adapter), [INDOOR, MODEL], changes.append, min_interval=0)
+        assert poller.poll() == []
+        assert poller.values == {INDOOR: 21.5, MODEL: "EAVH16S23DA6V"}
+
+        adapter.update(INDOOR, 22.5)
+        poller.refresh()
+        polled = poller.poll()
+        assert changes == polled
+        assert [(c.path, c.old, c.new) for c in changes] == [(INDOOR, 21.5, 22.5)]
+
+    def test_refresh_after_write(self):
+        d = mock_client(MockAdapter())
+        poller = DeltaPoller(d, [INDOOR, SETPOINT], min_interval=60)
+        poller.poll()
+        assert poller.next_poll() > 30
+
+        d.set_setpoint_temperature(23)
+        assert poller.next_poll() == 0
+        changes = poller.poll()
+        assert [(c.path, c.old, c.new) for c in changes] == [(SETPOINT, 21.0, 23)]
+        assert poller.values[INDOOR] == 21.5  # not read again
+
+        poller.stop()
+        assert not d.write_listeners
+
+    def test_rejected_write(self):
+        d = mock_client(MockAdapter("no_tank"))
+        poller = DeltaPoller(d, [INDOOR, POWERFUL], min_interval=60)
+        poller.poll()
+        d.set_tank_heating_enabled(True)  # rsc 4004
+        assert poller.next_poll() > 30
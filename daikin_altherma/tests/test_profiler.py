@@ -0,0 +1,72 @@
+import contextlib
+import io
+import unittest
+
+from daikin_altherma.metrics import Instrumentation
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.profiler import RequestProfiler
+from daikin_altherma.tests.helpers import mock_client
+
+INDOOR = "MNAE/1/Sensor/IndoorTemperature/la"
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def test_duplicates(self):
+        d = mock_client(MockAdapter())
+        with RequestProfiler(d) as profile:
+            d.indoor_temperature
+            d.indoor_temperature
+            d.heating_error_status
+            with contextlib.redirect_stdout(io.StringIO()):
+                d.print_all_status()
+        assert d.instrumentation is None
+
+        first, second = profile.requests[:2]
+        assert (first.item, first.api, first.duplicate) == (INDOOR, "indoor_temperature", False)
+        assert second.duplicate
+        assert first.call_site.startswith("test_profiler.py:")
+        assert first.call_site.endswith(" in test_duplicates")
+        assert {r.api for r in profile.requests} == {"indoor_temperature", "heating_error_status", "print_all_status"}
+
+        # heating_error_status and print_all_status both read the heating errors
+        duplicates = profile.duplicates()
+        assert len(duplicates[INDOOR]) == 3
+        assert "MNAE/1/UnitStatus/ErrorState/la" in duplicates
+        errors = [f"MNAE/1/UnitStatus/{state}State/la" for state in ("Error", "Warning", "Emergency")]
+        assert all(r.duplicate for r in profile.requests if r.api == "print_all_status" and r.item in errors)
+
+        # Lockstep reads are one round trip each, pipelined batches one in all
+        assert len(profile.round_trips) == 4
+        assert [len(rt.requests) for rt in profile.round_trips[:2]] == [1, 1]
+        assert profile.cache_savings() > 0
+        assert profile.batch_savings() > 0
+
+        s = profile.summary()
+        assert s["requests"] == len(profile.requests)
+        assert s["duplicate_reads"] == sum(r.duplicate for r in profile.requests)
+        assert s["wait_s"] >= s["cache_savings_s"]
+        assert [site["api"] for site in s["call_sites"] if site["api"] == "indoor_temperature"]
+        report = profile.report()
+        assert f"{len(profile.requests)} requests in 4 round trips" in report
+        assert f"  {INDOOR} x3: indoor_temperature (test_profiler.py:" in report
+
+    def test_writes(self):
+        d = mock_client(MockAdapter())
+        with RequestProfiler(d) as profile:
+            d.indoor_setpoint_temperature
+            d.set_setpoint_temperature(22)
+            d.indoor_setpoint_temperature
+        assert [r.write for r in profile.requests] == [False, True, False]
+        assert not any(r.duplicate for r in profile.requests)
+        assert profile.requests[1].api == "set_setpoint_temperature"
+
+    def test_existing_instrumentation(self):
+        instrumentation = Instrumentation()
+        d = mock_client(MockAdapter(), instrumentation=instrumentation)
+        with RequestProfiler(d) as profile:
+            d.read_many(["1/Sensor/IndoorTemperature/la", "1/Sensor/OutdoorTemperature/la"])
+        d.indoor_temperature
+        assert d.instrumentation is instrumentation and not instrumentation.post_request
+        assert len(profile.requests) == 2 and len(profile.round_trips) == 1
+        assert profile.batch_savings() == 0
+        assert instrumentation.registry.counter("daikin_requests_total", path=INDOOR) == 2
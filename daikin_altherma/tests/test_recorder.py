@@ -0,0 +1,78 @@
+import math
+import os
+import tempfile
+import unittest
+
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.recorder import GROUPS, Recorder
+from daikin_altherma.tests.helpers import mock_client
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, "unit.dkts")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_append_and_reopen(self):
+        snapshot = mock_client(MockAdapter()).snapshot(GROUPS)
+        with Recorder(self.filename) as recorder:
+            for t in range(5000):  # more than the initial size of the file
+                recorder.append({"indoor_temperature": 20 + t / 10, "is_heating_active": t % 2}, 1000 + t)
+            recorder.append(snapshot, 7000)
+            with self.assertRaises(ValueError):
+                recorder.append(snapshot, 6999)
+
+        with Recorder(self.filename) as recorder:
+            assert len(recorder) == 5001
+            samples = list(recorder.samples(1010, 1012))
+            assert [t for t, _ in samples] == [1010, 1011]
+            assert samples[0][1]["indoor_temperature"] == 21.0
+            assert samples[0][1]["is_heating_active"] is False
+            assert samples[0][1]["tank_temperature"] is None
+            t, last = list(recorder.samples(6000))[0]
+            assert t == 7000
+            assert last["tank_temperature"] == 48.0
+            assert last["is_heating_enabled"] is True
+            assert last["is_tank_error"] is False
+
+    def test_ring_buffer(self):
+        with Recorder(self.filename, capacity=10) as recorder:
+            for t in range(25):
+                recorder.append({"outdoor_temperature": t}, t)
+            assert len(recorder) == 10
+            assert [v["outdoor_temperature"] for _, v in recorder.samples()] == list(range(15, 25))
+            assert [t for t, _ in recorder.samples(18, 21)] == [18, 19, 20]
+        assert os.path.getsize(self.filename) == 512 + 10 * 22
+
+    @unittest.skipIf(numpy is None, "needs numpy")
+    def test_query_and_downsample(self):
+        with Recorder(self.filename, capacity=100) as recorder:
+            for t in range(150):  # wraps around
+                recorder.append({"indoor_temperature": t if t % 10 else None, "is_heating_active": t % 2}, t)
+            values = recorder.query(95, 105, ["indoor_temperature", "is_heating_active"])
+            assert values["timestamp"].tolist() == list(range(95, 105))
+            assert math.isnan(values["indoor_temperature"][5])
+            assert values["indoor_temperature"][6] == 101
+
+            stats = recorder.downsample(60, 150, bucket=30, columns=["indoor_temperature", "is_heating_active"])
+            assert stats["timestamp"].tolist() == [60, 90, 120]
+            assert stats["samples"].tolist() == [30, 30, 30]
+            assert stats["indoor_temperature_min"].tolist() == [61, 91, 121]
+            assert stats["indoor_temperature_max"].tolist() == [89, 119, 149]
+            assert stats["indoor_temperature_mean"][0] == sum(t for t in range(60, 90) if t % 10) / 27
+            assert stats["is_heating_active_mean"].tolist() == [0.5, 0.5, 0.5]
+
+            stats = recorder.downsample(60, 75, bucket=7.5, columns=["is_heating_active"])
+            assert stats["timestamp"].tolist() == [60, 67.5]
+            assert stats["samples"].tolist() == [8, 7]
+            assert len(recorder.downsample(60, 70, bucket=0.5)["timestamp"]) == 10
+            with self.assertRaises(ValueError):
+                recorder.downsample(bucket=0)
@@ -0,0 +1,51 @@
+import json
+import unittest
+
+from daikin_altherma import DaikinAltherma, RESOURCES, SETTINGS, SNAPSHOT_GROUPS, DaikinSnapshot
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.resources import Resource, extract, read_frame, registry
+from daikin_altherma.tests.helpers import mock_client
+
+
+class TestResources(unittest.TestCase):
+    def test_read_frame(self):
+        for item in ["MNAE/1/Sensor/IndoorTemperature/la", "MNCSE-node/deviceInfo"]:
+            frame = read_frame(DaikinAltherma.UserAgent, "0a1b2", item)
+            assert json.loads(frame) == DaikinAltherma._buildRequest("0a1b2", item)
+
+    def test_extract(self):
+        result = {"m2m:rsp": {"rsc": 2000, "pc": {"m2m:cin": {"con": 0}}}}
+        assert extract(result, "/m2m:rsp/pc/m2m:cin/con") == 0
+        assert extract(result, "m2m:rsp/rsc") == 2000
+        assert extract(result, "/") is result
+        with self.assertRaises(KeyError):
+            extract({"m2m:rsp": {"rsc": 4004}}, "/m2m:rsp/pc/m2m:cin/con")
+        with self.assertRaises(KeyError):
+            extract({"m2m:rsp": {"pc": "text"}}, "/m2m:rsp/pc/m2m:cin/con")
+
+    def test_registry(self):
+        assert RESOURCES["indoor_temperature"].item == "MNAE/1/Sensor/IndoorTemperature/la"
+        assert RESOURCES["adapter_model"].item == "MNCSE-node/deviceInfo"
+        fields = {name for group in SNAPSHOT_GROUPS.values() for name in group}
+        assert fields == set(DaikinSnapshot.__dataclass_fields__) - {"adapter_ip", "groups", "timed_out"}
+        assert DaikinAltherma.indoor_temperature.__doc__ == "Returns the indoor temperature, in °C"
+        assert DaikinAltherma.indoor_temperature.fget.__qualname__ == "DaikinAltherma.indoor_temperature"
+        with self.assertRaises(ValueError):
+            registry([Resource("a", 1, "A"), Resource("a", 2, "A")])
+
+    def test_settings(self):
+        assert SETTINGS["set_heating_enabled"].request(False) == (
+            "MNAE/1/Operation/Power", "/", {"con": "standby", "cnf": "text/plain:0"})
+        assert SETTINGS["set_setpoint_temperature"].request(21.5)[2]["con"] == 21.5
+        with self.assertRaises(KeyError):
+            SETTINGS["set_holiday_mode"].request("yes")
+
+    def test_generated_properties(self):
+        d = mock_client(MockAdapter(profile="minimal"))
+        snapshot = d.snapshot()
+        for name, resource in RESOURCES.items():
+            expected = getattr(snapshot, name)
+            assert getattr(d, name) == (resource.default if expected is None else expected), name
+        assert d.heating_schedule == []
+        assert d.is_unit_datetime_adjustable is False
+        assert d.is_heating_enabled is True
@@ -1,7 +1,17 @@
+import datetime
+import json
 import unittest
 import pprint
 
-from daikin_altherma import DaikinAltherma
+from daikin_altherma import DaikinAltherma, TankStateEnum
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.schedule import LocalSchedule, Schedule, ScheduleEvaluator
+from daikin_altherma.tests.helpers import RL_SCHEDULES, mock_client
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 S1 = "$NULL|1|0000,180;0450,200;2300,180;,;,;,;0000,180;0450,200;2300,180;,;,;,;0000,180;0450,200;2300,180;,;,;,;0000,180;0450,200;2300,180;,;,;,;0000,180;0450,200;2300,180;,;,;,;0000,180;0450,200;2300,180;,;,;,;0000,180;0450,200;2300,180;,;,;,"
@@ -30,13 +40,110 @@ class TestHeatingSchedule(unittest.TestCase):
         assert schedule == back_schedule
 
     def test_rl(self):
-        S1 = "$NULL|0|0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0700,200;0900,180;1700,200;2300,180;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,"
-        S2 = "$NULL|0|0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0700,200;0900,180;1200,200;1400,180;1700,200;2300,180;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,"
-        S3 = "$NULL|0|0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,;0800,200;2300,180;,;,;,;,"
-        S4 = "JANEDOE|1|0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;,;,;0330,200;1800,180;,;,;0000,180;0000,180"
-        S5 = "$NULL|1|0010,120;0000,180;0000,180;0000,180;0000,180;0000,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,"
-        S6 = "$NULL|1|,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,;,"
-
-        schedules = [S1, S2, S3, S4, S5, S6]
-        for s in schedules:
-            DaikinAltherma._unmarshall_schedule(s, DaikinAltherma._heating_value_parser)
\ No newline at end of file
+        for s in RL_SCHEDULES:
+            DaikinAltherma._unmarshall_schedule(s, DaikinAltherma._heating_value_parser)
+
+    def test_marshall_rounding(self):
+        """Values are rounded to the nearest tenth, not truncated"""
+        s_str = DaikinAltherma._marshall_schedule({"Mo": {"0600": 16.4 - 0.3}})  # 16.099999999999998
+        assert s_str.startswith("$NULL|1|0600,161;")
+
+
+class TestScheduleModel(unittest.TestCase):
+    def test_lossless(self):
+        for wire in [S1] + RL_SCHEDULES:
+            assert Schedule.parse(wire).to_wire() == wire
+
+    def test_partial(self):
+        # Like _unmarshall_schedule: missing slots are empty, extra ones ignored
+        monday = "$NULL|1|0600,200;2200,180"
+        s = Schedule.parse(monday)
+        assert s.day("Mo") == [(360, 200), (1320, 180)]
+        assert s.day("Tu") == []
+        assert s.to_dict(DaikinAltherma._heating_value_parser) == \
+            DaikinAltherma._unmarshall_schedule(monday, DaikinAltherma._heating_value_parser)
+        assert Schedule.parse(S1 + ";0700,190") == Schedule.parse(S1)
+
+    def test_dict(self):
+        s = Schedule.parse(S1)
+        assert s.to_dict(DaikinAltherma._heating_value_parser) == \
+            DaikinAltherma._unmarshall_schedule(S1, DaikinAltherma._heating_value_parser)
+        assert Schedule.from_dict(s.to_dict(DaikinAltherma._heating_value_parser)) == s
+        assert s.day("Tu") == [(0, 180), (290, 200), (1380, 180)]
+
+    def test_diff(self):
+        s = Schedule.parse(S1)
+        schedule = s.to_dict(DaikinAltherma._heating_value_parser)
+        schedule["We"]["0450"] = 21.5
+        del schedule["Su"]["2300"]
+        other = Schedule.from_dict(schedule)
+        assert other != s
+        assert other.diff(s) == [
+            ("We", 1, (290, 215), (290, 200)),
+            ("Su", 2, None, (1380, 180)),
+        ]
+        assert s.diff(Schedule.parse(S1)) == []
+
+    def test_skip_unchanged_write(self):
+        adapter = MockAdapter()
+        d = mock_client(adapter)
+        schedule = d.heating_schedule[0]
+        assert d.set_heating_schedule(schedule)
+        assert adapter.requests["/[0]/MNAE/1/Schedule/List/Heating"] == 0
+
+        schedule["Mo"]["1200"] = 22.0
+        assert d.set_heating_schedule(schedule)
+        assert adapter.requests["/[0]/MNAE/1/Schedule/List/Heating"] == 1
+        assert d.heating_schedule == [schedule]
+        assert d.set_heating_schedule(schedule, force=True)
+        assert adapter.requests["/[0]/MNAE/1/Schedule/List/Heating"] == 2
+
+
+class TestScheduleEvaluator(unittest.TestCase):
+    MONDAY = datetime.datetime(2024, 1, 1)
+
+    def test_at(self):
+        e = ScheduleEvaluator(DaikinAltherma._unmarshall_schedule(S1, DaikinAltherma._heating_value_parser))
+        assert len(e) == 21
+        assert e.at(self.MONDAY + datetime.timedelta(hours=5)) == 20.0
+        assert e.at(self.MONDAY + datetime.timedelta(hours=4, minutes=49)) == 18.0
+        assert e.at(self.MONDAY + datetime.timedelta(hours=23, minutes=59)) == 18.0
+        assert ScheduleEvaluator({}).at(self.MONDAY) is None
+
+    def test_wraps_around_the_week(self):
+        e = ScheduleEvaluator({"We": {"0800": 21.0, "2200": 17.0}})
+        assert e.at(self.MONDAY) == 17.0  # from the previous Wednesday
+        wednesday = datetime.datetime(2024, 1, 3, 12, 0, 30)
+        assert e.next_transition(wednesday) == (datetime.datetime(2024, 1, 3, 22, 0), 17.0)
+        thursday = datetime.datetime(2024, 1, 4, 12)
+        assert e.next_transition(thursday) == (datetime.datetime(2024, 1, 10, 8, 0), 21.0)
+        # Exactly at the only transition: the next one is a week later
+        e = ScheduleEvaluator({"We": {"0800": 21.0}})
+        assert e.next_transition(datetime.datetime(2024, 1, 3, 8)) == (datetime.datetime(2024, 1, 10, 8), 21.0)
+
+    @unittest.skipIf(numpy is None, "needs numpy")
+    def test_per_minute(self):
+        e = ScheduleEvaluator({"Mo": {"0000": 18.0, "0600": 20.5}, "Su": {"2330": 16.0}})
+        start = self.MONDAY + datetime.timedelta(hours=5, minutes=58)
+        assert e.per_minute(start, 4).tolist() == [18.0, 18.0, 20.5, 20.5]
+        assert e.per_minute(self.MONDAY - datetime.timedelta(minutes=31), 2).tolist() == [20.5, 16.0]
+
+        tank = ScheduleEvaluator({"Mo": {"0000": TankStateEnum.ECO, "0500": TankStateEnum.COMFORT}})
+        assert list(tank.per_minute(self.MONDAY + datetime.timedelta(hours=4, minutes=59), 2)) == \
+            [TankStateEnum.ECO, TankStateEnum.COMFORT]
+
+    def test_verify_against_unit(self):
+        adapter = MockAdapter()
+        d = mock_client(adapter)
+        schedule = LocalSchedule(d, "heating")
+        next_transition = self.MONDAY + datetime.timedelta(hours=21)
+        assert schedule.verify(next_transition)
+        assert schedule.at(self.MONDAY + datetime.timedelta(hours=23)) == 18.0
+        assert LocalSchedule(d, "tank").verify(next_transition)
+
+        new = {day: {"0000": 19.0} for day in DaikinAltherma.DAYS}
+        d.set_heating_schedule(new)
+        adapter.update("1/Schedule/Next/la", json.dumps(
+            {"data": {"OperationMode": "heating", "StartTime": 0, "TargetTemperature": 190, "Day": "Tu"}}))
+        assert not schedule.verify(next_transition)
+        assert schedule.at(self.MONDAY + datetime.timedelta(hours=23)) == 19.0
@@ -0,0 +1,88 @@
+import asyncio
+import queue
+import unittest
+
+from daikin_altherma.mock_adapter import MockAdapter
+from daikin_altherma.tests.helpers import mock_client
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+INDOOR = "1/Sensor/IndoorTemperature/la"
+TANK = "2/Sensor/TankTemperature/la"
+
+
+class TestSubscriptions(unittest.TestCase):
+    def test_pushed(self):
+        adapter = MockAdapter()
+        d = mock_client(adapter, timeout=0.05, thread_safe=True)
+        notifications = queue.Queue()
+        subscription = d.subscribe([INDOOR, TANK], notifications.put)
+        assert subscription.pushed == [INDOOR, TANK]
+        assert not subscription.polled
+
+        adapter.update(INDOOR, 22.0)
+        adapter.update(INDOOR, 22.0)  # unchanged: not notified
+        adapter.update(TANK, 47.5)
+        first, second = notifications.get(timeout=1), notifications.get(timeout=1)
+        assert (first.path, first.value, first.pushed) == (INDOOR, 22.0, True)
+        assert (second.path, second.value) == (TANK, 47.5)
+        assert notifications.empty()
+
+        subscription.cancel()
+        assert not any(adapter.subscriptions.values())
+        d.close()
+
+    def test_not_writes(self):
+        # Creating and deleting subscriptions do not notify the write listeners
+        d = mock_client(MockAdapter(), timeout=0.05, thread_safe=True)
+        written = []
+        d.write_listeners.append(written.append)
+        d.subscribe([INDOOR], print).cancel()
+        assert written == []
+        d.set_setpoint_temperature(21.5)
+        assert written == ["MNAE/1/Operation/TargetTemperature"]
+        d.close()
+
+    def test_polling_fallback(self):
+        adapter = MockAdapter(subscriptions=False)
+        d = mock_client(adapter, timeout=0.05, thread_safe=True)
+        notifications = queue.Queue()
+        subscription = d.subscribe([INDOOR], notifications.put, min_interval=0.01, max_interval=0.05)
+        assert subscription.polled == [INDOOR]
+
+        adapter.update(INDOOR, 19.5)
+        notification = notifications.get(timeout=1)
+        assert (notification.path, notification.value, notification.pushed) == (INDOOR, 19.5, False)
+        subscription.cancel()
+        d.close()
+
+    def test_needs_reader_thread(self):
+        d = mock_client(MockAdapter())
+        with self.assertRaises(RuntimeError):
+            d.subscribe([INDOOR], print)
+
+    @unittest.skipIf(websockets is None, "needs the websockets package")
+    def test_async_iterator(self):
+        from daikin_altherma.aio import AsyncDaikinAltherma
+        from daikin_altherma.benchmark import SimulatedAdapters
+
+        server = SimulatedAdapters()
+
+        async def run():
+            async with AsyncDaikinAltherma(server.address) as d:
+                subscription = await d.subscribe([INDOOR])
+                server.adapters[0].update(INDOOR, 23.0)
+                notification = await asyncio.wait_for(subscription.__anext__(), 2)
+                await subscription.cancel()
+                return notification, [n async for n in subscription]
+
+        try:
+            notification, rest = asyncio.run(run())
+        finally:
+            server.close()
+        assert (notification.path, notification.value) == (INDOOR, 23.0)
+        assert rest == []
+        assert not any(server.adapters[0].subscriptions.values())
@@ -0,0 +1,55 @@
+import json
+import queue
+import threading
+import unittest
+from unittest import mock
+
+from websocket import WebSocketTimeoutException
+
+from daikin_altherma import DaikinAltherma
+
+
+class QueueWebSocket:
+    """Replies to every request with its path, from whichever thread recv()s"""
+
+    def __init__(self):
+        self.replies = queue.Queue()
+
+    def send(self, frame: str):
+        rqp = json.loads(frame)["m2m:rqp"]
+        self.replies.put(json.dumps({"m2m:rsp": {
+            "rqi": rqp["rqi"],
+            "to": rqp["fr"],
+            "pc": {"m2m:cin": {"con": rqp["to"]}},
+        }}))
+
+    def recv(self) -> str:
+        try:
+            return self.replies.get(timeout=0.05)
+        except queue.Empty:
+            raise WebSocketTimeoutException("timeout")
+
+    def close(self):
+        pass
+
+
+class TestThreadSafe(unittest.TestCase):
+    def test_concurrent_threads(self):
+        with mock.patch("daikin_altherma.create_connection", return_value=QueueWebSocket()):
+            d = DaikinAltherma("localhost", thread_safe=True)
+        errors = []
+
+        def worker(n: int):
+            for i in range(50):
+                item = f"{n}/Item{i}/la"
+                if d._requestValueHP(item) != f"/[0]/MNAE/{item}":
+                    errors.append(item)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        d.close()
+        assert errors == []
+        assert d._responses == {}
@@ -0,0 +1,101 @@
+import unittest
+
+from websocket import WebSocketConnectionClosedException, WebSocketTimeoutException
+
+from daikin_altherma import DaikinAltherma, transport
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+INDOOR = "1/Sensor/IndoorTemperature/la"
+
+
+@unittest.skipIf(websockets is None, "needs the websockets package")
+class TransportTests:
+    """Runs every backend against a simulated adapter over real sockets"""
+    name = None
+
+    @classmethod
+    def setUpClass(cls):
+        from daikin_altherma.benchmark import SimulatedAdapters
+
+        cls.server = SimulatedAdapters()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def connect(self, path: str = "/mca", timeout: float = 2):
+        return transport.get(self.name)(f"ws://{self.server.address}{path}", timeout=timeout)
+
+    def test_client(self):
+        d = DaikinAltherma(self.server.address, keepalive=0, connect=self.name)
+        try:
+            assert d.unit_model == "EAVH16S23DA6V"
+            assert (d.indoor_temperature, d.tank_temperature) == (21.5, 48.0)
+            values = d._requestValuesHP([INDOOR] * 50)  # pipelined
+            assert values == [21.5] * 50
+            assert d.set_setpoint_temperature(22.0)
+            assert self.server.adapters[-1].state["1/Operation/TargetTemperature/la"] == 22.0
+        finally:
+            d.close()
+
+    def test_large_frames(self):
+        d = DaikinAltherma(self.server.address, keepalive=0, connect=self.name)
+        try:
+            d.unit_model
+            for size in (100, 1000, 70000):  # 7, 16 and 64 bits payload lengths
+                self.server.adapters[-1].update(INDOOR, "é" * size)
+                assert d._requestValueHP(INDOOR) == "é" * size
+        finally:
+            d.close()
+
+    def test_ping(self):
+        ws = self.connect()
+        try:
+            ws.ping()
+            ws.send('{"m2m:rqp": {"fr": "test", "rqi": "1", "op": 2, "to": "/[0]/MNAE/%s"}}' % INDOOR)
+            assert '"rqi": "1"' in ws.recv()
+        finally:
+            ws.close()
+
+    def test_timeout(self):
+        ws = self.connect(timeout=0.1)
+        try:
+            with self.assertRaises(WebSocketTimeoutException):
+                ws.recv()
+        finally:
+            ws.close()
+
+    def test_closed_by_adapter(self):
+        ws = self.connect("/unknown")
+        try:
+            with self.assertRaises(WebSocketConnectionClosedException):
+                for _ in range(2):
+                    ws.recv()  # websocket-client returns "" for the close frame
+        finally:
+            ws.close()
+
+
+class TestWebsocketClient(TransportTests, unittest.TestCase):
+    name = "websocket-client"
+
+
+class TestRaw(TransportTests, unittest.TestCase):
+    name = "raw"
+
+
+class TestAsyncio(TransportTests, unittest.TestCase):
+    name = "asyncio"
+
+
+class TestGet(unittest.TestCase):
+    def test_get(self):
+        assert transport.get("raw") == transport.RawWebSocket.connect
+        def connect(url, timeout):
+            pass
+        assert transport.get(connect) is connect
+        with self.assertRaises(ValueError):
+            transport.get("carrier-pigeon")
@@ -0,0 +1,120 @@
+import datetime
+import time
+import unittest
+
+from daikin_altherma.mock_adapter import LoopbackWebSocket, MockAdapter
+from daikin_altherma.tests.helpers import SilentWebSocket, make_client, mock_client
+from daikin_altherma.writes import Transaction, WriteQueue
+
+TARGET = "1/Operation/TargetTemperature/la"
+POWER = "1/Operation/Power/la"
+
+
+class StubbornAdapter(MockAdapter):
+    """Acknowledges the writes of some resources without applying them"""
+
+    def __init__(self, *args, ignored: tuple = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ignored = ignored
+        self.written = []  # (path, value) of every write
+
+    def _write(self, path: str, cin: dict) -> dict:
+        self.written.append((path, cin.get("con")))
+        if path in self.ignored:
+            return {"rsc": 2001, "pc": {"m2m:cin": cin}}
+        return super()._write(path, cin)
+
+
+class TestTransaction(unittest.TestCase):
+    def test_commit(self):
+        adapter = StubbornAdapter(ignored=("1/Holiday/HolidayState",))
+        ws = LoopbackWebSocket(adapter)
+        d = make_client(ws)
+        with Transaction(d) as t:
+            t.set_setpoint_temperature(21)
+            t.set_heating_enabled(False)
+            t.set_setpoint_temperature(22.5)
+            t.set_holiday_mode(on_holiday=True)
+            t.set_unit_datetime(datetime.datetime(2024, 1, 1))
+            assert adapter.written == []
+
+        # The setpoint is only written once, with its last value
+        assert adapter.written == [
+            ("1/Operation/Power", "standby"),
+            ("1/Operation/TargetTemperature", 22.5),
+            ("1/Holiday/HolidayState", 1),
+            ("0/DateTime", "20240101T000000Z"),
+        ]
+        assert [(r.item, r.status) for r in t.results] == [
+            ("MNAE/1/Operation/Power", "applied"),
+            ("MNAE/1/Operation/TargetTemperature", "applied"),
+            ("MNAE/1/Holiday/HolidayState", "not applied"),
+            ("MNAE/0/DateTime", "acknowledged"),
+        ]
+        assert t.results[1].read_back == 22.5 and t.results[2].read_back == 0
+        assert not t.ok
+        # Writes sent in one pipelined batch, read back in another
+        assert ws.round_trips == 2
+        with self.assertRaises(RuntimeError):
+            t.set_heating_enabled(True)
+
+    def test_rejected(self):
+        d = mock_client(MockAdapter("no_tank"))
+        with Transaction(d) as t:
+            t.set_tank_heating_enabled(True)
+            t.set_setpoint_temperature(20)
+        assert [r.status for r in t.results] == ["rejected", "applied"]
+
+    def test_timeout(self):
+        # Only the write without a reply times out
+        d = make_client(SilentWebSocket(MockAdapter(), ["1/Holiday/HolidayState"]))
+        d.timeout = 0.1
+        with Transaction(d) as t:
+            t.set_holiday_mode(True)
+            t.set_setpoint_temperature(20)
+        assert [r.status for r in t.results] == ["timeout", "applied"]
+
+
+class TestWriteQueue(unittest.TestCase):
+    def setUp(self):
+        self.adapter = StubbornAdapter()
+        self.d = mock_client(self.adapter, timeout=0.05, thread_safe=True)
+
+    def tearDown(self):
+        self.d.close()
+
+    def test_debounce(self):
+        with WriteQueue(self.d, window=0.1) as queue:
+            futures = [queue.set_setpoint_temperature(t) for t in (20, 20.5, 21, 21.5)]
+            power = queue.set_heating_enabled(True)
+            assert self.adapter.written == []
+            result = futures[0].result(timeout=2)
+            assert all(f.result() is result for f in futures)
+            assert (result.value, result.status) == (21.5, "applied")
+            assert power.result().ok
+            assert queue.coalesced == 3
+            assert sorted(self.adapter.written) == [
+                ("1/Operation/Power", "on"), ("1/Operation/TargetTemperature", 21.5)]
+
+            # A new window starts with the next write
+            t0 = time.monotonic()
+            assert queue.set_setpoint_temperature(19).result(timeout=2).ok
+            assert time.monotonic() - t0 >= 0.09
+        assert self.adapter.state[TARGET] == 19
+
+    def test_flush_and_close(self):
+        queue = WriteQueue(self.d, window=10)
+        queue.set_setpoint_temperature(23)
+        assert [r.status for r in queue.flush()] == ["applied"]
+        assert self.adapter.state[TARGET] == 23
+
+        future = queue.set_heating_enabled(False)
+        queue.close()
+        assert future.result(timeout=0).ok
+        assert self.adapter.state[POWER] == "standby"
+        with self.assertRaises(RuntimeError):
+            queue.set_heating_enabled(True)
+
+    def test_needs_thread_safe(self):
+        with self.assertRaises(RuntimeError):
+            WriteQueue(mock_client(MockAdapter()))
@@ -0,0 +1,293 @@
+"""Transports: the websockets DaikinAltherma talks to the adapters with.
+
+A transport is opened by a `connect(url, timeout)` callable, and has the
+send/recv/ping/close methods of a websocket-client WebSocket: recv
+raises WebSocketTimeoutException on timeout, and WebSocketException or
+OSError when the connection is lost. With gettimeout/settimeout, the
+reads with a deadline do not wait past it. The backends of TRANSPORTS are:
+
+- "websocket-client": websocket-client's create_connection, the default,
+- "raw": RawWebSocket, a minimal client for the small text frames of the
+  adapters, on a blocking socket,
+- "asyncio": AsyncioWebSocket, the `websockets` package on an event loop
+  shared by all the connections (pip install websockets).
+
+    >>> d = DaikinAltherma('192.168.10.126', connect='raw')
+
+`python -m daikin_altherma.benchmark --transports websocket-client,raw,asyncio`
+compares them.
+"""
+from typing import Callable
+import asyncio
+import base64
+import hashlib
+import os
+import queue
+import random
+import socket
+import threading
+import urllib.parse
+
+from websocket import (
+    create_connection, WebSocketBadStatusException, WebSocketConnectionClosedException,
+    WebSocketProtocolException, WebSocketTimeoutException,
+)
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_TEXT, _BINARY, _CONTINUATION, _CLOSE, _PING, _PONG = 0x1, 0x2, 0x0, 0x8, 0x9, 0xA
+
+
+def _mask(payload: bytes, key: bytes) -> bytes:
+    """Masks (or unmasks) a payload, XORing it as one big integer"""
+    n = len(payload)
+    if not n:
+        return payload
+    mask = (key * ((n + 3) // 4))[:n]
+    return (int.from_bytes(payload, "little") ^ int.from_bytes(mask, "little")).to_bytes(n, "little")
+
+
+class RawWebSocket:
+    """Minimal websocket client (RFC 6455) for small text frames.
+
+    Frames are read with recv_into in a reusable buffer, and their text is
+    decoded straight from it. Frames are sent with a single sendall, and
+    masked as one big integer. No extensions, no proxies, no TLS.
+    """
+
+    def __init__(self, sock: socket.socket, buffer: bytearray = None):
+        self.sock = sock
+        self._buffer = buffer if buffer is not None else bytearray(16384)
+        self._view = memoryview(self._buffer)
+        self._start = self._end = 0  # unread bytes of the buffer
+        self._fragments = None  # payloads of a fragmented message
+        self._sending = threading.Lock()
+
+    @classmethod
+    def connect(cls, url: str, timeout: float = None, **options) -> 'RawWebSocket':
+        """Opens a websocket to a ws:// URL"""
+        u = urllib.parse.urlsplit(url)
+        if u.scheme != "ws":
+            raise ValueError(f"Only ws:// URLs are supported, not {url}")
+        host, port = u.hostname, u.port or 80
+        sock = socket.create_connection((host, port), timeout)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            key = base64.b64encode(os.urandom(16))
+            sock.sendall(
+                f"GET {u.path or '/'} HTTP/1.1\r\nHost: {u.netloc}\r\nUpgrade: websocket\r\n"
+                f"Connection: Upgrade\r\nSec-WebSocket-Key: {key.decode()}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+                .encode())
+            ws = cls(sock)
+            ws._handshake(key)
+            return ws
+        except BaseException:
+            sock.close()
+            raise
+
+    def _handshake(self, key: bytes):
+        while (end := self._buffer.find(b"\r\n\r\n", 0, self._end)) < 0:
+            if self._end == len(self._buffer):
+                raise WebSocketProtocolException("Handshake response too long")
+            self._read()
+        status, *headers = bytes(self._buffer[:end]).decode("latin-1").split("\r\n")
+        if status.split(" ")[1:2] != ["101"]:
+            raise WebSocketBadStatusException(f"Handshake status {status}", 0)
+        headers = {name.strip().lower(): value.strip() for name, _, value in (h.partition(":") for h in headers)}
+        accept = base64.b64encode(hashlib.sha1(key + _GUID).digest()).decode()
+        if headers.get("sec-websocket-accept") != accept:
+            raise WebSocketProtocolException("Invalid Sec-WebSocket-Accept")
+        self._start = end + 4
+
+    def _read(self):
+        """Reads what the socket has, after the unread bytes"""
+        try:
+            nbytes = self.sock.recv_into(self._view[self._end:])
+        except socket.timeout:
+            raise WebSocketTimeoutException("Connection timed out")
+        if not nbytes:
+            raise WebSocketConnectionClosedException("Connection closed by the adapter")
+        self._end += nbytes
+
+    def _fill(self, size: int):
+        """Waits until `size` bytes are unread"""
+        while self._end - self._start < size:
+            unread = self._end - self._start
+            if self._start + size > len(self._buffer):
+                # Move the unread bytes to the start of the buffer, grown if needed
+                if size > len(self._buffer):
+                    buffer = bytearray(max(size, 2 * len(self._buffer)))
+                    buffer[:unread] = self._view[self._start:self._end]
+                    self._view.release()
+                    self._buffer, self._view = buffer, memoryview(buffer)
+                else:
+                    self._buffer[:unread] = self._view[self._start:self._end]
+                self._start, self._end = 0, unread
+            self._read()
+
+    def _frame(self) -> tuple[int, bool, memoryview]:
+        """Reads a frame. Returns its opcode, fin bit and payload, valid until the next read"""
+        self._fill(2)
+        b0, b1 = self._buffer[self._start], self._buffer[self._start + 1]
+        length, header = b1 & 0x7F, 2
+        if length == 126:
+            self._fill(4)
+            length, header = int.from_bytes(self._view[self._start + 2:self._start + 4], "big"), 4
+        elif length == 127:
+            self._fill(10)
+            length, header = int.from_bytes(self._view[self._start + 2:self._start + 10], "big"), 10
+        masked = b1 & 0x80
+        self._fill(header + (4 if masked else 0) + length)
+        start = self._start + header
+        if masked:  # servers should not mask
+            key, start = bytes(self._view[start:start + 4]), start + 4
+            payload = memoryview(_mask(bytes(self._view[start:start + length]), key))
+        else:
+            payload = self._view[start:start + length]
+        self._start = start + length
+        if self._start == self._end:
+            self._start = self._end = 0
+        return b0 & 0x0F, bool(b0 & 0x80), payload
+
+    def recv(self) -> str:
+        while True:
+            opcode, fin, payload = self._frame()
+            if opcode in (_TEXT, _BINARY) and fin:
+                return str(payload, "utf-8")
+            if opcode in (_TEXT, _BINARY):
+                self._fragments = [bytes(payload)]
+            elif opcode == _CONTINUATION and self._fragments is not None:
+                self._fragments.append(bytes(payload))
+                if fin:
+                    message, self._fragments = b"".join(self._fragments), None
+                    return message.decode("utf-8")
+            elif opcode == _PING:
+                self._send(_PONG, bytes(payload))
+            elif opcode == _CLOSE:
+                try:
+                    self._send(_CLOSE, bytes(payload[:2]))
+                except OSError:
+                    pass
+                raise WebSocketConnectionClosedException("Connection closed by the adapter")
+
+    def _send(self, opcode: int, payload: bytes):
+        n = len(payload)
+        if n < 126:
+            header = bytes((0x80 | opcode, 0x80 | n))
+        elif n < 1 << 16:
+            header = bytes((0x80 | opcode, 0x80 | 126)) + n.to_bytes(2, "big")
+        else:
+            header = bytes((0x80 | opcode, 0x80 | 127)) + n.to_bytes(8, "big")
+        key = random.getrandbits(32).to_bytes(4, "big")
+        with self._sending:
+            self.sock.sendall(header + key + _mask(payload, key))
+
+    def send(self, frame: str):
+        self._send(_TEXT, frame.encode())
+
+    def ping(self):
+        self._send(_PING, b"")
+
+    def gettimeout(self) -> float:
+        return self.sock.gettimeout()
+
+    def settimeout(self, timeout: float):
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        try:
+            self._send(_CLOSE, (1000).to_bytes(2, "big"))
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class AsyncioWebSocket:
+    """Websocket of the `websockets` package, used from synchronous code.
+    All the connections share one event loop, run by a background thread,
+    which reads the frames as they arrive."""
+
+    _loop = None
+    _lock = threading.Lock()
+
+    def __init__(self, ws, loop: asyncio.AbstractEventLoop, timeout: float = None):
+        self.ws = ws
+        self.loop = loop
+        self.timeout = timeout
+        self._frames = queue.SimpleQueue()  # received frames, then the exception ending the connection
+        self._reader = asyncio.run_coroutine_threadsafe(self._readLoop(), loop)
+
+    @classmethod
+    def _sharedLoop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, name="daikin-asyncio", daemon=True).start()
+            return cls._loop
+
+    @classmethod
+    def connect(cls, url: str, timeout: float = None, **options) -> 'AsyncioWebSocket':
+        import websockets
+
+        async def connect():
+            return await websockets.connect(url, open_timeout=timeout, ping_interval=None, compression=None)
+        loop = cls._sharedLoop()
+        return cls(asyncio.run_coroutine_threadsafe(connect(), loop).result(), loop, timeout)
+
+    async def _readLoop(self):
+        try:
+            async for frame in self.ws:
+                self._frames.put(frame)
+            self._frames.put(WebSocketConnectionClosedException("Connection closed by the adapter"))
+        except Exception as e:
+            self._frames.put(WebSocketConnectionClosedException(f"Connection lost: {e!r}"))
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(self.timeout)
+
+    def send(self, frame: str):
+        try:
+            self._run(self.ws.send(frame))
+        except Exception as e:
+            raise WebSocketConnectionClosedException(f"Connection lost: {e!r}") from e
+
+    def recv(self) -> str:
+        try:
+            frame = self._frames.get(timeout=self.timeout)
+        except queue.Empty:
+            raise WebSocketTimeoutException("Connection timed out")
+        if isinstance(frame, Exception):
+            self._frames.put(frame)  # for the next calls
+            raise frame
+        return frame
+
+    def ping(self):
+        self._run(self.ws.ping())
+
+    def gettimeout(self) -> float:
+        return self.timeout
+
+    def settimeout(self, timeout: float):
+        self.timeout = timeout
+
+    def close(self):
+        try:
+            self._run(self.ws.close())
+        except Exception:
+            pass
+        self._reader.cancel()
+
+
+TRANSPORTS: dict[str, Callable] = {
+    "websocket-client": create_connection,
+    "raw": RawWebSocket.connect,
+    "asyncio": AsyncioWebSocket.connect,
+}
+
+
+def get(transport: str | Callable) -> Callable:
+    """Returns the connect callable of a transport of TRANSPORTS, or `transport` if it is one"""
+    if callable(transport):
+        return transport
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport {transport}, not one of {', '.join(TRANSPORTS)}")
+    return TRANSPORTS[transport]
@@ -0,0 +1,279 @@
+"""Batched and coalesced writes.
+
+A Transaction groups the writes of several setters: they are sent
+pipelined when it ends, then confirmed by reading all the written
+resources back in one batch. Writing the same resource twice only sends
+the last value:
+
+    >>> with Transaction(d) as t:
+    ...     t.set_setpoint_temperature(21.5)
+    ...     t.set_heating_enabled(True)
+    >>> t.ok, t.results
+
+A WriteQueue debounces bursts of writes, like those of a slider: the
+first write to a resource opens a window of `window` seconds, the writes
+to it within the window replace its value, and at the end of the window
+the last value is written, in one transaction with the other resources
+due. The setters return a Future of the WriteResult:
+
+    >>> queue = WriteQueue(d, window=0.5)
+    >>> for t in (20, 20.5, 21, 21.5):
+    ...     future = queue.set_setpoint_temperature(t)
+    >>> future.result().status
+    'applied'
+"""
+from dataclasses import dataclass
+import abc
+import concurrent.futures
+import functools
+import inspect
+import logging
+import threading
+import time
+
+from . import SETTINGS, TIMED_OUT, DaikinAltherma
+from .resources import CON, acknowledged
+
+# DaikinAltherma setters writing one resource, which can be batched
+SETTERS = [
+    "set_unit_datetime",
+    "set_holiday_mode",
+    "set_tank_heating_enabled",
+    "set_leaving_water_temperature_offset",
+    "set_setpoint_temperature",
+    "set_heating_enabled",
+]
+
+# Written resources which do not read back the written value: the clock goes on
+_UNVERIFIED = {"MNAE/0/DateTime"}
+
+# Signatures of the SETTERS, to find the value in the arguments of their calls
+_SIGNATURES = {name: inspect.signature(getattr(DaikinAltherma, name)) for name in SETTERS}
+
+
+def write_request(setter: str, *args, **kwargs) -> tuple:
+    """Returns the (item, output path, payload) request of a setter of SETTERS,
+    called with `args` and `kwargs`"""
+    arguments = _SIGNATURES[setter].bind(None, *args, **kwargs).arguments
+    _, value = arguments.values()
+    return SETTINGS[setter].request(value)
+
+
+@dataclass(frozen=True)
+class WriteResult:
+    """Result of a write of a Transaction"""
+    item: str
+    value: object  # the written value
+    status: str  # "applied", "acknowledged" (could not be read back), "not applied", "rejected" or "timeout"
+    read_back: object = None  # value read after the write
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("applied", "acknowledged")
+
+
+def _applied(written, read) -> bool:
+    if written == read or str(written) == str(read):
+        return True
+    try:
+        return float(written) == float(read)
+    except (TypeError, ValueError):
+        return False
+
+
+class _Setters(abc.ABC):
+    """Base of the classes having the SETTERS, which call `self._write(request)`"""
+
+    @abc.abstractmethod
+    def _write(self, request: tuple):
+        """Handles the (item, output path, payload) request of a setter"""
+
+
+def _setter(name: str):
+    sync_setter = getattr(DaikinAltherma, name)
+
+    @functools.wraps(sync_setter)
+    def setter(self, *args, **kwargs):
+        return self._write(write_request(name, *args, **kwargs))
+    return setter
+
+
+for _name in SETTERS:
+    setattr(_Setters, _name, _setter(_name))
+
+
+class Transaction(_Setters):
+    """Writes of several setters, sent together when the `with` block ends
+    (or on commit()) and confirmed by one batched read-back. The setters
+    return None; the results are in `results`, in the order of the writes"""
+
+    def __init__(self, client: DaikinAltherma):
+        """
+        :param client: the client writing
+        :type client: DaikinAltherma
+        """
+        self.client = client
+        self.results: list[WriteResult] = None
+        self._writes = {}  # item -> request, the last write of each resource
+
+    def _write(self, request: tuple):
+        if self.results is not None:
+            raise RuntimeError("The transaction is already committed")
+        self._writes.pop(request[0], None)  # sent in the order of the last writes
+        self._writes[request[0]] = request
+
+    def commit(self) -> list[WriteResult]:
+        """Sends the writes pipelined, then reads the written resources back in one batch
+
+        :return: the result of each written resource
+        :rtype: list[WriteResult]
+        """
+        if self.results is not None:
+            return self.results
+        requests = list(self._writes.values())
+        # The writes not acknowledged in time are timeouts, the others keep their reply
+        replies = self.client._requestValues(requests, deadline=self.client._deadline(self.client.timeout))
+
+        verified = [
+            item for (item, _, _), reply in zip(requests, replies)
+            if reply is not TIMED_OUT and acknowledged(reply) and item not in _UNVERIFIED
+        ]
+        try:
+            read_back = dict(zip(verified, self.client._requestValues(
+                [(f"{item}/la", CON) for item in verified], deadline=self.client._deadline(self.client.timeout))))
+        except ConnectionError as e:
+            logging.warning(f"Could not read the written resources back: {e!r}")
+            read_back = {}
+
+        self.results = []
+        for (item, _, payload), reply in zip(requests, replies):
+            value = payload["con"]
+            if reply is TIMED_OUT:
+                result = WriteResult(item, value, "timeout")
+            elif not acknowledged(reply):
+                result = WriteResult(item, value, "rejected")
+            elif item not in verified:
+                result = WriteResult(item, value, "acknowledged")
+            else:
+                read = read_back.get(item, TIMED_OUT)
+                if read is TIMED_OUT:
+                    result = WriteResult(item, value, "acknowledged")
+                else:
+                    result = WriteResult(item, value, "applied" if _applied(value, read) else "not applied", read)
+            self.results.append(result)
+        return self.results
+
+    @property
+    def ok(self) -> bool:
+        """Returns whether all the writes were applied"""
+        return self.results is not None and all(r.ok for r in self.results)
+
+    def __enter__(self) -> 'Transaction':
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+
+
+class WriteQueue(_Setters):
+    """Debounces the writes of the setters: the last value written to a
+    resource within `window` seconds of its first write is written, by a
+    background thread. The setters return a Future of its WriteResult"""
+
+    def __init__(self, client: DaikinAltherma, window: float = 0.5):
+        """
+        :param client: the client writing, created with thread_safe=True
+        :type client: DaikinAltherma
+        :param window: seconds during which the writes to a resource are coalesced, defaults to 0.5
+        :type window: float, optional
+        """
+        if client._reader is None:
+            raise RuntimeError("WriteQueue needs a client created with thread_safe=True")
+        self.client = client
+        self.window = window
+        self.coalesced = 0  # writes replaced by a later one
+        self._pending = {}  # item -> [due time, request, futures]
+        self._changed = threading.Condition()
+        self._closing = False
+        self._worker = threading.Thread(target=self._run, name="daikin-writes", daemon=True)
+        self._worker.start()
+
+    def _write(self, request: tuple) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self._changed:
+            if self._closing:
+                raise RuntimeError("The write queue is closed")
+            pending = self._pending.get(request[0])
+            if pending is None:
+                self._pending[request[0]] = [time.monotonic() + self.window, request, [future]]
+                self._changed.notify()
+            else:
+                pending[1] = request
+                pending[2].append(future)
+                self.coalesced += 1
+        return future
+
+    def _due(self, now: float = None) -> list[list]:
+        """Removes and returns the pending writes due at `now`, all of them if None"""
+        due = [
+            item for item, (at, _, _) in self._pending.items()
+            if now is None or at <= now
+        ]
+        return [self._pending.pop(item) for item in due]
+
+    def _send(self, writes: list[list]):
+        transaction = Transaction(self.client)
+        for _, request, _ in writes:
+            transaction._write(request)
+        try:
+            results = {r.item: r for r in transaction.commit()}
+        except Exception as e:
+            for _, _, futures in writes:
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for _, request, futures in writes:
+            for future in futures:
+                future.set_result(results[request[0]])
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._closing:
+                    now = time.monotonic()
+                    writes = self._due(now)
+                    if writes:
+                        break
+                    next_due = min((at for at, _, _ in self._pending.values()), default=None)
+                    self._changed.wait(None if next_due is None else next_due - now)
+                else:
+                    writes = self._due()
+            if writes:
+                self._send(writes)
+            elif self._closing:
+                return
+
+    def flush(self) -> list[WriteResult]:
+        """Writes the pending values now
+
+        :return: their results
+        :rtype: list[WriteResult]
+        """
+        with self._changed:
+            writes = self._due()
+        self._send(writes)
+        return [futures[0].result() for _, _, futures in writes]
+
+    def close(self):
+        """Writes the pending values, and stops the background thread"""
+        with self._changed:
+            self._closing = True
+            self._changed.notify()
+        self._worker.join()
+
+    def __enter__(self) -> 'WriteQueue':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -20,7 +20,17 @@ setup(
     packages=['daikin_altherma'],
     long_description=open("README.md", "r").read(),
     long_description_content_type="text/markdown",
-    install_requires=['websocket-client', 'dpath'],
+    install_requires=['websocket-client'],
+    extras_require={
+        'async': ['websockets'],
+        'numpy': ['numpy'],
+        'orjson': ['orjson'],
+    },
+    entry_points={
+        'console_scripts': [
+            'daikin-altherma-exporter=daikin_altherma.exporter:main',
+        ],
+    },
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Topic :: Utilities",